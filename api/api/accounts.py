@@ -1,104 +1,71 @@
 from datetime import datetime, timedelta, UTC
-import json
 import os
 
-import boto3
 import botocore.exceptions
-from dynamo import db
 
+from clients import dynamodb, scheduler
+from concurrency import call
 from errors import Forbidden, EmptyResponse
 from models import User
-from utils import get_presigned_upload_link, delete_from_bucket
-
-scheduler = boto3.client('scheduler')
+from utils import get_presigned_upload_link, get_presigned_download_link, delete_from_bucket, start_background_job
 
 account_deletion_offset = int(os.environ.get('ACCOUNT_DELETION_OFFSET', 30))
+# partition key of DeletionIndex, only accounts pending deletion have it
+deletion_queue = 'ACCOUNT'
 background_function = os.environ['BACKGROUND_FUNCTION']
-background_role = os.environ['BACKGROUND_ROLE']
 schedule_group = os.environ['SCHEDULE_GROUP']
 upload_bucket = os.environ['UPLOAD_BUCKET']
 media_bucket = os.environ['MEDIA_BUCKET']
 table = os.environ['WORKOUTS_TABLE']
 destination_tag = f'<Tagging><TagSet><Tag><Key>destination</Key><Value>{media_bucket}</Value></Tag></TagSet></Tagging>'
 
+# a snapshot older than this is rebuilt, the client syncs the rest incrementally
+snapshot_max_age = timedelta(hours=int(os.environ.get('SNAPSHOT_MAX_AGE_HOURS', 6)))
+# a build that has not finished by then is assumed lost
+snapshot_build_timeout = timedelta(minutes=5)
+
 min_content_length: int = 128
 max_content_length: int = 31_457_280  # 30 MB max
 
 
-def delete_account(*, user: User, account_id: str) -> None:
+def delete_account(*, user: User, account_id: str) -> None:  # noqa
     """
-    Deletes a user account by scheduling it for deletion. Ensures that the account
-    is associated with the provided user ID and avoids unnecessary rescheduling
-    if the account has already been scheduled for deletion.
+    Schedules a user account for deletion by stamping it with `scheduledForDeletionAt`
+    and the `deletionQueue` marker, which put it into the sparse DeletionIndex.
+    The background sweeper purges accounts from the index once they're due.
+    Does nothing if the account is already scheduled.
 
     :param user: The User object for the account owner.
     :param account_id: The unique identifier of the user account to be deleted.
     :return: None
 
-    :raises Forbidden: If the provided user ID does not match the account ID.
+    :raises Forbidden: If there is no account of the user.
     :raises EmptyResponse: If the account is already scheduled for deletion or
                            after scheduling is confirmed as successful.
-    :raises botocore.exceptions.ClientError: If AWS Scheduler fails or other
-            service errors occur during account deletion scheduling.
     """
     when = datetime.now(UTC) + timedelta(days=account_deletion_offset)
-    schedule_name = f'delete-account-{user.id}'
-
-    response = _get_account(user.id)
-
-    item = response.get('Item')
-    if not item:
-        raise Forbidden("No such account")
-
-    match item:
-        case {
-            'scheduledForDeletionAt': {'S': delete_at},
-            'deletionSchedule': {'S': schedule},
-        } if delete_at and schedule:
-            raise EmptyResponse
-        case _:
-
-            def update():
-                db().update_item(
-                    TableName=table,
-                    Key={
-                        'PK': {'S': f'USER#{account_id}'},
-                        'SK': {'S': 'ACCOUNT'}
-                    },
-                    UpdateExpression="SET scheduledForDeletionAt = :when, deletionSchedule = :arn",
-                    ExpressionAttributeValues={
-                        ':when': {'S': when.isoformat()},
-                        ':arn': {'S': arn}
-                    }
-                )
-
-            try:
-                message = {
-                    'Event': 'AccountDeletion',
-                    'Payload': {'user_id': user.id},
-                }
-
-                arn = scheduler.create_schedule(
-                    ActionAfterCompletion='DELETE',
-                    Name=schedule_name,
-                    GroupName=schedule_group,
-                    ScheduleExpression=f'at({when.strftime("%Y-%m-%dT%H:%M:%S")})',
-                    Target={
-                        'Arn': background_function,
-                        'RoleArn': background_role,
-                        'Input': json.dumps(message),
-                    },
-                    FlexibleTimeWindow={'Mode': 'OFF'},
-                    State='ENABLED',
-                )['ScheduleArn']
-
-                update()
-
-            except botocore.exceptions.ClientError as error:
-                # if schedule exists, ok
-                if error.response['Error']['Code'] != 'ConflictException':
-                    raise error
 
+    # the condition does what reading the account first used to, in one round trip
+    try:
+        call(
+            'update_item',
+            TableName=table,
+            Key={
+                'PK': {'S': f'USER#{user.id}'},
+                'SK': {'S': 'ACCOUNT'}
+            },
+            UpdateExpression="SET scheduledForDeletionAt = :when, deletionQueue = :queue",
+            ConditionExpression="attribute_exists(SK) AND attribute_not_exists(scheduledForDeletionAt)",
+            ExpressionAttributeValues={
+                ':when': {'S': when.isoformat()},
+                ':queue': {'S': deletion_queue},
+            },
+            ReturnValuesOnConditionCheckFailure='ALL_OLD',
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException as error:
+        if not error.response.get('Item'):
+            raise Forbidden("No such account")
+        # already scheduled
     raise EmptyResponse
 
 
@@ -113,27 +80,30 @@ def edit_account(*, user: User, account_id: str, action: str, _: dict = None) ->
 
 def _undo_account_deletion(user_id: str) -> None:
     """
-    Deletes the account deletion schedule for a given user.
-
-    This function retrieves the user document associated with the given user ID
-    and checks if an account deletion schedule exists. If an account deletion
-    schedule is found, it attempts to delete the schedule from the scheduler.
-    Once the schedule is deleted, the corresponding fields in the user item are
-    updated to remove any trace of a pending deletion.
+    Takes the account out of the deletion index, in one write that also returns
+    what was there. Accounts scheduled before the sweeper existed also have
+    a Scheduler schedule of their own, which is deleted afterwards.
 
     :param user_id: User's Firebase ID
     :return: None
     """
-    item = _get_account(user_id).get('Item')
-
-    if not item:
+    try:
+        item = call(
+            'update_item',
+            TableName=table,
+            Key={
+                'PK': {'S': f'USER#{user_id}'},
+                'SK': {'S': 'ACCOUNT'}
+            },
+            UpdateExpression="REMOVE scheduledForDeletionAt, deletionQueue, deletionSchedule",
+            ConditionExpression="attribute_exists(SK)",
+            ReturnValues='ALL_OLD',
+        )['Attributes']
+    except dynamodb.exceptions.ConditionalCheckFailedException:
         raise Forbidden('No such account found')
 
     match item:
-        case {
-            'scheduledForDeletionAt': {'S': delete_at},
-            'deletionSchedule': {'S': schedule},
-        } if delete_at and schedule:
+        case {'deletionSchedule': {'S': schedule}} if schedule:
             match f'{schedule}'.split('/'):
                 case [_, _, name]:
                     try:
@@ -146,15 +116,6 @@ def _undo_account_deletion(user_id: str) -> None:
                         if error.response['Error']['Code'] != 'ResourceNotFoundException':
                             raise error
 
-            db().update_item(
-                TableName=table,
-                Key={
-                    'PK': {'S': f'USER#{user_id}'},
-                    'SK': {'S': 'ACCOUNT'}
-                },
-                UpdateExpression="REMOVE scheduledForDeletionAt, deletionSchedule"
-            )
-
 
 def _remove_avatar(account_id: str) -> dict:
     return delete_from_bucket(bucket=media_bucket, key=f'avatars/{account_id}')
@@ -183,16 +144,63 @@ def account_info(*, user: User, account_id: str, action: str, mime_type: str = N
     raise Forbidden(f'Action {action} not allowed')
 
 
-def _get_account(account_id: str) -> dict:
+def bootstrap_snapshot(*, user: User, account_id: str, refresh: str = None) -> dict | tuple[dict, int]:  # noqa
     """
-    Fetches account item from Dynamo
+    First sync of a new device: a gzipped SQLite database with the client's schema,
+    holding user's history, templates and the exercise catalog.
+    Builds it in the background if there is no recent one;
+    the client polls until the link is returned.
+
+    :param user: request user
     :param account_id: user's Firebase id
-    :return: DynamoDB get_item response
+    :param refresh: "true" to rebuild even if a recent snapshot exists
+    :return: the link and the watermark to continue incremental sync from,
+        or 202 while the snapshot is being built
+
+    :raises Forbidden: if the account is not user's
     """
-    return db().get_item(
+    if account_id != user.id:
+        raise Forbidden('No such account found')
+
+    now = datetime.now(UTC)
+    item = dynamodb.get_item(
         TableName=table,
         Key={
-            'PK': {'S': f'USER#{account_id}'},
-            'SK': {'S': 'ACCOUNT'}
-        }
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': 'SNAPSHOT'},
+        },
+    ).get('Item') or {}
+
+    match item:
+        case {
+            'status': {'S': 'done'},
+            'builtAt': {'S': built_at},
+            'watermark': {'S': watermark},
+        } if refresh != 'true' and now - datetime.fromisoformat(built_at) < snapshot_max_age:
+            return {
+                'status': 'done',
+                'link': get_presigned_download_link(
+                    upload_bucket,
+                    f'snapshots/{user.id}.sqlite.gz',
+                    file_name='heart.sqlite.gz',
+                ),
+                'watermark': watermark,
+                'bytes': int(item['bytes']['N']),
+            }
+        case {
+            'status': {'S': 'pending'},
+            'requestedAt': {'S': requested_at},
+        } if now - datetime.fromisoformat(requested_at) < snapshot_build_timeout:
+            return {'status': 'pending'}, 202
+
+    dynamodb.put_item(
+        TableName=table,
+        Item={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': 'SNAPSHOT'},
+            'status': {'S': 'pending'},
+            'requestedAt': {'S': now.isoformat()},
+        },
     )
+    start_background_job(background_function, 'SnapshotBuild', {'user_id': user.id})
+    return {'status': 'pending'}, 202
@@ -1,10 +1,15 @@
-from errors import EmptyResponse, Unauthorized, NotFound, Forbidden
+from errors import EmptyResponse, NotModified, Unauthorized, NotFound, Forbidden, BadRequest
 from framework import response, request, argument_error
 from utils import custom_serializer, dash_to_snake, send_monitoring_notification
+import capacity
+import concurrency
+import metrics
 
 import accounts
+import exercises
 import feedback
 import templates
+import uploads
 import workouts
 
 
@@ -48,13 +53,27 @@ def router(event: dict) -> dict:
         } if path.startswith('/templates'):
             function_name = dash_to_snake(operation)
             return getattr(templates, function_name)(**request(event))
+        case {
+            'path': path,
+            'requestContext': {'operationName': operation},
+        } if path.startswith('/exercises'):
+            function_name = dash_to_snake(operation)
+            return getattr(exercises, function_name)(**request(event))
+        case {
+            'path': path,
+            'requestContext': {'operationName': operation},
+        } if path.startswith('/uploads'):
+            function_name = dash_to_snake(operation)
+            return getattr(uploads, function_name)(**request(event))
         case {'path': path}:
             raise NotFound(path)
     raise ValueError(event)
 
 
-def handler(event: dict, _):
+def handler(event: dict, context):
     print(event)
+    concurrency.set_deadline(context)
+    capacity.set_endpoint(event.get('requestContext', {}).get('operationName'))
 
     try:
         return response(
@@ -63,8 +82,15 @@ def handler(event: dict, _):
         )
     except EmptyResponse:
         return response(status=204)
+    except NotModified as e:
+        return response(status=304, headers={'ETag': e.etag})
     except TypeError as e:
         return argument_error(e)
+    except BadRequest as e:
+        return response(
+            status=400,
+            body={'error': True, 'message': e.message},
+        )
     except Forbidden as e:
         return response(
             status=403,
@@ -87,3 +113,5 @@ def handler(event: dict, _):
             status=500,
             body={'error': str(e)},
         )
+    finally:
+        metrics.flush()
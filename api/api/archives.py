@@ -0,0 +1,112 @@
+"""
+Archival tier of the workout history.
+
+Workouts of whole months older than `archive_age` are rolled by the background
+function (see background/archives.py) into one `ARCHIVE#<yyyy-mm>` bundle each,
+see storage/bundles.py in the layer for the format. Reads expand the bundles,
+writes to an archived workout are redirected into its bundle.
+The bundle wins over a standalone copy of the same workout.
+Workout ids are their start timestamps, so the bundle of any workout is known
+without reading anything.
+"""
+import os
+from datetime import datetime, timedelta, UTC
+from typing import Callable, Iterable, Iterator
+
+from clients import dynamodb, s3
+from storage import bundles
+
+_table = os.environ['WORKOUTS_TABLE']
+_archive_bucket = os.environ['MEDIA_BUCKET']
+
+archive_age = timedelta(days=int(os.environ.get('ARCHIVE_AFTER_DAYS', 365)))
+max_attempts: int = 3
+
+
+def month_of(start: str) -> str:
+    return start[:7]
+
+
+def archived_through() -> str:
+    """Months before this one may be archived"""
+    return month_of((datetime.now(UTC) - archive_age).isoformat())
+
+
+def may_be_archived(start: str) -> bool:
+    return month_of(start) < archived_through()
+
+
+def read_bundle(bundle: dict) -> list[dict]:
+    """
+    :param bundle: ARCHIVE# item
+    :return: workout items of the month, as they were stored before archival
+    """
+    return bundles.read_bundle(s3, bundle)
+
+
+def get_bundle(user_id: str, month: str) -> dict | None:
+    return dynamodb.get_item(
+        TableName=_table,
+        Key={
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': f'ARCHIVE#{month}'},
+        },
+        ConsistentRead=True,
+    ).get('Item')
+
+
+def write_bundle(user_id: str, month: str, items: list[dict], previous: dict | None):
+    """
+    Replaces a month's bundle, conditionally on it not having changed since `previous` was read
+
+    :raises ConditionalCheckFailedException: on a concurrent write
+    """
+    bundles.write_bundle(dynamodb, s3, user_id, month, items, previous)
+
+
+def delete_bundle(previous: dict):
+    dynamodb.delete_item(
+        TableName=_table,
+        Key={'PK': previous['PK'], 'SK': previous['SK']},
+        ConditionExpression='revision = :revision',
+        ExpressionAttributeValues={':revision': previous['revision']},
+    )
+    if 'key' in previous:
+        s3.delete_object(Bucket=_archive_bucket, Key=previous['key']['S'])
+
+
+def update_bundle(user_id: str, month: str, change: Callable[[dict[str, dict]], bool]) -> bool:
+    """
+    Applies `change` to the month's workout items, keyed by SK, and writes the bundle back
+    if it reports a change. Retries on concurrent writes.
+
+    :return: False if the month is not archived
+    """
+    for attempt in range(max_attempts):
+        previous = get_bundle(user_id, month)
+        if not previous:
+            return False
+        items = {each['SK']['S']: each for each in read_bundle(previous)}
+        if not change(items):
+            return True
+        try:
+            if items:
+                write_bundle(user_id, month, list(items.values()), previous)
+            else:
+                delete_bundle(previous)
+            return True
+        except dynamodb.exceptions.ConditionalCheckFailedException:
+            if attempt == max_attempts - 1:
+                raise
+    return True
+
+
+def merge(archives: Iterable[dict], workouts: Iterable[dict]) -> Iterator[dict]:
+    """
+    Workout items of a user in start order, with bundles expanded.
+    A workout that is also stored on its own is returned once, as bundled.
+
+    :param archives: ARCHIVE# items in SK order
+    :param workouts: WORKOUT# items in SK order
+    """
+    return bundles.merge(s3, archives, workouts)
@@ -0,0 +1,62 @@
+"""
+Reads of a given set of items by key, for operations that fetch specific
+items rather than a range of the partition: 20 workouts cost 20 item reads,
+not a query over the user's whole history.
+
+Keys go to BatchGetItem in chunks of `max_keys`, the chunks concurrently.
+Keys DynamoDB leaves unprocessed, under throttling or past 16 MB per response,
+are requested again with jittered backoff while the invocation has time for it.
+"""
+import os
+import random
+import time
+
+import metrics
+from concurrency import backoff_base, backoff_cap, call, gather, min_attempt_time, remaining
+
+_table = os.environ['WORKOUTS_TABLE']
+
+# BatchGetItem limit
+max_keys: int = 100
+max_attempts: int = 8
+
+
+def batch_get(keys: list[dict], projection: str = None, names: dict = None) -> dict[str, dict]:
+    """
+    :param keys: PK/SK keys, duplicates are read once
+    :param projection: ProjectionExpression of the attributes to return, PK and SK included
+    :param names: ExpressionAttributeNames of the projection
+    :return: the items that exist, by SK
+    :raises TimeoutError: if keys are still unprocessed when the deadline comes
+    """
+    unique = list({(key['PK']['S'], key['SK']['S']): key for key in keys}.values())
+    request = {}
+    if projection:
+        request['ProjectionExpression'] = projection
+    if names:
+        request['ExpressionAttributeNames'] = names
+
+    chunks = [unique[i:i + max_keys] for i in range(0, len(unique), max_keys)]
+    return {
+        item['SK']['S']: item
+        for items in gather(*(lambda chunk=chunk: _get_chunk({**request, 'Keys': chunk}) for chunk in chunks))
+        for item in items
+    }
+
+
+def _get_chunk(request: dict) -> list[dict]:
+    items = []
+    for attempt in range(max_attempts):
+        response = call('batch_get_item', RequestItems={_table: request})
+        items.extend(response.get('Responses', {}).get(_table, []))
+        # unprocessed keys come back with the projection of the request
+        request = response.get('UnprocessedKeys', {}).get(_table)
+        if not request:
+            return items
+
+        metrics.count('UnprocessedKeys', len(request['Keys']))
+        delay = random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt))
+        if (left := remaining()) is not None and left < delay + min_attempt_time:
+            break
+        time.sleep(delay)
+    raise TimeoutError(f'{len(request["Keys"])} keys left unprocessed')
@@ -0,0 +1,84 @@
+"""
+Per-container caches for hot reads, kept across warm invocations.
+
+Every namespace has its own TTL and size bound, least recently used entries
+are evicted first. Entries are shared by every request the container serves,
+so callers must not mutate cached values, and must invalidate the keys
+they write to. Other containers only see a write once their entry expires,
+hence TTLs of seconds for anything a user can change.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import metrics
+
+_caches: dict[str, 'Cache'] = {}
+
+
+class Cache:
+    def __init__(self, name: str, ttl: float, max_size: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (expires at, value), least recently used first
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # loads run outside of it, concurrent misses may load the same key twice
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        :param key: cache key
+        :param load: called on a miss, None results are not cached
+        :return: cached or loaded value
+        """
+        now = time.monotonic()
+        with self._lock:
+            match self.entries.get(key):
+                case (expires_at, value) if expires_at > now:
+                    self.entries.move_to_end(key)
+                    metrics.count('CacheHits', cache=self.name)
+                    return value
+
+        metrics.count('CacheMisses', cache=self.name)
+        value = load()
+        if value is not None:
+            self.put(key, value, now)
+        return value
+
+    def put(self, key: Hashable, value: Any, now: float = None):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self.entries[key] = ((now or time.monotonic()) + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                metrics.count('CacheEvictions', cache=self.name)
+
+    def invalidate(self, key: Hashable = None):
+        """Drops one key, or everything if no key is given"""
+        with self._lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+
+def cache(name: str, ttl: float, max_size: int = 256) -> Cache:
+    """
+    Creates or returns the cache of a namespace
+
+    :param name: namespace, also the `cache` dimension of the hit/miss metrics
+    :param ttl: seconds an entry is served for, 0 disables caching
+    :param max_size: entries kept before evicting the least recently used
+    """
+    if name not in _caches:
+        _caches[name] = Cache(name, ttl, max_size)
+    return _caches[name]
+
+
+def clear():
+    for each in _caches.values():
+        each.invalidate()
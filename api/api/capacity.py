@@ -0,0 +1,38 @@
+"""
+Consumed capacity of every DynamoDB call, by API operation.
+
+Handlers registered on the clients' events, see storage/capacity.py in the layer,
+ask each call that supports it for ReturnConsumedCapacity=TOTAL and add what
+the response reports to ReadCapacityUnits and WriteCapacityUnits metrics,
+with the API operation as the `endpoint` dimension and the DynamoDB operation as `operation`,
+and once more per endpoint alone. Each invocation serves one user's request,
+so the per-invocation totals give CloudWatch percentiles per user request.
+
+Calls made through paginators, `concurrency.call` and its hedges are counted
+the same, a hedge that loses still consumed capacity.
+"""
+import contextvars
+
+import metrics
+from storage import capacity
+
+# API operation of the current invocation, in dash-case as in template.yaml
+_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar('endpoint', default='init')
+
+
+def set_endpoint(operation: str | None):
+    _endpoint.set(operation or 'unknown')
+
+
+def endpoint() -> str:
+    return _endpoint.get()
+
+
+def _record(name: str, value: float, operation: str):
+    metrics.count(name, value, endpoint=endpoint(), operation=operation)
+    metrics.count(name, value, endpoint=endpoint())
+
+
+def install(*clients):
+    """Registers the handlers on DynamoDB clients, see storage/capacity.py in the layer"""
+    capacity.install(_record, *clients)
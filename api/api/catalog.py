@@ -0,0 +1,97 @@
+"""
+Exercise catalog file: the names of the EXERCISE partition, compiled by
+libraries/catalog.py into the exercise-catalog layer, and memory-mapped by
+the API at init to check the exercise names of workouts and templates
+without a read.
+
+Layout, little-endian:
+
+    header  magic (8s), catalog version (Q), names (I), slots (I)
+    slots   `slots` x (crc32 of the name (I), offset (I), length (I)),
+            open addressing with linear probing, length 0 for an empty slot
+    names   UTF-8 names, sorted, back to back
+
+Slots are a power of two at least twice the names, so that probes are short.
+Lookups hash the encoded name and compare bytes in place in the map only on
+a hash match, nothing is read into memory up front.
+"""
+import mmap
+import struct
+import zlib
+from typing import Iterable, Iterator
+
+magic = b'EXCAT\x00\x00\x01'
+_header = struct.Struct('<8sQII')
+_slot = struct.Struct('<III')
+
+
+def encode(names: Iterable[str], version: int) -> bytes:
+    """
+    :param names: exercise names, duplicates are written once
+    :param version: catalog version the names are of, see exercises/common.py
+    :return: contents of the catalog file
+    """
+    encoded = sorted({name.encode() for name in names})
+    slots = 1
+    while slots < 2 * len(encoded):
+        slots *= 2
+
+    table = [(0, 0, 0)] * slots
+    offset = _header.size + slots * _slot.size
+    for name in encoded:
+        digest = zlib.crc32(name)
+        i = digest & (slots - 1)
+        while table[i][2]:
+            i = (i + 1) & (slots - 1)
+        table[i] = (digest, offset, len(name))
+        offset += len(name)
+
+    return b''.join([
+        _header.pack(magic, version, len(encoded), slots),
+        *(_slot.pack(*each) for each in table),
+        *encoded,
+    ])
+
+
+class Catalog:
+    """Read-only view of a catalog file"""
+
+    def __init__(self, buffer):
+        tag, self.version, self.count, self.slots = _header.unpack_from(buffer, 0)
+        if tag != magic:
+            raise ValueError('Not an exercise catalog file')
+        self._buffer = buffer
+
+    @classmethod
+    def open(cls, path: str) -> 'Catalog | None':
+        """The catalog file at `path`, memory-mapped, None if there is none"""
+        try:
+            with open(path, 'rb') as f:
+                # the map outlives the file descriptor
+                return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+
+    def __contains__(self, name: str) -> bool:
+        key = name.encode()
+        digest = zlib.crc32(key)
+        mask = self.slots - 1
+        i = digest & mask
+        while True:
+            found, offset, length = _slot.unpack_from(self._buffer, _header.size + i * _slot.size)
+            if not length:
+                return False
+            # a find bounded to the slot's bytes compares them in place, a slice would copy them
+            if found == digest and length == len(key) and self._buffer.find(key, offset, offset + length) == offset:
+                return True
+            i = (i + 1) & mask
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        """Names in sorted order"""
+        slots = (_slot.unpack_from(self._buffer, _header.size + i * _slot.size) for i in range(self.slots))
+        # names were written in order, so offsets are too
+        for _, offset, length in sorted((each for each in slots if each[2]), key=lambda each: each[1]):
+            yield self._buffer[offset:offset + length].decode()
@@ -0,0 +1,82 @@
+"""
+AWS clients shared by every module of the API function.
+
+One botocore session per container, clients created during the init phase
+with keep-alive, a connection pool large enough for concurrent calls,
+adaptive retries and timeouts that fit into the function's own timeout.
+Connections to DynamoDB and S3 are opened during init too,
+so that the first request does not pay for the TLS handshake.
+"""
+import os
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+import capacity
+
+pool_size = int(os.environ.get('AWS_POOL_SIZE', 16))
+connect_timeout = float(os.environ.get('AWS_CONNECT_TIMEOUT', 1))
+read_timeout = float(os.environ.get('AWS_READ_TIMEOUT', 3))
+max_attempts = int(os.environ.get('AWS_MAX_ATTEMPTS', 3))
+
+config = Config(
+    max_pool_connections=pool_size,
+    tcp_keepalive=True,
+    connect_timeout=connect_timeout,
+    read_timeout=read_timeout,
+    retries={
+        'mode': 'adaptive',
+        'max_attempts': max_attempts,
+    },
+)
+
+session = boto3.session.Session()
+
+dynamodb = session.client('dynamodb', config=config)
+# one attempt per call, concurrency.call retries within the invocation's deadline
+dynamodb_once = session.client(
+    'dynamodb',
+    config=config.merge(Config(retries={'mode': 'standard', 'max_attempts': 1})),
+)
+s3 = session.client('s3', config=config)
+sns = session.client('sns', config=config)
+scheduler = session.client('scheduler', config=config)
+lambda_ = session.client('lambda', config=config)
+
+capacity.install(dynamodb, dynamodb_once)
+
+
+def warm(table: str = None, bucket: str = None) -> float:
+    """
+    Opens connections to DynamoDB and S3 with the cheapest calls possible.
+    Failures are ignored, the point is the handshake, not the response.
+
+    :param table: any table the function can read
+    :param bucket: any bucket the function can read
+    :return: seconds spent
+    """
+    started = time.perf_counter()
+    calls = []
+    if table:
+        calls.extend(
+            lambda client=client: client.get_item(
+                TableName=table,
+                Key={'PK': {'S': 'WARMUP'}, 'SK': {'S': 'WARMUP'}},
+            )
+            for client in (dynamodb, dynamodb_once)
+        )
+    if bucket:
+        calls.append(lambda: s3.head_object(Bucket=bucket, Key='warmup'))
+
+    for call in calls:
+        try:
+            call()
+        except (ClientError, BotoCoreError) as e:
+            print(f'Warm-up: {e}')
+    return time.perf_counter() - started
+
+
+if os.environ.get('WARM_CONNECTIONS', '1') == '1' and 'AWS_LAMBDA_FUNCTION_NAME' in os.environ:
+    print(f'Warmed connections in {warm(os.environ.get("WORKOUTS_TABLE"), os.environ.get("MEDIA_BUCKET")):.3f}s')
@@ -0,0 +1,225 @@
+"""
+Runs independent AWS calls of one request in parallel,
+and single DynamoDB calls within the time the invocation has left.
+
+boto3 clients are thread-safe and blocking, so calls go to a thread pool
+shared by the container and sized like the clients' connection pools.
+`gather` fans out the bundle reads of get-workouts, the chunks of batch_get,
+the overflow reads of hydrate_all, and the multipart abort and session
+delete of abort-upload.
+delete-account and leave-feedback are left with one AWS call each,
+a conditional update and the SNS publish, so they have nothing to fan out.
+The handler sets the invocation's deadline, calls that are still running
+when it comes are abandoned with a TimeoutError instead of being cut off
+by the Lambda timeout.
+
+`call` goes through a client that never retries on its own: it retries
+throttling and transient errors itself, with backoff, only while there is time
+for another attempt. A timeout or a dropped connection leaves a write
+that may have been applied, so those are retried for reads and for writes
+the caller marks idempotent only. Idempotent reads can be hedged with
+a second request once the first has taken longer than the operation's recent p95.
+Writes go through `call` without hedging, a second request could apply twice.
+Hedges in flight are capped, so that a slow table cannot fill the attempt pool
+with duplicates; a call that finds the cap reached waits for its first request.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+import metrics
+from clients import dynamodb_once, max_attempts, pool_size, read_timeout
+
+# time kept for building the response after the calls
+deadline_margin: float = 0.25
+# off runs the calls one by one, for comparisons
+enabled = os.environ.get('API_CONCURRENCY', '1') == '1'
+
+# error codes worth another attempt, anything else, e.g. a failed condition, is raised at once
+retryable_errors = frozenset({
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable',
+})
+# operations a timed out attempt of can always be repeated, writes have to say so
+reads = frozenset({'get_item', 'batch_get_item', 'query', 'scan', 'transact_get_items'})
+backoff_base: float = 0.025
+backoff_cap: float = 0.5
+# no attempt is started with less time left
+min_attempt_time: float = 0.05
+# hedges wait at least this long, and this long until there are enough samples for a p95
+min_hedge_delay: float = 0.02
+default_hedge_delay: float = 0.1
+latency_samples: int = 200
+# second requests in flight at once, across the container's concurrent calls
+max_hedges = int(os.environ.get('API_MAX_HEDGES', max(1, pool_size // 4)))
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar('deadline', default=None)
+_pool: ThreadPoolExecutor | None = None
+# attempts of `call` get their own pool, a call made from a gathered function never waits for its own pool
+_attempt_pool: ThreadPoolExecutor | None = None
+# operation -> seconds taken by its recent successful attempts
+_latencies: dict[str, deque[float]] = {}
+_hedges = threading.BoundedSemaphore(max_hedges)
+
+
+def set_deadline(context) -> None:
+    """
+    :param context: Lambda context of the invocation, None leaves calls without a deadline
+    """
+    remaining = context.get_remaining_time_in_millis() / 1000 if context else None
+    _deadline.set(time.monotonic() + remaining - deadline_margin if remaining else None)
+
+
+def remaining() -> float | None:
+    """Seconds left until the deadline, None if there is none"""
+    deadline = _deadline.get()
+    return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='fan-out')
+    return _pool
+
+
+def gather(*calls: Callable[[], Any]) -> list:
+    """
+    Runs the calls concurrently and waits for all of them, or until the deadline.
+    Calls run with the caller's context variables, so nested gathers see the same deadline.
+
+    :param calls: functions without arguments, e.g. lambdas around client calls
+    :return: results, in the order of the calls
+    :raises Exception: the error of a failed call, or TimeoutError if the deadline
+        passes first; as is if there is one, so that e.g. NotFound still maps
+        to its status code, otherwise an ExceptionGroup of all of them
+    """
+    if not enabled or len(calls) < 2:
+        return [call() for call in calls]
+
+    futures = [_executor().submit(contextvars.copy_context().run, call) for call in calls]
+    done, pending = wait(futures, timeout=remaining())
+
+    errors = [each.exception() for each in done if each.exception()]
+    if pending:
+        errors.append(TimeoutError(f'{len(pending)} of {len(calls)} calls did not finish before the deadline'))
+    match errors:
+        case []:
+            return [each.result() for each in futures]
+        case [error]:
+            raise error
+    raise ExceptionGroup(f'{len(errors)} of {len(calls)} calls failed', errors)
+
+
+def _attempt_executor() -> ThreadPoolExecutor:
+    global _attempt_pool
+    if _attempt_pool is None:
+        _attempt_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='attempt')
+    return _attempt_pool
+
+
+def hedge_delay(operation: str) -> float:
+    """p95 of the operation's recent attempts"""
+    samples = _latencies.get(operation)
+    if not samples or len(samples) < 20:
+        return default_hedge_delay
+    return max(min_hedge_delay, sorted(samples)[int(len(samples) * 0.95)])
+
+
+def _timed(operation: str, params: dict) -> Any:
+    started = time.monotonic()
+    result = getattr(dynamodb_once, operation)(**params)
+    _latencies.setdefault(operation, deque(maxlen=latency_samples)).append(time.monotonic() - started)
+    return result
+
+
+def _attempt(operation: str, params: dict, timeout: float, hedge: bool) -> Any:
+    def submit() -> Future:
+        return _attempt_executor().submit(contextvars.copy_context().run, _timed, operation, params)
+
+    first = submit()
+    futures = [first]
+    ends_at = time.monotonic() + timeout
+    if hedge and (delay := hedge_delay(operation)) < timeout:
+        done, _ = wait(futures, timeout=delay)
+        if not done and _hedges.acquire(blocking=False):
+            metrics.count('Hedges', operation=operation)
+            hedged = submit()
+            hedged.add_done_callback(lambda _: _hedges.release())
+            futures.append(hedged)
+        elif not done:
+            metrics.count('HedgesSkipped', operation=operation)
+
+    errors = []
+    while futures:
+        done, pending = wait(futures, timeout=max(0.0, ends_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                if future is not first:
+                    metrics.count('HedgeWins', operation=operation)
+                return future.result()
+            errors.append(future.exception())
+        futures = list(pending)
+    if errors:
+        raise errors[0]
+    raise TimeoutError(f'{operation} did not finish in {timeout:.3f}s')
+
+
+def _retryable(error: Exception, idempotent: bool) -> bool:
+    match error:
+        case ClientError():
+            return error.response.get('Error', {}).get('Code') in retryable_errors
+        case ConnectionError() | HTTPClientError() | TimeoutError():
+            # the request may have been applied
+            return idempotent
+    return False
+
+
+def call(operation: str, *, hedge: bool = False, idempotent: bool = None, **params) -> Any:
+    """
+    Calls a DynamoDB operation within the invocation's deadline. Every attempt
+    is bounded by the time left, another attempt is only made if there is time for it.
+
+    :param operation: client method name, e.g. "get_item"
+    :param hedge: for idempotent reads only, send a second request if the first one
+        takes longer than the operation's recent p95, and use whichever returns first,
+        unless `max_hedges` are in flight already
+    :param idempotent: whether the operation can be applied twice, e.g. an unconditional
+        put; reads always can, writes are not retried after a timeout unless they say so
+    :param params: operation parameters
+    :return: operation response
+    :raises Exception: the operation's error, as a botocore client would raise it,
+        or TimeoutError if the deadline came first
+    """
+    if idempotent is None:
+        idempotent = operation in reads
+    for attempt in range(max_attempts):
+        left = remaining()
+        if left is not None and left < min_attempt_time:
+            metrics.count('DeadlineExceeded', operation=operation)
+            raise TimeoutError(f'No time left for {operation}')
+        try:
+            if left is None and not (hedge and enabled):
+                return _timed(operation, params)
+            return _attempt(operation, params, min(read_timeout, left or read_timeout), hedge and enabled)
+        except Exception as e:
+            if not _retryable(e, idempotent) or attempt == max_attempts - 1:
+                raise
+            delay = random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt))
+            if (left := remaining()) is not None and left < delay + min_attempt_time:
+                metrics.count('DeadlineExceeded', operation=operation)
+                raise
+            metrics.count('Retries', operation=operation)
+            time.sleep(delay)
@@ -5,6 +5,11 @@ class EmptyResponse(Exception):
     pass
 
 
+@dataclass
+class NotModified(Exception):
+    etag: str
+
+
 class Unauthorized(Exception):
     pass
 
@@ -19,6 +24,11 @@ class NotFound(Exception):
     path: str
 
 
+@dataclass
+class BadRequest(Exception):
+    message: str = None
+
+
 @dataclass
 class ProgrammingError(Exception):
     message: str
@@ -0,0 +1,143 @@
+import os
+from typing import Iterable
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from cache import cache
+from catalog import Catalog
+from clients import dynamodb
+from errors import BadRequest
+import metrics
+from models import User
+from search import Index
+from utils import page_size
+
+_table = os.environ['WORKOUTS_TABLE']
+# how long a warm container trusts its index before checking the catalog version
+_version_ttl = int(os.environ.get('CATALOG_VERSION_TTL', 60))
+
+default_page_size: int = 50
+max_page_size: int = 200
+
+_deserializer = TypeDeserializer()
+_index: Index | None = None
+_catalog = cache('catalog', ttl=_version_ttl, max_size=1)
+# names of the catalog as of the layer's build, see catalog.py, None without the layer
+_file = Catalog.open(os.environ.get('EXERCISE_CATALOG', '/opt/catalog/exercises.bin'))
+# (version, names) read from the table while the file is stale
+_names: tuple[int, frozenset[str]] | None = None
+
+
+def search_exercises(
+        *,
+        user: User,  # noqa
+        query: str = None,
+        category: str = None,
+        target: str = None,
+        limit: str = None,
+        cursor: str = None,
+) -> dict:
+    """
+    Searches the exercise catalog by name, tolerating typos and incomplete words.
+    The catalog is indexed in memory and reused across warm invocations.
+
+    :param user: request user
+    :param query: free-text search over exercise names
+    :param category: exact category filter, e.g. "Barbell"
+    :param target: exact target filter, e.g. "Legs"
+    :param limit: page size
+    :param cursor: opaque cursor from the previous page
+    :return: ranked page of exercises and the cursor of the next page, if any
+    """
+    index = _current_index()
+    found = index.search(query, category=category, target=target)
+
+    size = page_size(limit, default_page_size, max_page_size)
+    if not (cursor or '0').isdigit():
+        raise BadRequest('Malformed cursor')
+    start = int(cursor or 0)
+    page = found[start:start + size]
+    next_cursor = start + size if start + size < len(found) else None
+
+    return {
+        'exercises': [index.documents[i] for i in page],
+        'total': len(found),
+        'cursor': str(next_cursor) if next_cursor is not None else None,
+    }
+
+
+def catalog_version() -> int:
+    """
+    The catalog version is bumped by every catalog import,
+    see exercises/exercises.py
+
+    :return: current version, 0 if the catalog has never been versioned
+    """
+    item = dynamodb.get_item(
+        TableName=_table,
+        Key={
+            'PK': {'S': 'CATALOG'},
+            'SK': {'S': 'EXERCISE'},
+        },
+        ProjectionExpression='version',
+    ).get('Item')
+    return int(item['version']['N']) if item else 0
+
+
+def check_exercises(names: Iterable[str]) -> list[str]:
+    """
+    Checks exercise references against the catalog file of the layer while it has
+    the current catalog version, against the catalog in the table once it is stale.
+    Advisory only: users log custom exercises, and imports keep the names they
+    could not match, so names outside the catalog are counted, not rejected.
+    A table without a catalog, e.g. a new environment, knows no names to check.
+
+    :param names: exercise names a workout or template refers to
+    :return: the names that are not in the catalog, sorted
+    """
+    version = _catalog.get('version', catalog_version)
+    if _file is not None and _file.version == version:
+        known = _file
+    else:
+        known = _current_names(version)
+    if not len(known):
+        return []
+    unknown = sorted({each for each in names if each not in known})
+    if unknown:
+        metrics.count('CustomExercises', len(unknown))
+    return unknown
+
+
+def _current_names(version: int) -> frozenset[str]:
+    global _names
+
+    if _names is None or _names[0] != version:
+        _names = version, frozenset(each['name'] for each in _current_index().documents)
+    return _names[1]
+
+
+def _current_index() -> Index:
+    global _index
+
+    version = _catalog.get('version', catalog_version)
+    if _index is None or _index.version != version:
+        _index = Index.build(
+            _read_catalog(),
+            version=version,
+            facets=('category', 'target'),
+        )
+    return _index
+
+
+def _read_catalog() -> list[dict]:
+    documents = []
+    paginator = dynamodb.get_paginator('query')
+    for page in paginator.paginate(
+            TableName=_table,
+            KeyConditionExpression='PK = :PK',
+            ExpressionAttributeValues={':PK': {'S': 'EXERCISE'}},
+    ):
+        for item in page['Items']:
+            document = {k: _deserializer.deserialize(v) for k, v in item.items() if k not in ('PK', 'SK')}
+            documents.append({'name': item['SK']['S'], **document})
+    return documents
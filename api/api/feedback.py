@@ -14,7 +14,9 @@ def leave_feedback(*, user: User, message: str) -> dict:
     """
     Builds a pre-signed URL for screenshot upload,
     notifies the monitoring SNS topic
-    and returns the URL
+    and returns the URL.
+    Large screenshots can go through start-upload instead,
+    with the key in the link's fields.
 
     :param user: request user
     :param message: feedback user message
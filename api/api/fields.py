@@ -0,0 +1,168 @@
+"""
+Field selection for read operations: `fields=id,name,exercises.exercise`
+returns only those fields, at any depth, of every workout, summary or template.
+
+A selection does two things. It compiles to the ProjectionExpression of the
+operation's reads. DynamoDB projects nested attributes only at given list
+indexes, so that expression works on top-level attributes: `exercises.exercise`
+still reads `exercises` whole. It also encodes models straight into the
+trimmed response, without building the dicts of fields nobody asked for.
+Overflowed exercises are only fetched from S3 when exercises are selected.
+
+Selections change the response, not the data, so they get their own ETags,
+see revisions.etag.
+"""
+import zlib
+from dataclasses import dataclass
+from typing import Any
+
+from errors import BadRequest
+from utils import camel_to_snake
+
+# response field -> nested fields, None for a value without any
+Tree = dict[str, 'Tree | None']
+
+_set: Tree = {
+    'id': None,
+    'completed': None,
+    'reps': None,
+    'weight': None,
+    'duration': None,
+    'distance': None,
+}
+_exercise: Tree = {'id': None, 'exercise': None, 'sets': _set}
+
+
+@dataclass(frozen=True)
+class Shape:
+    """What a resource's response looks like and where its fields are stored"""
+    fields: Tree
+    # response field -> item attributes it is read from
+    attributes: dict[str, tuple[str, ...]]
+    # item attributes the model's from_item cannot do without
+    required: tuple[str, ...] = ('PK', 'SK')
+
+
+workout = Shape(
+    fields={'id': None, 'start': None, 'end': None, 'name': None, 'exercises': _exercise},
+    attributes={
+        'id': ('SK',),
+        'start': ('start',),
+        'end': ('end',),
+        'name': ('name',),
+        'exercises': ('exercises', 'exercisesKey'),
+    },
+    required=('PK', 'SK', 'start'),
+)
+template = Shape(
+    fields={'id': None, 'order': None, 'name': None, 'exercises': _exercise},
+    attributes={
+        'id': ('SK',),
+        'order': ('order',),
+        'name': ('name',),
+        'exercises': ('exercises', 'exercisesKey'),
+    },
+    # list-templates sorts by it
+    required=('PK', 'SK', 'order'),
+)
+summary = Shape(
+    fields={'id': None, 'start': None, 'end': None, 'name': None, 'exerciseCount': None, 'volume': None},
+    attributes={
+        'id': ('SK',),
+        'start': ('start',),
+        'end': ('end',),
+        'name': ('name',),
+        'exerciseCount': ('exerciseCount',),
+        'volume': ('volume',),
+    },
+    required=('PK', 'SK', 'start'),
+)
+
+
+@dataclass(frozen=True)
+class Fields:
+    shape: Shape
+    tree: Tree
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.tree
+
+    @property
+    def variant(self) -> str:
+        """Short digest of the selection, for ETags"""
+        return f'{zlib.crc32(_canonical(self.tree).encode()):08x}'
+
+    def projection(self) -> dict:
+        """ProjectionExpression and ExpressionAttributeNames of the selection, to pass to a read"""
+        attributes = dict.fromkeys(self.shape.required)
+        for field in self.tree:
+            attributes.update(dict.fromkeys(self.shape.attributes[field]))
+        # every name aliased, reserved words such as `name` and `end` included
+        names = {f'#p{i}': attribute for i, attribute in enumerate(attributes)}
+        return {
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names,
+        }
+
+    def encode(self, model) -> dict:
+        return _encode(model, self.tree)
+
+
+def parse(value: str | None, shape: Shape) -> Fields | None:
+    """
+    :param value: comma-separated dotted paths, as in the `fields` query parameter
+    :param shape: what the operation returns
+    :return: the selection, None for everything
+    :raises BadRequest: on fields the shape does not have
+    """
+    if not value or not value.strip():
+        return None
+
+    tree: Tree = {}
+    for path in filter(None, (each.strip() for each in value.split(','))):
+        node, available = tree, shape.fields
+        names = path.split('.')
+        for depth, name in enumerate(names):
+            if name not in available or (depth < len(names) - 1 and available[name] is None):
+                raise BadRequest(f'Unknown field {path}')
+            if depth == len(names) - 1:
+                node[name] = None
+                break
+            match node.setdefault(name, {}):
+                case None:
+                    # the whole value is selected already
+                    break
+                case child:
+                    node, available = child, available[name]
+    return Fields(shape, _ordered(tree, shape.fields)) if tree else None
+
+
+def projection(fields: Fields | None, shape: Shape) -> dict:
+    """Projection of the selection, or of every field of the shape"""
+    return (fields or Fields(shape, shape.fields)).projection()
+
+
+def encode(model, fields: Fields | None) -> dict:
+    """The model's response, trimmed to the selection if there is one"""
+    return fields.encode(model) if fields else model.to_dict()
+
+
+def _ordered(tree: Tree, fields: Tree) -> Tree:
+    # in the order of the full response, whatever the order of the parameter
+    return {
+        name: _ordered(tree[name], nested) if tree[name] is not None else None
+        for name, nested in fields.items()
+        if name in tree
+    }
+
+
+def _canonical(tree: Tree) -> str:
+    return ','.join(f'{name}({_canonical(nested)})' if nested else name for name, nested in tree.items())
+
+
+def _encode(value: Any, tree: Tree | None) -> Any:
+    if isinstance(value, list):
+        return [_encode(each, tree) for each in value]
+    if tree is None:
+        return value.to_dict() if hasattr(value, 'to_dict') else value
+    return {name: _encode(getattr(value, camel_to_snake(name)), nested) for name, nested in tree.items()}
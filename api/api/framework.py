@@ -10,10 +10,14 @@ _cors = {
     "Access-Control-Allow-Credentials": True,
     "Access-Control-Allow-Headers": "*",
     "Access-Control-Allow-Methods": "*",
+    "Access-Control-Expose-Headers": "ETag",
 }
 
 
-def response(status: int = 200, serializer=None, body=None) -> dict:
+def response(status: int = 200, serializer=None, body=None, headers: dict = None) -> dict:
+    """
+    :param body: dict, or what handlers return: (body, status) or (body, status, headers)
+    """
     match body:
         case None, code if isinstance(code, int):
             return {
@@ -23,10 +27,14 @@ def response(status: int = 200, serializer=None, body=None) -> dict:
         case d, code if isinstance(code, int) and isinstance(d, dict):
             status = code
             body = d
+        case d, code, extra if isinstance(code, int) and isinstance(d, dict):
+            status = code
+            body = d
+            headers = {**(headers or {}), **extra}
     payload = {'body': json.dumps(body, default=serializer)} if body else {}
     return {
         'statusCode': status,
-        'headers': _cors,
+        'headers': {**_cors, **(headers or {})},
         **payload,
     }
 
@@ -38,7 +46,8 @@ def request(event: dict) -> dict | None:
     Names in that dictionary will be in snake case.
 
     :param event: API Gateway event
-    :return: path, body and query params merged into a single dict
+    :return: path, body and query params merged into a single dict,
+        plus `if_none_match` if the request is conditional
     """
     match event:
         case {
@@ -49,14 +58,23 @@ def request(event: dict) -> dict | None:
         }:
             body = json.loads(body) if body else {}
             user = user_of(context)
+            # header names are case-insensitive, clients only send this one to operations that return an ETag
+            conditional = {
+                'if_none_match': v
+                for k, v in (event.get('headers') or {}).items()
+                if k.lower() == 'if-none-match'
+            }
             return {
-                camel_to_snake(k): v
-                for k, v in {
-                    **{'user': user},
-                    **(path or {}),
-                    **(query_params or {}),
-                    **body,
-                }.items()
+                **{
+                    camel_to_snake(k): v
+                    for k, v in {
+                        **{'user': user},
+                        **(path or {}),
+                        **(query_params or {}),
+                        **body,
+                    }.items()
+                },
+                **conditional,
             }
 
 
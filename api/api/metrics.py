@@ -0,0 +1,79 @@
+"""
+Per-invocation metrics in CloudWatch Embedded Metric Format:
+printed as one JSON log line per set of dimensions at the end of an invocation,
+CloudWatch extracts them from the log group, no API calls involved.
+
+`count` adds up to one value per invocation, so that percentiles are across
+requests, i.e. users; `observe` keeps every sample, for percentiles across
+the things measured, e.g. items.
+"""
+import json
+import os
+import threading
+import time
+
+namespace = os.environ.get('METRICS_NAMESPACE', 'Heart/Api')
+
+# (dimensions, name) -> (value, unit), dimensions being a sorted tuple of pairs
+_values: dict[tuple[tuple, str], tuple[float, str]] = {}
+# (dimensions, name) -> (samples, unit)
+_samples: dict[tuple[tuple, str], tuple[list[float], str]] = {}
+# EMF takes up to 100 values per metric and document
+max_samples = 100
+# gathered calls, and attempts abandoned at the deadline, record from other threads
+_lock = threading.Lock()
+
+
+def count(name: str, value: float = 1, unit: str = 'Count', **dimensions: str):
+    """Adds to a metric of the current invocation"""
+    key = (tuple(sorted(dimensions.items())), name)
+    with _lock:
+        total, _ = _values.get(key, (0, unit))
+        _values[key] = (total + value, unit)
+
+
+def observe(name: str, value: float, unit: str = 'None', **dimensions: str):
+    """Adds a sample to a metric of the current invocation"""
+    key = (tuple(sorted(dimensions.items())), name)
+    with _lock:
+        samples, _ = _samples.setdefault(key, ([], unit))
+        if len(samples) < max_samples:
+            samples.append(value)
+
+
+def snapshot() -> dict[tuple[tuple, str], float]:
+    with _lock:
+        return {key: value for key, (value, _) in _values.items()}
+
+
+def flush():
+    """Prints the metrics collected since the last flush and resets them"""
+    with _lock:
+        values, samples = dict(_values), dict(_samples)
+        _values.clear()
+        _samples.clear()
+
+    documents: dict[tuple, dict] = {}
+    for (dimensions, name), (value, unit) in values.items():
+        document = documents.setdefault(dimensions, {'metrics': [], 'values': {}})
+        document['metrics'].append({'Name': name, 'Unit': unit})
+        document['values'][name] = value
+    for (dimensions, name), (recorded, unit) in samples.items():
+        document = documents.setdefault(dimensions, {'metrics': [], 'values': {}})
+        document['metrics'].append({'Name': name, 'Unit': unit})
+        document['values'][name] = recorded
+
+    timestamp = int(time.time() * 1000)
+    for dimensions, document in documents.items():
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [[name for name, _ in dimensions]],
+                    'Metrics': document['metrics'],
+                }],
+            },
+            **dict(dimensions),
+            **document['values'],
+        }))
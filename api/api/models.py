@@ -7,6 +7,16 @@ _exercise_type = 'EXERCISE'
 _user_type = 'USER'
 _workout_type = 'WORKOUT'
 _template_type = 'TEMPLATE'
+_workout_summary_type = 'WSUM'
+
+
+def _number(record: dict, key: str) -> int | float | None:
+    match record.get(key):
+        case {'N': n} if '.' in n or 'e' in n.lower():
+            return float(n)
+        case {'N': n}:
+            return int(n)
+    return None
 
 
 @dataclass
@@ -97,8 +107,25 @@ class Set(DynamoModel):
         }
 
     @classmethod
-    def from_item(cls, record: dict):
-        pass
+    def from_item(cls, record: dict) -> Self:
+        return cls(
+            id=record['id']['S'],
+            completed=record.get('completed', {}).get('BOOL'),
+            reps=_number(record, 'reps'),
+            weight=_number(record, 'weight'),
+            duration=_number(record, 'duration'),
+            distance=_number(record, 'distance'),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'completed': self.completed,
+            'reps': self.reps,
+            'weight': self.weight,
+            'duration': self.duration,
+            'distance': self.distance,
+        }
 
     @classmethod
     def from_dict(cls, d: dict) -> Self:
@@ -130,7 +157,20 @@ class WorkoutExercise(DynamoModel):
 
     @classmethod
     def from_item(cls, record: dict) -> Self:
-        pass
+        return cls(
+            id=record['id']['S'],
+            exercise=record['exercise']['S'],
+            sets=[
+                Set.from_item(each['M']) for each in record.get('sets', {}).get('L', [])
+            ]
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'exercise': self.exercise,
+            'sets': [each.to_dict() for each in self.sets],
+        }
 
     @classmethod
     def from_dict(cls, d: dict) -> Self:
@@ -165,8 +205,27 @@ class Workout(TypedModelWithSortableKey):
         }
 
     @classmethod
-    def from_item(cls, record: dict):
-        pass
+    def from_item(cls, record: dict) -> Self:
+        return cls(
+            user_id=record['PK']['S'].removeprefix(f'{_user_type}#'),
+            start=record['start']['S'],
+            _id=record['SK']['S'].removeprefix(f'{_workout_type}#'),
+            end=record.get('end', {}).get('S'),
+            name=record.get('name', {}).get('S'),
+            exercises=[
+                WorkoutExercise.from_item(each['M'])
+                for each in record.get('exercises', {}).get('L', [])
+            ],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'start': self.start,
+            'end': self.end,
+            'name': self.name,
+            'exercises': [each.to_dict() for each in self.exercises],
+        }
 
     @classmethod
     def from_dict(cls, d: dict, user_id: str) -> Self:
@@ -199,6 +258,67 @@ class Workout(TypedModelWithSortableKey):
         return self._id
 
 
+@dataclass
+class WorkoutSummary(TypedModelWithSortableKey):
+    """What the history screen shows of a workout, kept next to it under WSUM#<start> by the background function"""
+    user_id: str
+    start: str
+    _id: str
+    end: str = None
+    name: str = None
+    exercise_count: int = 0
+    volume: float = 0
+
+    def _to_item(self) -> dict[str, Any]:
+        return {
+            'PK': self.pk,
+            'SK': self.sk,
+            'start': self.start,
+            'end': self.end,
+            'name': self.name,
+            'exerciseCount': self.exercise_count,
+            'volume': self.volume,
+        }
+
+    @classmethod
+    def from_item(cls, record: dict) -> Self:
+        return cls(
+            user_id=record['PK']['S'].removeprefix(f'{_user_type}#'),
+            start=record['start']['S'],
+            _id=record['SK']['S'].removeprefix(f'{_workout_summary_type}#'),
+            end=record.get('end', {}).get('S'),
+            name=record.get('name', {}).get('S'),
+            exercise_count=_number(record, 'exerciseCount') or 0,
+            volume=_number(record, 'volume') or 0,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'start': self.start,
+            'end': self.end,
+            'name': self.name,
+            'exerciseCount': self.exercise_count,
+            'volume': self.volume,
+        }
+
+    @property
+    def type(self) -> str:
+        return _workout_summary_type
+
+    @property
+    def pk(self) -> str:
+        return f'{_user_type}#{self.user_id}'
+
+    @property
+    def sk(self) -> str:
+        return f'{self.type}#{self.start}'
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+
 @dataclass
 class Template(TypedModelWithSortableKey):
     user_id: str
@@ -232,8 +352,25 @@ class Template(TypedModelWithSortableKey):
         )
 
     @classmethod
-    def from_item(cls, record: dict):
-        pass
+    def from_item(cls, record: dict) -> Self:
+        return cls(
+            user_id=record['PK']['S'].removeprefix(f'{_user_type}#'),
+            _id=record['SK']['S'].removeprefix(f'{_template_type}#'),
+            order=_number(record, 'order'),
+            name=record.get('name', {}).get('S'),
+            exercises=[
+                WorkoutExercise.from_item(each['M'])
+                for each in record.get('exercises', {}).get('L', [])
+            ],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'order': self.order,
+            'name': self.name,
+            'exercises': [each.to_dict() for each in self.exercises],
+        }
 
     @property
     def type(self) -> str:
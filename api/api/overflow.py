@@ -0,0 +1,43 @@
+"""
+Overflow of oversized workout and template items to S3, see storage/overflow.py
+in the layer for the format. Every item size is recorded as an ItemBytes sample
+by SK prefix as it is spilled.
+"""
+import metrics
+from clients import s3
+from concurrency import gather
+from storage import overflow
+from storage.sizes import item_size
+
+
+def spill(item: dict) -> dict:
+    """
+    :param item: serialized workout or template
+    :return: the item as is, or, above the threshold, its pointer item
+        after the exercises are written to S3
+    """
+    size = item_size(item)
+    metrics.observe('ItemBytes', size, 'Bytes', type=item['SK']['S'].partition('#')[0])
+    return overflow.spill(s3, item, size)
+
+
+def hydrate(item: dict) -> dict:
+    """The item with its exercises back in place, if they overflowed"""
+    return overflow.hydrate(s3, item)
+
+
+def hydrate_all(items: list[dict]) -> list[dict]:
+    """Hydrates the items that overflowed, fetching their payloads concurrently"""
+    spilled = [i for i, item in enumerate(items) if 'exercisesKey' in item]
+    if not spilled:
+        return items
+    hydrated = gather(*(lambda item=items[i]: hydrate(item) for i in spilled))
+    items = list(items)
+    for i, item in zip(spilled, hydrated):
+        items[i] = item
+    return items
+
+
+def discard(old: dict | None, new: dict | None = None):
+    """Deletes the payload of a replaced or deleted item, unless the new item still points at it"""
+    overflow.discard(s3, old, new)
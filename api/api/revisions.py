@@ -0,0 +1,76 @@
+"""
+Per-user revision of workouts and templates, for conditional GETs.
+
+Every write to a user's workouts or templates bumps `revision` on their
+ACCOUNT item in the same handler, once the write is done, so a client that
+polls right after its own write never gets a 304. Writes of derived data only,
+e.g. summaries of the stream consumer, bump it from the background function.
+List operations read the revision before anything else and send it as
+their ETag: a client whose If-None-Match matches gets a 304 for a single
+strongly consistent GetItem. The revision is read first, so data returned
+with an ETag is never older than the revision it names.
+"""
+import os
+
+from clients import dynamodb
+from concurrency import call
+from errors import NotModified
+
+_table = os.environ['WORKOUTS_TABLE']
+
+
+def current_revision(user_id: str) -> int:
+    item = call(
+        'get_item',
+        hedge=True,
+        TableName=_table,
+        Key={
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': 'ACCOUNT'},
+        },
+        ProjectionExpression='revision',
+        ConsistentRead=True,
+    ).get('Item', {})
+    return int(item.get('revision', {}).get('N', 0))
+
+
+def bump_revision(user_id: str):
+    """Call after the write has succeeded, never before"""
+    try:
+        call(
+            'update_item',
+            TableName=_table,
+            Key={
+                'PK': {'S': f'USER#{user_id}'},
+                'SK': {'S': 'ACCOUNT'},
+            },
+            UpdateExpression='ADD revision :one',
+            # never creates an account
+            ConditionExpression='attribute_exists(SK)',
+            ExpressionAttributeValues={':one': {'N': '1'}},
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        pass
+
+
+def etag(revision: int, variant: str = None) -> str:
+    """
+    :param revision: user's revision
+    :param variant: of the representation, e.g. a field selection, which a client
+        may cache next to the full response of the same revision
+    """
+    return f'"{revision}-{variant}"' if variant else f'"{revision}"'
+
+
+def conditional(user_id: str, if_none_match: str | None, variant: str = None) -> dict:
+    """
+    :param user_id: request user's id
+    :param if_none_match: If-None-Match header of the request, if any
+    :param variant: of the representation, see etag
+    :return: headers to send with the full response
+    :raises NotModified: if the client already has the current revision
+    """
+    tag = etag(current_revision(user_id), variant)
+    if if_none_match and tag in (each.strip().removeprefix('W/') for each in if_none_match.split(',')):
+        raise NotModified(tag)
+    return {'ETag': tag}
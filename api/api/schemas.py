@@ -0,0 +1,239 @@
+"""
+Request body decoders compiled from the JSON schemas
+of the API Gateway models in template.yaml.
+
+The gateway validates bodies only for the methods with a RequestValidator,
+and the Lambda used to walk them with ad-hoc dict lookups.
+Here every schema is turned once, at import, into a decoder function that
+validates and coerces the body and builds the model objects in a single pass.
+The schemas are read from schemas.json, which scripts/schemas.py extracts
+from template.yaml before every build, so the two cannot drift apart.
+"""
+import json
+import math
+import os
+from typing import Any, Callable
+
+from errors import BadRequest
+from models import Set, WorkoutExercise, Workout, Template
+
+Decoder = Callable[..., Any]
+
+
+class _Invalid(Exception):
+    """
+    Raised by the inner decoders, which do not track where they are in the body;
+    the location is prepended on the way up, so it costs nothing on valid input
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+        self.path = ''
+
+
+def _fail(expected: str, value: Any):
+    raise _Invalid(f'expected {expected}, got {type(value).__name__}')
+
+
+def _string(schema: dict) -> Decoder:
+    if 'enum' not in schema:
+        def decode(value):
+            if type(value) is not str:
+                _fail('string', value)
+            return value
+
+        return decode
+
+    options = frozenset(schema['enum'])
+
+    def decode(value):
+        if type(value) is not str:
+            _fail('string', value)
+        if value not in options:
+            raise _Invalid(f'{value!r} is not one of {sorted(options)}')
+        return value
+
+    return decode
+
+
+def _number(schema: dict, integer: bool) -> Decoder:
+    minimum = schema.get('minimum')
+    expected = 'integer' if integer else 'number'
+    accepted = (int,) if integer else (int, float)
+
+    def coerce(value):
+        match value:
+            case float() if value.is_integer():
+                return int(value)
+            case str():
+                try:
+                    number = int(value) if integer else float(value)
+                except ValueError:
+                    pass
+                else:
+                    # float() takes 'nan', 'inf' and '1e999'
+                    if math.isfinite(number):
+                        return number
+        _fail(expected, value)
+
+    def decode(value):
+        # bool is a subclass of int, hence the exact type check;
+        # json.loads decodes NaN and Infinity into floats
+        if type(value) not in accepted or type(value) is float and not math.isfinite(value):
+            value = coerce(value)
+        if minimum is not None and value < minimum:
+            raise _Invalid(f'must be at least {minimum}')
+        return value
+
+    return decode
+
+
+def _boolean(_: dict) -> Decoder:
+    def decode(value):
+        if type(value) is not bool:
+            _fail('boolean', value)
+        return value
+
+    return decode
+
+
+def _array(schema: dict) -> Decoder:
+    item = _compile(schema['items'])
+    maximum = schema.get('maxItems')
+
+    def decode(value):
+        if type(value) is not list:
+            _fail('array', value)
+        if maximum is not None and len(value) > maximum:
+            raise _Invalid(f'must hold at most {maximum} items')
+        i = 0
+        try:
+            result = []
+            for i, each in enumerate(value):
+                result.append(item(each))
+            return result
+        except _Invalid as e:
+            e.path = f'[{i}]{e.path}'
+            raise
+
+    return decode
+
+
+def _object(schema: dict, factory: Callable, names: dict[str, str]) -> Decoder:
+    # (JSON key, argument name, decoder) is precomputed for every property
+    properties = tuple(
+        (key, names.get(key, key), _compile(sub))
+        for key, sub in schema.get('properties', {}).items()
+    )
+    required = frozenset(schema.get('required', ()))
+
+    def decode(value, **extra):
+        if type(value) is not dict:
+            _fail('object', value)
+        key = None
+        try:
+            for key, name, sub in properties:
+                if (v := value.get(key)) is not None:
+                    extra[name] = sub(v)
+                elif key in required:
+                    raise _Invalid('required')
+        except _Invalid as e:
+            e.path = f'.{key}{e.path}'
+            raise
+        return factory(**extra)
+
+    return decode
+
+
+def _compile(schema: dict, factory: Callable = dict, names: dict[str, str] = None) -> Decoder:
+    match schema:
+        case {'$ref': name}:
+            return _model(name)
+    match schema.get('type'):
+        case 'object':
+            return _object(schema, factory, names or {})
+        case 'array':
+            return _array(schema)
+        case 'string':
+            return _string(schema)
+        case 'number':
+            return _number(schema, integer=False)
+        case 'integer':
+            return _number(schema, integer=True)
+        case 'boolean':
+            return _boolean(schema)
+    raise ValueError(f'Unsupported schema: {schema}')
+
+
+def _wrap(inner: Decoder, path: str) -> Decoder:
+    def decode(value, **extra):
+        try:
+            return inner(value, **extra)
+        except _Invalid as e:
+            raise BadRequest(f'{path}{e.path}: {e.message}')
+
+    return decode
+
+
+def compile_schema(
+        schema: dict,
+        factory: Callable = dict,
+        names: dict[str, str] = None,
+        path: str = '$',
+) -> Decoder:
+    """
+    Compiles a JSON schema (the subset used by the API Gateway models)
+    into a decoder function
+
+    :param schema: JSON schema, $refs name other models of schemas.json
+    :param factory: for objects, called with the decoded properties as keyword arguments
+    :param names: for objects, JSON key to argument name, where they differ
+    :param path: location of the schema in the body, used in error messages
+    :return: decoder(value, **extra), raises BadRequest on invalid input;
+        for objects, `extra` keyword arguments are passed to the factory
+    """
+    return _wrap(_compile(schema, factory, names), path)
+
+
+def _workout(_id: str = None, **properties) -> Workout:
+    # workout ids are their start timestamps, the model does not require one
+    return Workout(_id=_id or properties['start'], **properties)
+
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas.json')) as _f:
+    _schemas: dict[str, dict] = json.load(_f)
+
+# model name -> (factory, JSON key to argument name), models not listed decode into dicts
+_factories: dict[str, tuple[Callable, dict[str, str]]] = {
+    'Set': (Set, {}),
+    'WorkoutExercise': (WorkoutExercise, {}),
+    'Workout': (_workout, {'id': '_id'}),
+    'Template': (Template, {'id': '_id'}),
+}
+_models: dict[str, Decoder] = {}
+
+
+def _model(name: str) -> Decoder:
+    if name not in _models:
+        factory, names = _factories.get(name, (dict, {}))
+        _models[name] = _compile(_schemas[name], factory, names)
+    return _models[name]
+
+
+decode_workout = _wrap(_model('Workout'), '$')
+decode_template = _wrap(_model('Template'), '$')
+_decode_template_order = compile_schema(_schemas['TemplateOrder']['properties']['templates'], path='$.templates')
+
+
+def decode_template_order(value) -> list[dict]:
+    """
+    :raises BadRequest: on an invalid body, and on an id given twice,
+        which DynamoDB rejects within one transaction
+    """
+    templates = _decode_template_order(value)
+    seen = set()
+    for i, each in enumerate(templates):
+        if each['id'] in seen:
+            raise BadRequest(f'$.templates[{i}].id: duplicate of {each["id"]!r}')
+        seen.add(each['id'])
+    return templates
@@ -0,0 +1,121 @@
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+_non_word = re.compile(r'[^a-z0-9]+')
+
+# below this trigram similarity a name is not considered a match
+min_similarity: float = 0.3
+
+
+def normalize(s: str) -> str:
+    return _non_word.sub(' ', s.lower()).strip()
+
+
+def trigrams(s: str) -> set[str]:
+    """
+    Character trigrams of every word, padded
+    so that word boundaries weigh in, e.g.
+    >>> trigrams('row') == {'  r', ' ro', 'row', 'ow '}
+    """
+    grams = set()
+    for word in s.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass
+class Index:
+    """
+    Compact in-memory index over short documents, e.g. exercise names.
+    Documents are addressed by their position in `documents`.
+    Supports prefix and trigram (typo-tolerant) matching over the name
+    and exact filters over a fixed set of facets.
+    """
+    version: int
+    documents: list[dict]
+    names: list[str] = field(default_factory=list)
+    sizes: list[int] = field(default_factory=list)
+    grams: dict[str, list[int]] = field(default_factory=dict)
+    words: list[tuple[str, int]] = field(default_factory=list)
+    facets: dict[tuple[str, str], set[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, documents: list[dict], version: int, name: str = 'name', facets: tuple = ()) -> 'Index':
+        documents = sorted(documents, key=lambda d: d[name])
+        index = cls(version=version, documents=documents)
+
+        for i, document in enumerate(documents):
+            normalized = normalize(document[name])
+            grams = trigrams(normalized)
+            index.names.append(normalized)
+            index.sizes.append(len(grams))
+            for gram in grams:
+                index.grams.setdefault(gram, []).append(i)
+            index.words.extend((word, i) for word in normalized.split())
+            for facet in facets:
+                if value := document.get(facet):
+                    index.facets.setdefault((facet, value), set()).add(i)
+
+        index.words.sort()
+        return index
+
+    def _prefixed(self, prefix: str) -> set[int]:
+        found = set()
+        for word, i in self.words[bisect_left(self.words, (prefix,)):]:
+            if not word.startswith(prefix):
+                break
+            found.add(i)
+        return found
+
+    def search(self, query: str = None, **filters) -> list[int]:
+        """
+        Ranks documents against a free-text query.
+        Exact names come first, then names starting with the query,
+        then names with words starting with the query's words,
+        then fuzzy matches by trigram similarity.
+
+        :param query: free text, may be misspelled or incomplete
+        :param filters: facet=value pairs every result must match
+        :return: positions of matching documents, best first
+        """
+        allowed = None
+        for facet, value in filters.items():
+            if value is None:
+                continue
+            matching = self.facets.get((facet, value), set())
+            allowed = matching if allowed is None else allowed & matching
+
+        if not query or not (normalized := normalize(query)):
+            found = range(len(self.documents)) if allowed is None else sorted(allowed)
+            return list(found)
+
+        scores: dict[int, float] = {}
+
+        query_grams = trigrams(normalized)
+        shared: dict[int, int] = {}
+        for gram in query_grams:
+            for i in self.grams.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        for i, count in shared.items():
+            similarity = 2 * count / (len(query_grams) + self.sizes[i])
+            if similarity >= min_similarity:
+                scores[i] = similarity
+
+        words = normalized.split()
+        for word in words:
+            for i in self._prefixed(word):
+                scores[i] = scores.get(i, 0) + 1 / len(words)
+
+        for i in list(scores):
+            if self.names[i] == normalized:
+                scores[i] += 4
+            elif self.names[i].startswith(normalized):
+                scores[i] += 2
+
+        if allowed is not None:
+            scores = {i: score for i, score in scores.items() if i in allowed}
+
+        # positions follow name order, so ties stay alphabetical
+        return sorted(scores, key=lambda i: (-scores[i], i))
@@ -1,11 +1,214 @@
 import os
+import uuid
 
+from batches import batch_get
+from clients import dynamodb
+from concurrency import call
+from errors import BadRequest, EmptyResponse, NotFound
+from exercises import check_exercises
+import fields as selection
 from models import User, Template
+from overflow import discard, hydrate_all, spill
+from revisions import bump_revision, conditional
+from schemas import decode_template, decode_template_order
+from utils import decode_cursor, encode_cursor, id_list, page_size
 
 _table = os.environ['WORKOUTS_TABLE']
 
+default_page_size: int = 50
+max_page_size: int = 100
+max_batch_ids: int = 300
+
 
 def save_template(*, user: User, **body) -> tuple[dict | None, int]:
-    template = Template.from_dict(body, user_id=user.id)
-    template.save_as_non_null_item(table=_table)
+    template = decode_template(body, user_id=user.id)
+    check_exercises(each.exercise for each in template.exercises)
+    item = spill(template.to_item(exclude_nulls=True))
+    old = call(
+        'put_item',
+        TableName=_table,
+        Item=item,
+        ReturnValues='ALL_OLD',
+        # unconditional, a second attempt leaves the same item
+        idempotent=True,
+    ).get('Attributes')
+    discard(old, item)
+    bump_revision(user.id)
     return None, 201
+
+
+def delete_template(*, user: User, template_id: str) -> None:
+    """
+    :param user: request user
+    :param template_id: template id
+    :raises EmptyResponse: on success, whether the template existed or not
+    """
+    old = call(
+        'delete_item',
+        TableName=_table,
+        Key={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': f'TEMPLATE#{template_id}'},
+        },
+        ReturnValues='ALL_OLD',
+        idempotent=True,
+    ).get('Attributes')
+    discard(old)
+    bump_revision(user.id)
+    raise EmptyResponse
+
+
+def list_templates(
+        *,
+        user: User,
+        limit: str = None,
+        cursor: str = None,
+        fields: str = None,
+        if_none_match: str = None,
+) -> tuple[dict, int, dict]:
+    """
+    Lists user's templates sorted by their `order`.
+    Templates are keyed by id, so the order is applied after reading
+    the (small) TEMPLATE# range of the user's partition; the cursor
+    is the (order, id) of the last template of the previous page,
+    with a null order for templates that have none.
+
+    :param user: request user
+    :param limit: page size
+    :param cursor: opaque cursor from the previous page
+    :param fields: comma-separated fields to return, see fields.py
+    :param if_none_match: ETag of the page the client has
+    :return: a page of templates and the cursor of the next page, if any,
+        with the ETag of the user's current revision
+    :raises NotModified: if the client's page is current
+    """
+    size = page_size(limit, default_page_size, max_page_size)
+    selected = selection.parse(fields, selection.template)
+    headers = conditional(user.id, if_none_match, selected and selected.variant)
+
+    items = {
+        item['SK']['S'].removeprefix('TEMPLATE#'): item
+        for item in _read_templates(user.id, selected.projection() if selected else {})
+    }
+    templates = sorted((Template.from_item(item) for item in items.values()), key=_position)
+    if cursor:
+        match decode_cursor(cursor):
+            case {'order': None | int() | float() as order, 'id': str(_id)}:
+                after = (_rank(order), _id)
+                templates = [each for each in templates if _position(each) > after]
+            case _:
+                raise BadRequest('Malformed cursor')
+
+    page = templates[:size]
+    next_cursor = encode_cursor({'order': page[-1].order, 'id': page[-1].id}) if len(templates) > size else None
+
+    # only the page's templates need their overflowed exercises
+    found = [items[each.id] for each in page]
+    return {
+        'templates': [
+            selection.encode(Template.from_item(item), selected)
+            for item in (hydrate_all(found) if not selected or 'exercises' in selected else found)
+        ],
+        'cursor': next_cursor,
+    }, 200, headers
+
+
+def get_templates(*, user: User, ids: list[str], fields: str = None) -> dict:
+    """
+    Specific templates, for one item read each instead of reading them all
+
+    :param user: request user
+    :param ids: up to `max_batch_ids` template ids
+    :param fields: comma-separated fields to return, see fields.py
+    :return: the templates found, in the order of `ids`, and the ids of the others
+    """
+    ids = id_list(ids, max_batch_ids)
+    selected = selection.parse(fields, selection.template)
+    projection = selection.projection(selected, selection.template)
+    items = batch_get(
+        [{'PK': {'S': f'USER#{user.id}'}, 'SK': {'S': f'TEMPLATE#{each}'}} for each in ids],
+        projection['ProjectionExpression'],
+        projection['ExpressionAttributeNames'],
+    )
+    found = [items[f'TEMPLATE#{each}'] for each in ids if f'TEMPLATE#{each}' in items]
+    return {
+        'templates': [
+            selection.encode(Template.from_item(item), selected)
+            for item in (hydrate_all(found) if not selected or 'exercises' in selected else found)
+        ],
+        'missing': [each for each in ids if f'TEMPLATE#{each}' not in items],
+    }
+
+
+def reorder_templates(*, user: User, templates: list[dict]) -> None:
+    """
+    Updates only the `order` attribute of the given templates,
+    in a single transaction, so all of them or none.
+
+    :param user: request user
+    :param templates: [{"id": str, "order": int}, ...], up to 100 distinct ids,
+        the TransactWriteItems limit, see schemas.decode_template_order
+    :raises NotFound: if any of the templates does not exist,
+        none of them is updated then
+    :raises EmptyResponse: on success
+    """
+    templates = decode_template_order(templates)
+    updates = [
+        {
+            'Update': {
+                'TableName': _table,
+                'Key': {
+                    'PK': {'S': f'USER#{user.id}'},
+                    'SK': {'S': f'TEMPLATE#{each["id"]}'},
+                },
+                'UpdateExpression': 'SET #order = :order',
+                'ConditionExpression': 'attribute_exists(SK)',
+                'ExpressionAttributeNames': {'#order': 'order'},
+                'ExpressionAttributeValues': {':order': {'N': str(each['order'])}},
+            }
+        }
+        for each in templates
+    ]
+
+    try:
+        # the token makes a second attempt of the same transaction a no-op
+        call('transact_write_items', TransactItems=updates, ClientRequestToken=uuid.uuid4().hex, idempotent=True)
+    except dynamodb.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        missing = [
+            templates[position]['id']
+            for position, reason in enumerate(reasons)
+            if reason.get('Code') == 'ConditionalCheckFailed'
+        ]
+        if missing:
+            raise NotFound(f'templates {", ".join(missing)}')
+        raise
+
+    bump_revision(user.id)
+    raise EmptyResponse
+
+
+def _rank(order: int | float | None) -> int | float:
+    # templates without an order go last
+    return order if order is not None else float('inf')
+
+
+def _position(template: Template) -> tuple[int | float, str]:
+    return _rank(template.order), template.id
+
+
+def _read_templates(user_id: str, projection: dict = None) -> list[dict]:
+    paginator = dynamodb.get_paginator('query')
+    return [
+        item
+        for page in paginator.paginate(
+            TableName=_table,
+            KeyConditionExpression='PK = :PK AND begins_with(SK, :prefix)',
+            ExpressionAttributeValues={
+                ':PK': {'S': f'USER#{user_id}'},
+                ':prefix': {'S': 'TEMPLATE#'},
+            },
+            **(projection or {}),
+        )
+        for item in page['Items']
+    ]
@@ -0,0 +1,241 @@
+"""
+Resumable media uploads, on S3 multipart uploads.
+
+start-upload initiates the multipart upload and returns a presigned URL per part,
+each signed for the part's exact length. The client uploads parts in any order
+and in parallel, retries only the parts that failed and then calls complete-upload
+with the parts' ETags, which are checked against what S3 received before
+the upload is completed. Avatars land in the upload bucket with the destination
+tag, so media/process picks them up on completion as it does after a POST.
+
+Sessions are UPLOAD#<id> items of the user's partition, removed by the table's TTL.
+Multipart uploads left behind are aborted by the background function,
+see background/uploads.py.
+"""
+import math
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from clients import dynamodb, s3
+from concurrency import gather
+from errors import BadRequest, EmptyResponse, Forbidden, NotFound
+from models import User
+
+_table = os.environ['WORKOUTS_TABLE']
+_upload_bucket = os.environ['UPLOAD_BUCKET']
+_media_bucket = os.environ['MEDIA_BUCKET']
+
+# S3's minimum for all but the last part, small enough to retry cheaply on mobile networks
+part_size: int = 5_242_880  # 5 MB
+min_content_length: int = 128
+max_content_length: int = 31_457_280  # 30 MB max
+# presigned part URLs expire with the session
+session_lifetime = timedelta(hours=1)
+purposes = ('avatar', 'feedback')
+# content types accepted per purpose, the object is served with the one it was uploaded with
+_content_types = {
+    'avatar': re.compile(r'image/[a-z0-9][a-z0-9.+-]*'),
+    'feedback': re.compile(r'image/png'),
+}
+# served from the media bucket, and SVG can carry scripts
+_rejected_types = ('image/svg+xml',)
+
+
+def _destination(user: User, purpose: str, key: str | None) -> tuple[str, str, dict]:
+    """Bucket, key and extra create_multipart_upload arguments of an upload"""
+    match purpose:
+        case 'avatar':
+            # processed by media/process, which saves the result where the tag points
+            return _upload_bucket, f'avatars/{user.id}', {'Tagging': f'destination={_media_bucket}'}
+        case 'feedback' if key and key.startswith(f'feedback/{user.id}/'):
+            # the key of the screenshot leave-feedback reported
+            return _media_bucket, key, {}
+        case 'feedback':
+            raise Forbidden('Feedback uploads need the key returned by leave-feedback')
+    raise BadRequest(f'purpose must be one of {", ".join(purposes)}')
+
+
+def _content_type(purpose: str, mime_type: str) -> str:
+    if (
+            not isinstance(mime_type, str)
+            or not _content_types[purpose].fullmatch(mime_type)
+            or mime_type in _rejected_types
+    ):
+        raise BadRequest(f'mime_type {mime_type!r} is not allowed for {purpose} uploads')
+    return mime_type
+
+
+def _session_key(user: User, upload_id: str) -> dict:
+    return {
+        'PK': {'S': f'USER#{user.id}'},
+        'SK': {'S': f'UPLOAD#{upload_id}'},
+    }
+
+
+def start_upload(
+        *,
+        user: User,
+        purpose: str,
+        size: int,
+        mime_type: str = 'image/png',
+        key: str = None,
+) -> tuple[dict, int]:
+    """
+    :param user: request user
+    :param purpose: "avatar", or "feedback" for a screenshot of leave-feedback
+    :param size: file size in bytes
+    :param mime_type: content type of the file, image/png for feedback, any raster image/* for avatars
+    :param key: for feedback, the screenshot key leave-feedback returned
+    :return: upload id, part size and a presigned PUT URL per part
+    :raises BadRequest: on a size or content type out of bounds
+    """
+    if not isinstance(size, int) or not min_content_length <= size <= max_content_length:
+        raise BadRequest(f'size must be between {min_content_length} and {max_content_length} bytes')
+    bucket, key, extra = _destination(user, purpose, key)
+    content_type = _content_type(purpose, mime_type)
+
+    s3_upload_id = s3.create_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        ContentType=content_type,
+        **extra,
+    )['UploadId']
+
+    upload_id = uuid.uuid4().hex
+    count = math.ceil(size / part_size)
+    now = datetime.now(UTC)
+    expires = now + session_lifetime
+
+    def sign(number: int) -> dict:
+        length = min(part_size, size - (number - 1) * part_size)
+        url = s3.generate_presigned_url(
+            'upload_part',
+            Params={
+                'Bucket': bucket,
+                'Key': key,
+                'UploadId': s3_upload_id,
+                'PartNumber': number,
+                'ContentLength': length,
+            },
+            ExpiresIn=int(session_lifetime.total_seconds()),
+        )
+        return {'number': number, 'size': length, 'url': url}
+
+    dynamodb.put_item(
+        TableName=_table,
+        Item={
+            **_session_key(user, upload_id),
+            'status': {'S': 'started'},
+            'purpose': {'S': purpose},
+            'bucket': {'S': bucket},
+            'key': {'S': key},
+            'uploadId': {'S': s3_upload_id},
+            'size': {'N': str(size)},
+            'partSize': {'N': str(part_size)},
+            'parts': {'N': str(count)},
+            'createdAt': {'S': now.isoformat()},
+            'expiresAt': {'N': str(int((expires + session_lifetime).timestamp()))},
+        },
+    )
+    return {
+        'id': upload_id,
+        'key': key,
+        'partSize': part_size,
+        'parts': [sign(number) for number in range(1, count + 1)],
+        'expiresAt': expires.isoformat(),
+    }, 201
+
+
+def _get_session(user: User, upload_id: str) -> dict:
+    item = dynamodb.get_item(
+        TableName=_table,
+        Key=_session_key(user, upload_id),
+        ConsistentRead=True,
+    ).get('Item')
+    if not item:
+        raise NotFound(f'upload {upload_id}')
+    return item
+
+
+def complete_upload(*, user: User, upload_id: str, parts: list[dict]) -> dict:
+    """
+    Completes an upload once every part is there with the expected size,
+    and ETags match what the client got back for each part
+
+    :param user: request user
+    :param upload_id: id returned by start-upload
+    :param parts: [{"number": int, "etag": str}, ...], one per part
+    :return: upload id, status and the object's key
+    :raises BadRequest: on missing, unexpected or mismatched parts,
+        the upload stays open for the client to retry them
+    """
+    session = _get_session(user, upload_id)
+    bucket, key, s3_upload_id = session['bucket']['S'], session['key']['S'], session['uploadId']['S']
+    if session['status']['S'] == 'done':
+        return {'id': upload_id, 'status': 'done', 'key': key}
+
+    size, count, length = int(session['size']['N']), int(session['parts']['N']), int(session['partSize']['N'])
+    try:
+        claimed = {int(each['number']): each['etag'].strip('"') for each in parts}
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise BadRequest('parts must be a list of {"number": int, "etag": str}')
+    if sorted(claimed) != list(range(1, count + 1)):
+        raise BadRequest(f'Expected parts 1 to {count}')
+
+    received = {}
+    paginator = s3.get_paginator('list_parts')
+    for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=s3_upload_id):
+        for each in page.get('Parts', []):
+            received[each['PartNumber']] = (each['ETag'].strip('"'), each['Size'])
+
+    for number, etag in claimed.items():
+        expected = min(length, size - (number - 1) * length)
+        match received.get(number):
+            case None:
+                raise BadRequest(f'Part {number} was not uploaded')
+            case (actual, _) if actual != etag:
+                raise BadRequest(f'Part {number} does not match its ETag')
+            case (_, actual) if actual != expected:
+                raise BadRequest(f'Part {number} is {actual} bytes, expected {expected}')
+
+    s3.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=s3_upload_id,
+        MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': f'"{claimed[n]}"'} for n in sorted(claimed)]},
+    )
+    dynamodb.update_item(
+        TableName=_table,
+        Key=_session_key(user, upload_id),
+        UpdateExpression='SET #status = :done, completedAt = :now',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':done': {'S': 'done'},
+            ':now': {'S': datetime.now(UTC).isoformat()},
+        },
+    )
+    return {'id': upload_id, 'status': 'done', 'key': key}
+
+
+def abort_upload(*, user: User, upload_id: str) -> None:
+    """
+    :param user: request user
+    :param upload_id: id returned by start-upload
+    :raises EmptyResponse: on success
+    """
+    session = _get_session(user, upload_id)
+    if session['status']['S'] != 'done':
+        def abort():
+            try:
+                s3.abort_multipart_upload(
+                    Bucket=session['bucket']['S'],
+                    Key=session['key']['S'],
+                    UploadId=session['uploadId']['S'],
+                )
+            except s3.exceptions.NoSuchUpload:
+                pass
+
+        gather(abort, lambda: dynamodb.delete_item(TableName=_table, Key=_session_key(user, upload_id)))
+    raise EmptyResponse
@@ -1,3 +1,5 @@
+import base64
+import functools
 import json
 import os
 import re
@@ -5,19 +7,21 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Any
 
-import boto3
 from botocore.exceptions import ClientError
 
-from errors import ProgrammingError
+from cache import cache
+from clients import s3, sns, lambda_
+from errors import ProgrammingError, BadRequest
 
 camel_pattern = re.compile(r'(?<!^)(?=[A-Z])')
 
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
-
 monitoring_topic = os.environ['MONITORING_TOPIC']
 
+# upload links live for minutes, a retried request gets the same one
+_upload_policies = cache('presigned-policy', ttl=60, max_size=256)
+
 
+@functools.lru_cache(maxsize=1024)
 def camel_to_snake(s: str) -> str:
     return re.sub(camel_pattern, '_', s).lower()
 
@@ -32,6 +36,40 @@ def dash_to_snake(s: str) -> str:
     return s.replace('-', '_')
 
 
+def encode_cursor(key: dict) -> str:
+    """
+    Turns a pagination key, e.g. DynamoDB's LastEvaluatedKey,
+    into an opaque URL-safe string
+    """
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise BadRequest('Malformed cursor')
+
+
+def page_size(limit: str | int | None, default: int, maximum: int) -> int:
+    try:
+        size = int(limit or default)
+    except ValueError:
+        raise BadRequest('limit must be an integer')
+    if size < 1:
+        raise BadRequest('limit must be positive')
+    return min(size, maximum)
+
+
+def id_list(ids: Any, maximum: int) -> list[str]:
+    """Ids of a batch request, duplicates removed, in the order given"""
+    if not isinstance(ids, list) or not all(isinstance(each, str) and each for each in ids):
+        raise BadRequest('ids must be a list of strings')
+    if not 1 <= len(ids) <= maximum:
+        raise BadRequest(f'ids must hold between 1 and {maximum} ids')
+    return list(dict.fromkeys(ids))
+
+
 def custom_serializer(obj):
     match obj:
         case datetime():
@@ -64,19 +102,63 @@ def get_presigned_upload_link(
         fields: Dictionary of form fields and values to submit with the POST
     """
 
+    def generate() -> dict:
+        try:
+            return s3.generate_presigned_post(
+                bucket,
+                key,
+                ExpiresIn=expiration,
+                Conditions=conditions,
+                Fields=fields,
+
+            )
+        except ClientError as e:
+            raise ProgrammingError(f'{e}')
+
+    if expiration < 2 * _upload_policies.ttl:
+        return generate()
+    policy = (bucket, key, expiration, json.dumps(fields, sort_keys=True), json.dumps(conditions, sort_keys=True))
+    return _upload_policies.get(policy, generate)
+
+
+def get_presigned_download_link(bucket: str, key: str, expiration=3600, file_name: str = None) -> str:
+    """
+    Generates a presigned URL for an S3 GET request
+
+    :param bucket: AWS bucket to download from
+    :param key: object key
+    :param expiration: Time in seconds for the presigned URL to remain valid
+    :param file_name: suggested name for the downloaded file
+    :return: URL
+    """
+    disposition = {'ResponseContentDisposition': f'attachment; filename="{file_name}"'} if file_name else {}
     try:
-        return s3.generate_presigned_post(
-            bucket,
-            key,
+        return s3.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': bucket, 'Key': key, **disposition},
             ExpiresIn=expiration,
-            Conditions=conditions,
-            Fields=fields,
-
         )
     except ClientError as e:
         raise ProgrammingError(f'{e}')
 
 
+def start_background_job(function: str, event: str, payload: dict) -> dict:
+    """
+    Invokes the background function asynchronously,
+    in the same event format the scheduler uses
+
+    :param function: background function ARN
+    :param event: event name, e.g. "WorkoutExport"
+    :param payload: event payload
+    :return: Lambda invoke response
+    """
+    return lambda_.invoke(
+        FunctionName=function,
+        InvocationType='Event',
+        Payload=json.dumps({'Event': event, 'Payload': payload}).encode(),
+    )
+
+
 def delete_from_bucket(bucket: str, key: str) -> dict:
     return s3.delete_object(Bucket=bucket, Key=key)
 
@@ -1,11 +1,474 @@
 import os
+import uuid
+from datetime import datetime, timedelta, UTC
+from itertools import islice
+from typing import Iterator
 
-from models import User, Workout
+from archives import get_bundle, may_be_archived, merge, month_of, read_bundle, update_bundle
+from batches import batch_get
+from clients import dynamodb
+from concurrency import call, gather
+import fields as selection
+from errors import BadRequest, NotFound, Forbidden, EmptyResponse
+from exercises import check_exercises
+from models import User, Workout, WorkoutSummary
+from overflow import discard, hydrate, hydrate_all, spill
+from revisions import bump_revision, conditional
+from schemas import decode_workout
+from utils import (
+    decode_cursor,
+    encode_cursor,
+    get_presigned_download_link,
+    get_presigned_upload_link,
+    id_list,
+    page_size,
+    start_background_job,
+)
 
 _table = os.environ['WORKOUTS_TABLE']
+_background_function = os.environ['BACKGROUND_FUNCTION']
+_upload_bucket = os.environ['UPLOAD_BUCKET']
+
+export_formats = ('jsonl', 'csv')
+# export job records are removed by the table's TTL, the files by the bucket's lifecycle
+export_retention = timedelta(days=1)
+import_retention = timedelta(days=7)
+max_import_length: int = 52_428_800  # 50 MB
+default_page_size: int = 50
+max_page_size: int = 100
+max_batch_ids: int = 300
+
+
+def list_workouts(
+        *,
+        user: User,
+        limit: str = None,
+        cursor: str = None,
+        fields: str = None,
+        if_none_match: str = None,
+) -> tuple[dict, int, dict]:
+    """
+    User's workout history, oldest first, with archived months expanded:
+    all of it, as before pagination, unless the client asks for pages with
+    `limit` or follows a `cursor`. Bundles and workouts are read lazily from
+    where the cursor points, and only as far as the page goes, merged by start,
+    see archives.merge; only the page's overflowed exercises are fetched.
+
+    :param user: request user
+    :param limit: page size, the whole history in one response if neither it nor a cursor is given
+    :param cursor: opaque cursor from the previous page
+    :param fields: comma-separated fields to return, e.g. "id,start,exercises.exercise", see fields.py
+    :param if_none_match: ETag of the page the client has
+    :return: a page of workouts and the cursor of the next page, if any,
+        with the ETag of the user's current revision
+    :raises NotModified: if the client's page is current
+    """
+    # clients that predate pagination never send either
+    size = page_size(limit, default_page_size, max_page_size) if limit or cursor else None
+    after = None
+    if cursor:
+        match decode_cursor(cursor):
+            case {'start': str(start)}:
+                after = start
+            case _:
+                raise BadRequest('Malformed cursor')
+
+    selected = selection.parse(fields, selection.workout)
+    headers = conditional(user.id, if_none_match, selected and selected.variant)
+    query_page = size + 1 if size else None
+    workouts = merge(
+        _read(user.id, f'ARCHIVE#{month_of(after)}' if after else 'ARCHIVE#', 'ARCHIVE$', query_page),
+        _read(user.id, f'WORKOUT#{after}' if after else 'WORKOUT#', 'WORKOUT$', query_page,
+              selected.projection() if selected else {}),
+    )
+    if after:
+        # bundles hold whole months, including the part of the cursor's month already returned
+        workouts = (each for each in workouts if each['SK']['S'] > f'WORKOUT#{after}')
+    items = list(islice(workouts, size + 1) if size else workouts)
+
+    page = items[:size]
+    last = page[-1]['SK']['S'].removeprefix('WORKOUT#') if size and len(items) > size else None
+    return {
+        'workouts': [
+            selection.encode(Workout.from_item(item), selected)
+            for item in (hydrate_all(page) if not selected or 'exercises' in selected else page)
+        ],
+        'cursor': encode_cursor({'start': last}) if last else None,
+    }, 200, headers
+
+
+def list_workout_summaries(
+        *,
+        user: User,
+        limit: str = None,
+        cursor: str = None,
+        fields: str = None,
+        if_none_match: str = None,
+) -> tuple[dict, int, dict]:
+    """
+    A page of user's workout summaries, newest first. Summaries are small
+    WSUM# items kept up to date from the table's stream by the background
+    function, full workouts are read one at a time with get-workout.
+
+    :param user: request user
+    :param limit: page size
+    :param cursor: opaque cursor from the previous page
+    :param fields: comma-separated fields to return, see fields.py
+    :param if_none_match: ETag of the page the client has
+    :return: a page of summaries and the cursor of the next page, if any,
+        with the ETag of the user's current revision
+    :raises NotModified: if the client's page is current
+    """
+    size = page_size(limit, default_page_size, max_page_size)
+    after = {}
+    if cursor:
+        match decode_cursor(cursor):
+            case {'start': str(start)}:
+                after = {'ExclusiveStartKey': {'PK': {'S': f'USER#{user.id}'}, 'SK': {'S': f'WSUM#{start}'}}}
+            case _:
+                raise BadRequest('Malformed cursor')
+
+    selected = selection.parse(fields, selection.summary)
+    headers = conditional(user.id, if_none_match, selected and selected.variant)
+    response = dynamodb.query(
+        TableName=_table,
+        KeyConditionExpression='PK = :PK AND begins_with(SK, :prefix)',
+        ExpressionAttributeValues={
+            ':PK': {'S': f'USER#{user.id}'},
+            ':prefix': {'S': 'WSUM#'},
+        },
+        ScanIndexForward=False,
+        Limit=size,
+        **after,
+        **(selected.projection() if selected else {}),
+    )
+    last = response.get('LastEvaluatedKey')
+    return {
+        'workouts': [selection.encode(WorkoutSummary.from_item(item), selected) for item in response['Items']],
+        'cursor': encode_cursor({'start': last['SK']['S'].removeprefix('WSUM#')}) if last else None,
+    }, 200, headers
+
+
+def get_workout(*, user: User, workout_id: str, fields: str = None) -> dict:
+    """
+    :param user: request user
+    :param workout_id: workout id, its start timestamp
+    :param fields: comma-separated fields to return, see fields.py
+    :return: the workout, wherever it is stored, as bundled if its month is archived
+    :raises NotFound: if there is no such workout
+    """
+    selected = selection.parse(fields, selection.workout)
+    sk = f'WORKOUT#{workout_id}'
+    item = None
+    if may_be_archived(workout_id) and (bundle := get_bundle(user.id, month_of(workout_id))):
+        item = next((each for each in read_bundle(bundle) if each['SK']['S'] == sk), None)
+    if not item:
+        item = dynamodb.get_item(
+            TableName=_table,
+            Key={
+                'PK': {'S': f'USER#{user.id}'},
+                'SK': {'S': sk},
+            },
+            **(selected.projection() if selected else {}),
+        ).get('Item')
+    if not item:
+        raise NotFound(f'workout {workout_id}')
+    if not selected or 'exercises' in selected:
+        item = hydrate(item)
+    return selection.encode(Workout.from_item(item), selected)
+
+
+def get_workouts(*, user: User, ids: list[str], fields: str = None) -> dict:
+    """
+    Specific workouts, e.g. those a push notification or a conflict report names,
+    for one item read each instead of a query of the whole history
+
+    :param user: request user
+    :param ids: up to `max_batch_ids` workout ids
+    :param fields: comma-separated fields to return, see fields.py
+    :return: the workouts found, in the order of `ids`, and the ids of the others
+    """
+    ids = id_list(ids, max_batch_ids)
+    selected = selection.parse(fields, selection.workout)
+    projection = selection.projection(selected, selection.workout)
+    items = batch_get(
+        [{'PK': {'S': f'USER#{user.id}'}, 'SK': {'S': f'WORKOUT#{each}'}} for each in ids],
+        projection['ProjectionExpression'],
+        projection['ExpressionAttributeNames'],
+    )
+    # archived workouts are in their month's bundle, read once per month,
+    # which wins over a stale standalone copy
+    wanted = {f'WORKOUT#{each}' for each in ids}
+    months = sorted({month_of(each) for each in ids if may_be_archived(each)})
+    for bundle in gather(*(lambda month=month: get_bundle(user.id, month) for month in months)):
+        for item in read_bundle(bundle) if bundle else []:
+            if item['SK']['S'] in wanted:
+                items[item['SK']['S']] = item
+
+    found = [items[f'WORKOUT#{each}'] for each in ids if f'WORKOUT#{each}' in items]
+    return {
+        'workouts': [
+            selection.encode(Workout.from_item(item), selected)
+            for item in (hydrate_all(found) if not selected or 'exercises' in selected else found)
+        ],
+        'missing': [each for each in ids if f'WORKOUT#{each}' not in items],
+    }
 
 
 def save_workout(*, user: User, **body) -> tuple[dict | None, int]:
-    workout = Workout.from_dict(body, user_id=user.id)
-    workout.save_as_non_null_item(table=_table)
+    workout = decode_workout(body, user_id=user.id)
+    check_exercises(each.exercise for each in workout.exercises)
+    item = spill(workout.to_item(exclude_nulls=True))
+    replaced = {}
+
+    def put(items: dict[str, dict]) -> bool:
+        replaced['item'] = items.get(workout.sk)
+        items[workout.sk] = item
+        return True
+
+    # an edit of an archived workout goes into its bundle, and a stale standalone copy goes away
+    if may_be_archived(workout.start) and update_bundle(user.id, month_of(workout.start), put):
+        stale = call(
+            'delete_item',
+            TableName=_table,
+            Key={'PK': item['PK'], 'SK': item['SK']},
+            ReturnValues='ALL_OLD',
+            idempotent=True,
+        ).get('Attributes')
+        discard(stale, item)
+    else:
+        replaced['item'] = call(
+            'put_item',
+            TableName=_table,
+            Item=item,
+            ReturnValues='ALL_OLD',
+            idempotent=True,
+        ).get('Attributes')
+    discard(replaced.get('item'), item)
+    bump_revision(user.id)
     return None, 201
+
+
+def delete_workout(*, user: User, workout_id: str) -> None:
+    """
+    Deletes a workout, whether it is stored on its own or in an archive bundle
+
+    :param user: request user
+    :param workout_id: workout id, its start timestamp
+    :raises EmptyResponse: on success, whether the workout existed or not
+    """
+    sk = f'WORKOUT#{workout_id}'
+    deleted = call(
+        'delete_item',
+        TableName=_table,
+        Key={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': sk},
+        },
+        ReturnValues='ALL_OLD',
+        idempotent=True,
+    ).get('Attributes')
+
+    def remove(items: dict[str, dict]) -> bool:
+        nonlocal deleted
+        if (popped := items.pop(sk, None)) is None:
+            return False
+        deleted = popped
+        return True
+
+    if may_be_archived(workout_id):
+        update_bundle(user.id, month_of(workout_id), remove)
+    discard(deleted)
+    bump_revision(user.id)
+    raise EmptyResponse
+
+
+def _read(user_id: str, first: str, last: str, page: int | None, projection: dict = None) -> Iterator[dict]:
+    """
+    Items of a user's SK range, one query page at a time, as the caller consumes them;
+    '$' sorts right after '#', so e.g. 'WORKOUT$' bounds the WORKOUT# prefix
+
+    :param page: items per query, as many as fit into a response if None
+    :param projection: of the items, bundles are always read whole
+    """
+    paginator = dynamodb.get_paginator('query')
+    for response in paginator.paginate(
+            TableName=_table,
+            KeyConditionExpression='PK = :PK AND SK BETWEEN :first AND :last',
+            ExpressionAttributeValues={
+                ':PK': {'S': f'USER#{user_id}'},
+                ':first': {'S': first},
+                ':last': {'S': last},
+            },
+            **({'PaginationConfig': {'PageSize': page}} if page else {}),
+            **(projection or {}),
+    ):
+        yield from response['Items']
+
+
+def export_workouts(*, user: User, format: str = 'jsonl') -> tuple[dict, int]:  # noqa
+    """
+    Starts a background job that writes user's whole workout history to S3.
+    Poll get-export with the returned id for the download link.
+
+    :param user: request user
+    :param format: "jsonl", one workout per line, or "csv", one set per row
+    :return: export job id and status
+    """
+    if format not in export_formats:
+        raise BadRequest(f'format must be one of {", ".join(export_formats)}')
+
+    export_id = uuid.uuid4().hex
+    now = datetime.now(UTC)
+    dynamodb.put_item(
+        TableName=_table,
+        Item={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': f'EXPORT#{export_id}'},
+            'status': {'S': 'pending'},
+            'format': {'S': format},
+            'createdAt': {'S': now.isoformat()},
+            'expiresAt': {'N': str(int((now + export_retention).timestamp()))},
+        },
+    )
+    start_background_job(
+        _background_function,
+        'WorkoutExport',
+        {'user_id': user.id, 'export_id': export_id, 'format': format},
+    )
+    return {'id': export_id, 'status': 'pending'}, 202
+
+
+def get_export(*, user: User, export_id: str) -> dict:
+    """
+    Status of an export job, with a presigned download link once it's done
+
+    :param user: request user
+    :param export_id: id returned by export-workouts
+    :return: export job description
+    """
+    item = dynamodb.get_item(
+        TableName=_table,
+        Key={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': f'EXPORT#{export_id}'},
+        },
+    ).get('Item')
+    if not item:
+        raise NotFound(f'export {export_id}')
+
+    status = item['status']['S']
+    export = {'id': export_id, 'status': status, 'format': item['format']['S']}
+    match status:
+        case 'done':
+            return {
+                **export,
+                'link': get_presigned_download_link(
+                    _upload_bucket,
+                    item['key']['S'],
+                    file_name=f'workouts.{item["format"]["S"]}',
+                ),
+                'workouts': int(item['workouts']['N']),
+                'rows': int(item['rows']['N']),
+                'bytes': int(item['bytes']['N']),
+            }
+        case 'failed':
+            return {**export, 'error': item.get('error', {}).get('S')}
+    return export
+
+
+def import_workouts(*, user: User) -> tuple[dict, int]:
+    """
+    First step of a workout history import: returns a presigned link
+    to upload a CSV export from another tracker (or from export-workouts).
+    Once uploaded, the client calls start-import with the returned id.
+
+    :param user: request user
+    :return: import id and the upload link
+    """
+    import_id = uuid.uuid4().hex
+    now = datetime.now(UTC)
+    dynamodb.put_item(
+        TableName=_table,
+        Item={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': f'IMPORT#{import_id}'},
+            'status': {'S': 'awaiting-upload'},
+            'createdAt': {'S': now.isoformat()},
+            'expiresAt': {'N': str(int((now + import_retention).timestamp()))},
+        },
+    )
+    link = get_presigned_upload_link(
+        bucket=_upload_bucket,
+        key=f'imports/{user.id}/{import_id}.csv',
+        fields={'Content-Type': 'text/csv'},
+        conditions=[
+            ['content-length-range', 1, max_import_length],
+            {'Content-Type': 'text/csv'},
+        ],
+    )
+    return {'id': import_id, 'upload': link}, 201
+
+
+def start_import(*, user: User, import_id: str) -> tuple[dict, int]:
+    """
+    Queues the background job that parses the uploaded file and writes the workouts
+
+    :param user: request user
+    :param import_id: id returned by import-workouts
+    :return: import id and status
+    """
+    try:
+        dynamodb.update_item(
+            TableName=_table,
+            Key={
+                'PK': {'S': f'USER#{user.id}'},
+                'SK': {'S': f'IMPORT#{import_id}'},
+            },
+            UpdateExpression='SET #status = :queued',
+            ConditionExpression='#status = :awaiting',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':queued': {'S': 'queued'},
+                ':awaiting': {'S': 'awaiting-upload'},
+            },
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        raise Forbidden(f'Import {import_id} does not exist or has already started')
+
+    start_background_job(
+        _background_function,
+        'WorkoutImport',
+        {'user_id': user.id, 'import_id': import_id},
+    )
+    return {'id': import_id, 'status': 'queued'}, 202
+
+
+def get_import(*, user: User, import_id: str) -> dict:
+    """
+    Status and progress of an import job
+
+    :param user: request user
+    :param import_id: id returned by import-workouts
+    :return: import job description
+    """
+    item = dynamodb.get_item(
+        TableName=_table,
+        Key={
+            'PK': {'S': f'USER#{user.id}'},
+            'SK': {'S': f'IMPORT#{import_id}'},
+        },
+    ).get('Item')
+    if not item:
+        raise NotFound(f'import {import_id}')
+
+    return {
+        'id': import_id,
+        'status': item['status']['S'],
+        'workouts': int(item.get('workouts', {}).get('N', 0)),
+        'rows': int(item.get('rows', {}).get('N', 0)),
+        'skipped': int(item.get('skipped', {}).get('N', 0)),
+        'duplicates': int(item.get('duplicates', {}).get('N', 0)),
+        'unmatched': sorted(item.get('unmatched', {}).get('SS', [])),
+        'error': item.get('error', {}).get('S'),
+    }
@@ -12,6 +12,7 @@ firebase_admin.initialize_app(cred)
 
 Effect = Literal['Allow', 'Deny']
 region = os.environ['AWS_REGION']
+max_batch_deletion: int = 1000
 
 
 @dataclass
@@ -102,5 +103,17 @@ def handler(event, _):
             except UserNotFoundError:
                 pass
             return {'message': f'Account {user_id} deleted from Firebase'}
+        case {
+            'Event': 'AccountsDeletion',
+            'Payload': {'user_ids': user_ids},
+        }:
+            # delete_users takes up to 1000 ids, users that don't exist count as deleted
+            deleted, failed = 0, []
+            for i in range(0, len(user_ids), max_batch_deletion):
+                chunk = user_ids[i:i + max_batch_deletion]
+                result = auth.delete_users(chunk)
+                deleted += result.success_count
+                failed.extend({'id': chunk[error.index], 'reason': error.reason} for error in result.errors)
+            return {'deleted': deleted, 'failed': failed}
 
     raise ValueError(event)
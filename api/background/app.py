@@ -1,88 +1,146 @@
 import json
 import os
-from datetime import datetime, timezone
 
 import boto3
-from dynamo import db
+from botocore.config import Config
+
+import capacity
+from archives import accounts, archive_workouts
+from deletions import purge, sweep
+from exports import export_workouts
+from imports import import_workouts
+from snapshots import build_snapshot
+from streams import process
+from summaries import backfill_summaries
+from uploads import abort_stale_uploads
 
-table = os.environ['WORKOUTS_TABLE']
-avatar_bucket = os.environ['MEDIA_BUCKET']
 auth_function = os.environ['AUTH_FUNCTION']
 
-s3 = boto3.client('s3')
-lambda_ = boto3.client('lambda')
+_config = Config(
+    max_pool_connections=int(os.environ.get('AWS_POOL_SIZE', 16)),
+    tcp_keepalive=True,
+    connect_timeout=1,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+)
 
+s3 = boto3.client('s3', config=_config)
+# the authorizer is called synchronously, give it its whole timeout
+lambda_ = boto3.client('lambda', config=_config.merge(Config(read_timeout=10, retries={'max_attempts': 1})))
 
-def delete_account(user_id: str):
-    delete_avatar(user_id)
-    print(f'Deleted avatar from {avatar_bucket}')
 
-    delete_from_table(user_id)
-    print(f'Deleted account from {table}')
-
-
-def delete_from_table(account_id: str) -> dict:
-    db().delete_item(
-        TableName=table,
-        Key={
-            'PK': {'S': f'USER#{account_id}'},
-            'SK': {'S': 'ACCOUNT'}
-        },
-    )
-
-    return db().update_item(
-        TableName=table,
-        Key={
-            'PK': {'S': f'USER#{account_id}'},
-            'SK': {'S': 'ACCOUNT'}
-        },
-        UpdateExpression='SET #ts = :deletedAt',
-        ExpressionAttributeNames={
-            '#ts': 'deletedAt',
-        },
-        ExpressionAttributeValues={
-            ':deletedAt': {'S': datetime.now(timezone.utc).isoformat()},
-        },
-    )
-
-
-def delete_avatar(account_id: str) -> dict:
-    return s3.delete_object(
-        Bucket=avatar_bucket,
-        Key=f'avatars/{account_id}',
+def call_lambda(function_name: str, event: dict) -> dict | None:
+    """
+    :return: what the function returned, {} if nothing
+    :raises RuntimeError: if the function raised, with the error it returned
+    """
+    body = json.dumps(event).encode('utf-8')
+    response = lambda_.invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=body,
     )
 
-
-def call_lambda(function_name: str, event: dict) -> dict | None:
+    payload = response['Payload'].read()
+    # an unhandled error in the function still comes back as a 200, with the error as the payload
+    if error := response.get('FunctionError'):
+        raise RuntimeError(f'{function_name} failed ({error}): {payload.decode("utf-8", "replace")}')
     try:
-        body = json.dumps(event).encode('utf-8')
-        response = lambda_.invoke(
-            FunctionName=function_name,
-            InvocationType='RequestResponse',
-            Payload=body,
-        )
-
-        payload = response['Payload'].read()
         return json.loads(payload.decode('utf-8'))
     except json.JSONDecodeError as error:
         if error.pos == 0:
             return {}
         raise
-    except Exception:
-        raise
+
+
+def fan_out(context, event_name: str) -> int:
+    """Starts one asynchronous invocation of this function per user"""
+    count = 0
+    for user_id in accounts():
+        lambda_.invoke(
+            FunctionName=context.function_name,
+            InvocationType='Event',
+            Payload=json.dumps({'Event': event_name, 'Payload': {'user_id': user_id}}).encode(),
+        )
+        count += 1
+    return count
 
 
 def handler(event: dict, context) -> dict:
-    print(event)
+    capacity.start('Stream' if 'Records' in event else event.get('Event', 'unknown'))
+    try:
+        return _handle(event, context)
+    finally:
+        capacity.flush()
+
+
+def _handle(event: dict, context) -> dict:
+    # stream batches carry whole item images, their processing is logged instead
+    if 'Records' not in event:
+        print(event)
 
     match event:
+        case {'Records': [{'eventSource': 'aws:dynamodb'}, *_] as records}:
+            # projections register themselves on import, see summaries.py
+            return process(s3, records)
         case {
             'Event': 'AccountDeletion',
             'Payload': {'user_id': user_id},
         }:
-            delete_account(user_id)
+            # scheduled before the sweeper existed, one schedule per account
+            purge(s3, user_id)
             r = call_lambda(auth_function, event)
             print(f'On deleting {user_id} from Firebase Auth: {r}')
+        case {'Event': 'AccountSweep'}:
+            stats = sweep(
+                s3,
+                lambda user_ids: call_lambda(
+                    auth_function,
+                    {'Event': 'AccountsDeletion', 'Payload': {'user_ids': user_ids}},
+                ),
+                context.get_remaining_time_in_millis,
+            )
+            print(f'Swept accounts due for deletion: {stats}')
+        case {
+            'Event': 'WorkoutExport',
+            'Payload': {'user_id': user_id, 'export_id': export_id, 'format': format_},
+        }:
+            stats = export_workouts(s3, user_id, export_id, format_)
+            print(f'Exported workouts of {user_id}: {stats}')
+        case {
+            'Event': 'WorkoutImport',
+            'Payload': {'user_id': user_id, 'import_id': import_id},
+        }:
+            progress = import_workouts(s3, user_id, import_id)
+            print(f'Imported workouts of {user_id}: {progress}')
+        case {
+            'Event': 'SnapshotBuild',
+            'Payload': {'user_id': user_id},
+        }:
+            snapshot = build_snapshot(s3, user_id)
+            print(f'Built snapshot of {user_id}: {snapshot}')
+        case {
+            'Event': 'WorkoutArchival',
+            'Payload': {'user_id': user_id},
+        }:
+            stats = archive_workouts(s3, user_id)
+            print(f'Archived workouts of {user_id}: {stats}')
+        case {'Event': 'WorkoutArchival'}:
+            # the scheduled run fans out one invocation per user
+            count = fan_out(context, 'WorkoutArchival')
+            print(f'Started archival for {count} users')
+        case {
+            'Event': 'SummaryBackfill',
+            'Payload': {'user_id': user_id},
+        }:
+            count = backfill_summaries(s3, user_id)
+            print(f'Wrote {count} workout summaries of {user_id}')
+        case {'Event': 'SummaryBackfill'}:
+            # started by hand once, after deploying summaries
+            count = fan_out(context, 'SummaryBackfill')
+            print(f'Started summary backfill for {count} users')
+        case {'Event': 'UploadCleanup'}:
+            count = abort_stale_uploads(s3)
+            print(f'Aborted {count} stale multipart uploads')
     try:
         return {'statusCode': 200}
     except Exception as e:
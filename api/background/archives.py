@@ -0,0 +1,101 @@
+"""
+Rolls whole months of workouts older than the archive age into ARCHIVE#<yyyy-mm> bundles,
+see storage/bundles.py in the layer for the format
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from typing import Iterable, Iterator
+
+from dynamo import db
+from storage import bundles
+from storage.overflow import hydrate
+
+from batches import RateLimiter, batch_write
+
+table = os.environ['WORKOUTS_TABLE']
+
+archive_age = timedelta(days=int(os.environ.get('ARCHIVE_AFTER_DAYS', 365)))
+# items per second, the job runs for every user at once
+write_rate = float(os.environ.get('ARCHIVE_WRITE_RATE', 100))
+
+
+def archived_through() -> str:
+    """Months before this one are archived"""
+    return (datetime.now(timezone.utc) - archive_age).isoformat()[:7]
+
+
+def expand(s3, items: Iterable[dict]) -> Iterator[dict]:
+    """
+    Items of a user partition in SK order, with bundles replaced by their workout items
+    and overflowed exercises read back. A workout caught between being bundled
+    and being deleted is returned once, as bundled.
+    """
+    for item in bundles.expand(s3, items):
+        yield hydrate(s3, item)
+
+
+def _old_workouts(user_id: str, before: str) -> Iterator[dict]:
+    paginator = db().get_paginator('query')
+    for page in paginator.paginate(
+            TableName=table,
+            KeyConditionExpression='PK = :PK AND SK BETWEEN :from AND :to',
+            ExpressionAttributeValues={
+                ':PK': {'S': f'USER#{user_id}'},
+                ':from': {'S': 'WORKOUT#'},
+                ':to': {'S': f'WORKOUT#{before}'},
+            },
+    ):
+        yield from page['Items']
+
+
+def archive_workouts(s3, user_id: str) -> dict:
+    """
+    Moves user's workouts of months past the archive age into one bundle per month,
+    merging with a bundle written by a previous run. The bundle is written before
+    the workouts are deleted, readers skip the duplicates in between.
+    A workout already in the bundle keeps its bundled copy, see storage/bundles.py,
+    its standalone copy is deleted all the same.
+
+    :return: months, workouts and compressed bytes written
+    """
+    stats = {'months': 0, 'workouts': 0, 'bytes': 0}
+    limiter = RateLimiter(write_rate)
+    # the month of the cutoff is not over yet
+    workouts = _old_workouts(user_id, archived_through())
+    for month, group in groupby(workouts, key=lambda each: each['SK']['S'].removeprefix('WORKOUT#')[:7]):
+        group = list(group)
+        previous = db().get_item(
+            TableName=table,
+            Key={
+                'PK': {'S': f'USER#{user_id}'},
+                'SK': {'S': f'ARCHIVE#{month}'},
+            },
+            ConsistentRead=True,
+        ).get('Item')
+        items = {each['SK']['S']: each for each in bundles.read_bundle(s3, previous)} if previous else {}
+        for each in group:
+            items.setdefault(each['SK']['S'], each)
+
+        stats['bytes'] += bundles.write_bundle(db(), s3, user_id, month, list(items.values()), previous)
+        batch_write(
+            table,
+            ({'DeleteRequest': {'Key': {'PK': each['PK'], 'SK': each['SK']}}} for each in group),
+            limiter=limiter,
+        )
+        stats['months'] += 1
+        stats['workouts'] += len(group)
+    return stats
+
+
+def accounts() -> Iterator[str]:
+    """Ids of all users, for the scheduled run"""
+    paginator = db().get_paginator('scan')
+    for page in paginator.paginate(
+            TableName=table,
+            FilterExpression='SK = :account AND attribute_not_exists(deletedAt)',
+            ExpressionAttributeValues={':account': {'S': 'ACCOUNT'}},
+            ProjectionExpression='PK',
+    ):
+        for item in page['Items']:
+            yield item['PK']['S'].removeprefix('USER#')
@@ -0,0 +1,99 @@
+import time
+from typing import Iterable
+
+from dynamo import db
+
+# BatchWriteItem limit
+batch_size: int = 25
+# BatchGetItem limit
+get_batch_size: int = 100
+max_attempts: int = 8
+
+
+class RateLimiter:
+    """
+    Token bucket: lets through at most `rate` units per second,
+    with bursts of up to one second's worth
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def acquire(self, units: int = 1):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= units:
+                self.tokens -= units
+                return
+            time.sleep((units - self.tokens) / self.rate)
+
+
+def batch_write(table: str, requests: Iterable[dict], limiter: RateLimiter = None) -> int:
+    """
+    Sends PutRequest/DeleteRequest entries through BatchWriteItem in chunks,
+    retrying unprocessed items with exponential backoff
+
+    :param table: table name
+    :param requests: write requests, consumed lazily
+    :param limiter: optional write rate limit, in items per second
+    :return: number of items written
+    """
+    written = 0
+    chunk = []
+    for request in requests:
+        chunk.append(request)
+        if len(chunk) == batch_size:
+            written += _write_chunk(table, chunk, limiter)
+            chunk = []
+    if chunk:
+        written += _write_chunk(table, chunk, limiter)
+    return written
+
+
+def batch_get(table: str, keys: list[dict], projection: str = None, consistent: bool = False) -> list[dict]:
+    """
+    Reads items through BatchGetItem in chunks, retrying unprocessed keys with exponential backoff
+
+    :param table: table name
+    :param keys: PK/SK keys, without duplicates
+    :param projection: ProjectionExpression, attribute names only
+    :param consistent: strongly consistent reads
+    :return: the items that exist, in no particular order
+    """
+    request = {'ConsistentRead': consistent}
+    if projection:
+        request['ProjectionExpression'] = projection
+    items = []
+    for i in range(0, len(keys), get_batch_size):
+        items.extend(_get_chunk(table, {**request, 'Keys': keys[i:i + get_batch_size]}))
+    return items
+
+
+def _get_chunk(table: str, request: dict) -> list[dict]:
+    items = []
+    for attempt in range(max_attempts):
+        response = db().batch_get_item(RequestItems={table: request})
+        items.extend(response.get('Responses', {}).get(table, []))
+        # unprocessed keys come back with the rest of the request
+        request = response.get('UnprocessedKeys', {}).get(table)
+        if not request:
+            return items
+        time.sleep(min(0.05 * 2 ** attempt, 2))
+    raise RuntimeError(f'{len(request["Keys"])} keys left unprocessed after {max_attempts} attempts')
+
+
+def _write_chunk(table: str, chunk: list[dict], limiter: RateLimiter | None) -> int:
+    pending = chunk
+    for attempt in range(max_attempts):
+        if limiter:
+            limiter.acquire(len(pending))
+        response = db().batch_write_item(RequestItems={table: pending})
+        pending = response.get('UnprocessedItems', {}).get(table)
+        if not pending:
+            return len(chunk)
+        time.sleep(min(0.05 * 2 ** attempt, 2))
+    raise RuntimeError(f'{len(pending)} items left unprocessed after {max_attempts} attempts')
@@ -0,0 +1,61 @@
+"""
+Consumed capacity of the background function's DynamoDB calls, by job.
+
+The handlers of storage/capacity.py in the layer, registered on the dynamo
+layer's client, add up ReadCapacityUnits and WriteCapacityUnits per job and
+DynamoDB operation; `flush` prints the totals at the end of an invocation
+in CloudWatch Embedded Metric Format, as the API's metrics are.
+Jobs are the events of app.handler, and "Stream" for stream batches.
+"""
+import json
+import os
+import threading
+import time
+
+from dynamo import db
+from storage import capacity
+
+namespace = os.environ.get('METRICS_NAMESPACE', 'Heart/Background')
+
+_job = 'unknown'
+# (operation, name) -> units, jobs record from worker threads too
+_totals: dict[tuple[str, str], float] = {}
+_lock = threading.Lock()
+
+
+def _record(name: str, value: float, operation: str):
+    with _lock:
+        _totals[operation, name] = _totals.get((operation, name), 0) + value
+
+
+def start(job: str):
+    """Starts counting the capacity of an invocation, installs the handlers on first use"""
+    global _job
+    capacity.install(_record, db())
+    with _lock:
+        _job = job
+        _totals.clear()
+
+
+def flush():
+    """Prints the invocation's totals, one document per DynamoDB operation"""
+    with _lock:
+        totals, job = dict(_totals), _job
+        _totals.clear()
+
+    timestamp = int(time.time() * 1000)
+    for operation in sorted({operation for operation, _ in totals}):
+        values = {name: value for (each, name), value in totals.items() if each == operation}
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [['job', 'operation']],
+                    'Metrics': [{'Name': name, 'Unit': 'Count'} for name in values],
+                }],
+            },
+            'job': job,
+            'operation': operation,
+            **values,
+        }))
@@ -0,0 +1,170 @@
+"""
+Account deletion sweeper: purges accounts whose `scheduledForDeletionAt` has passed,
+found through the sparse DeletionIndex that only pending accounts are part of
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Callable, Iterator
+
+from dynamo import db
+
+from batches import batch_get, batch_write
+
+table = os.environ['WORKOUTS_TABLE']
+media_bucket = os.environ['MEDIA_BUCKET']
+
+deletion_index = 'DeletionIndex'
+# must match accounts.deletion_queue in the API
+deletion_queue = 'ACCOUNT'
+# Firebase's delete_users takes up to 1000 ids
+page_size = int(os.environ.get('ACCOUNT_SWEEP_PAGE', 1000))
+workers = int(os.environ.get('AWS_POOL_SIZE', 16))
+# no new page is started with less time left, the next run picks up the rest
+min_remaining_ms: int = 60_000
+
+
+def due_accounts(now: str) -> Iterator[list[str]]:
+    """Ids of the accounts due for deletion, a page at a time"""
+    paginator = db().get_paginator('query')
+    for page in paginator.paginate(
+            TableName=table,
+            IndexName=deletion_index,
+            KeyConditionExpression='deletionQueue = :queue AND scheduledForDeletionAt <= :now',
+            ExpressionAttributeValues={
+                ':queue': {'S': deletion_queue},
+                ':now': {'S': now},
+            },
+            PaginationConfig={'PageSize': page_size},
+    ):
+        if page['Items']:
+            yield [item['PK']['S'].removeprefix('USER#') for item in page['Items']]
+
+
+def still_due(ids: list[str], now: str) -> list[str]:
+    """
+    The ids whose account is still scheduled for deletion by `now`, re-read with
+    consistent reads: the index is eventually consistent, so it may still list
+    accounts whose deletion was undone or rescheduled a moment ago
+
+    :param ids: ids from DeletionIndex
+    :param now: the sweep's cutoff
+    """
+    items = batch_get(
+        table,
+        [{'PK': {'S': f'USER#{user_id}'}, 'SK': {'S': 'ACCOUNT'}} for user_id in ids],
+        projection='PK, scheduledForDeletionAt',
+        consistent=True,
+    )
+    due = {
+        item['PK']['S'].removeprefix('USER#')
+        for item in items
+        if 'scheduledForDeletionAt' in item and item['scheduledForDeletionAt']['S'] <= now
+    }
+    return [user_id for user_id in ids if user_id in due]
+
+
+def _delete_prefix(s3, bucket: str, prefix: str) -> int:
+    deleted = 0
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        if objects := [{'Key': each['Key']} for each in page.get('Contents', [])]:
+            s3.delete_objects(Bucket=bucket, Delete={'Objects': objects, 'Quiet': True})
+            deleted += len(objects)
+    return deleted
+
+
+def purge(s3, user_id: str) -> int:
+    """
+    Deletes everything stored for a user: every item of the partition,
+    the avatar, archived workouts and overflowed exercises. The account item
+    is replaced by a tombstone last, so that a purge that fails half-way
+    is retried by the next sweep.
+
+    :return: items deleted
+    """
+    def keys() -> Iterator[dict]:
+        paginator = db().get_paginator('query')
+        for page in paginator.paginate(
+                TableName=table,
+                KeyConditionExpression='PK = :PK',
+                ExpressionAttributeValues={':PK': {'S': f'USER#{user_id}'}},
+                ProjectionExpression='PK, SK',
+        ):
+            for item in page['Items']:
+                if item['SK']['S'] != 'ACCOUNT':
+                    yield {'DeleteRequest': {'Key': item}}
+
+    deleted = batch_write(table, keys())
+    s3.delete_object(Bucket=media_bucket, Key=f'avatars/{user_id}')
+    _delete_prefix(s3, media_bucket, f'archives/{user_id}/')
+    _delete_prefix(s3, media_bucket, f'overflow/{user_id}/')
+
+    db().put_item(
+        TableName=table,
+        Item={
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': 'ACCOUNT'},
+            'deletedAt': {'S': datetime.now(timezone.utc).isoformat()},
+        },
+    )
+    return deleted + 1
+
+
+def _delete_users(delete_users: Callable[[list[str]], dict], ids: list[str]) -> dict | None:
+    """The result of `delete_users`, None if it raised or did not say which users it deleted"""
+    if not ids:
+        return {'deleted': 0, 'failed': []}
+    try:
+        result = delete_users(ids)
+    except Exception as e:
+        print(f'Could not delete the Firebase users of {len(ids)} accounts: {type(e).__name__}: {e}')
+        return None
+    match result:
+        case {'deleted': int(), 'failed': list()}:
+            return result
+    print(f'Unexpected result deleting the Firebase users of {len(ids)} accounts: {result}')
+    return None
+
+
+def sweep(s3, delete_users: Callable[[list[str]], dict], remaining_ms: Callable[[], int]) -> dict:
+    """
+    Deletes due accounts page by page: Firebase users of the page in one batch call,
+    then the accounts' data in parallel. Every page is checked against the accounts
+    themselves first, see `still_due`. Accounts whose Firebase user could not be
+    deleted, or whose purge failed, stay in the index for the next run, and so does
+    the whole page if `delete_users` fails or returns anything else.
+
+    :param s3: S3 client
+    :param delete_users: deletes Firebase users by id, returns {"deleted": int, "failed": [{"id", "reason"}]}
+    :param remaining_ms: time left in the invocation
+    :return: accounts purged, items deleted and accounts left for the next run
+    """
+    stats = {'accounts': 0, 'items': 0, 'failed': 0}
+    now = datetime.now(timezone.utc).isoformat()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for listed in due_accounts(now):
+            ids = still_due(listed, now)
+            if len(ids) < len(listed):
+                print(f'Skipping {len(listed) - len(ids)} accounts no longer due')
+            if (result := _delete_users(delete_users, ids)) is None:
+                # no telling which Firebase users are gone, the whole page waits for the next run
+                failed = set(ids)
+            else:
+                failed = {each['id'] for each in result['failed']}
+                for each in result['failed']:
+                    print(f'Could not delete Firebase user {each["id"]}: {each["reason"]}')
+
+            futures = {pool.submit(purge, s3, user_id): user_id for user_id in ids if user_id not in failed}
+            for future in as_completed(futures):
+                try:
+                    stats['items'] += future.result()
+                    stats['accounts'] += 1
+                except Exception as e:
+                    print(f'Could not purge {futures[future]}: {type(e).__name__}: {e}')
+                    stats['failed'] += 1
+            stats['failed'] += len(failed)
+
+            if remaining_ms() < min_remaining_ms:
+                break
+    return stats
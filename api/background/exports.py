@@ -0,0 +1,217 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+from boto3.dynamodb.types import TypeDeserializer
+from dynamo import db
+
+from archives import expand
+
+table = os.environ['WORKOUTS_TABLE']
+export_bucket = os.environ['UPLOAD_BUCKET']
+
+# S3 requires at least 5 MB for every part but the last one
+part_size: int = 8 * 1024 * 1024
+
+csv_columns = (
+    'workout_id', 'workout_name', 'start', 'end',
+    'exercise_id', 'exercise', 'set_id', 'completed',
+    'reps', 'weight', 'duration', 'distance',
+)
+
+_deserializer = TypeDeserializer()
+
+
+def export_key(user_id: str, export_id: str, format_: str) -> str:
+    return f'exports/{user_id}/{export_id}.{format_}'
+
+
+class MultipartWriter:
+    """
+    Buffers written bytes and ships them to S3 as multipart upload parts,
+    so that no more than one part is held in memory at a time.
+    The upload is aborted if the block exits with an exception.
+    """
+
+    def __init__(self, s3, bucket: str, key: str, content_type: str):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.buffer = bytearray()
+        self.parts: list[dict] = []
+        self.size = 0
+        self.upload_id = None
+
+    def __enter__(self) -> 'MultipartWriter':
+        self.upload_id = self.s3.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            ContentType=self.content_type,
+        )['UploadId']
+        return self
+
+    def write(self, data: bytes):
+        self.buffer += data
+        self.size += len(data)
+        if len(self.buffer) >= part_size:
+            self._flush()
+
+    def _flush(self):
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+        self.buffer.clear()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            return False
+        # the last part may be smaller than 5 MB, and there must be at least one
+        if self.buffer or not self.parts:
+            self._flush()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts},
+        )
+        return False
+
+
+def _plain(value):
+    match value:
+        case Decimal() if value == value.to_integral_value():
+            return int(value)
+        case Decimal():
+            return float(value)
+        case list():
+            return [_plain(each) for each in value]
+        case dict():
+            return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def workouts(s3, user_id: str) -> Iterator[dict]:
+    """
+    Streams user's workouts page by page, in the API's JSON shape,
+    archived months first
+    """
+    def items() -> Iterator[dict]:
+        paginator = db().get_paginator('query')
+        for prefix in ('ARCHIVE#', 'WORKOUT#'):
+            for page in paginator.paginate(
+                    TableName=table,
+                    KeyConditionExpression='PK = :PK AND begins_with(SK, :prefix)',
+                    ExpressionAttributeValues={
+                        ':PK': {'S': f'USER#{user_id}'},
+                        ':prefix': {'S': prefix},
+                    },
+            ):
+                yield from page['Items']
+
+    for item in expand(s3, items()):
+        record = {k: _plain(_deserializer.deserialize(v)) for k, v in item.items() if k not in ('PK', 'SK')}
+        yield {
+            'id': item['SK']['S'].removeprefix('WORKOUT#'),
+            'name': record.get('name'),
+            'start': record.get('start'),
+            'end': record.get('end'),
+            'exercises': record.get('exercises') or [],
+        }
+
+
+def as_jsonl(source: Iterable[dict]) -> Iterator[tuple[bytes, int, int]]:
+    """One line per workout, yields (chunk, workouts, rows)"""
+    for workout in source:
+        yield (json.dumps(workout, separators=(',', ':')) + '\n').encode(), 1, 1
+
+
+def as_csv(source: Iterable[dict]) -> Iterator[tuple[bytes, int, int]]:
+    """One row per set, yields (chunk, workouts, rows)"""
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def row(*values) -> bytes:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(values)
+        return line.getvalue().encode()
+
+    yield row(*csv_columns), 0, 0
+    for workout in source:
+        head = (workout['id'], workout['name'], workout['start'], workout['end'])
+        rows = [
+            row(
+                *head,
+                exercise.get('id'), exercise.get('exercise'),
+                each.get('id'), each.get('completed'),
+                each.get('reps'), each.get('weight'), each.get('duration'), each.get('distance'),
+            )
+            for exercise in workout['exercises']
+            for each in exercise.get('sets') or []
+        ]
+        yield b''.join(rows), 1, len(rows)
+
+
+encoders = {
+    'jsonl': (as_jsonl, 'application/x-ndjson'),
+    'csv': (as_csv, 'text/csv'),
+}
+
+
+def export_workouts(s3, user_id: str, export_id: str, format_: str) -> dict:
+    """
+    Writes user's whole workout history to S3 and records the outcome
+    on the EXPORT# item the API created when the job was requested.
+    Memory use is bound by the multipart part size, not by history size.
+
+    :return: export stats
+    """
+    encode, content_type = encoders[format_]
+    key = export_key(user_id, export_id, format_)
+    count = rows = 0
+
+    try:
+        with MultipartWriter(s3, export_bucket, key, content_type) as writer:
+            for chunk, chunk_workouts, chunk_rows in encode(workouts(s3, user_id)):
+                writer.write(chunk)
+                count += chunk_workouts
+                rows += chunk_rows
+        stats = {'workouts': count, 'rows': rows, 'bytes': writer.size}
+        _finish(user_id, export_id, status='done', key=key, **stats)
+        return stats
+    except Exception as e:
+        _finish(user_id, export_id, status='failed', error=f'{type(e).__name__}: {e}')
+        raise
+
+
+def _finish(user_id: str, export_id: str, *, status: str, **fields):
+    values = {
+        'status': {'S': status},
+        'finishedAt': {'S': datetime.now(timezone.utc).isoformat()},
+        **{
+            name: {'N': str(value)} if isinstance(value, int) else {'S': value}
+            for name, value in fields.items()
+        },
+    }
+    db().update_item(
+        TableName=table,
+        Key={
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': f'EXPORT#{export_id}'},
+        },
+        UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in values),
+        ExpressionAttributeNames={f'#{name}': name for name in values},
+        ExpressionAttributeValues={f':{name}': value for name, value in values.items()},
+    )
@@ -0,0 +1,322 @@
+import codecs
+import csv
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+from dynamo import db
+from storage.bundles import read_bundle
+from storage.overflow import spill
+
+from batches import RateLimiter, batch_write
+from revisions import bump_revision
+
+table = os.environ['WORKOUTS_TABLE']
+import_bucket = os.environ['UPLOAD_BUCKET']
+# items per second, leaves headroom for the API on an on-demand table
+write_rate = float(os.environ.get('IMPORT_WRITE_RATE', 250))
+# seconds between progress updates on the IMPORT# item
+progress_interval: float = 5
+
+# canonical column: header names used by the supported exports,
+# our own export first, then Strong/Hevy-style trackers
+columns = {
+    'start': ('start', 'date', 'start_time'),
+    'end': ('end', 'end_time'),
+    'duration': ('duration', 'workout duration'),
+    'name': ('workout_name', 'workout name', 'title'),
+    'exercise': ('exercise', 'exercise name', 'exercise_title'),
+    'set': ('set_id', 'set order', 'set_index'),
+    'completed': ('completed',),
+    'reps': ('reps',),
+    'weight': ('weight', 'weight_kg'),
+    'duration_seconds': ('seconds', 'duration_seconds'),
+    'distance': ('distance', 'distance_km'),
+}
+
+_duration = re.compile(r'(?:(\d+)\s*h)?\s*(?:(\d+)\s*m(?:in)?)?\s*(?:(\d+)\s*s)?', re.IGNORECASE)
+_non_word = re.compile(r'[^a-z0-9]+')
+
+
+def import_key(user_id: str, import_id: str) -> str:
+    return f'imports/{user_id}/{import_id}.csv'
+
+
+@dataclass
+class Progress:
+    workouts: int = 0
+    rows: int = 0
+    skipped: int = 0
+    # workouts the user already has, kept as they are
+    duplicates: int = 0
+    unmatched: set[str] = field(default_factory=set)
+
+
+def _normalize(name: str) -> str:
+    return _non_word.sub(' ', name.lower()).strip()
+
+
+def catalog() -> dict[str, str]:
+    """
+    Exercise names from the EXERCISE partition, keyed by a normalized form,
+    so that "bench press (barbell)" resolves to "Bench Press (Barbell)"
+    """
+    names = {}
+    paginator = db().get_paginator('query')
+    for page in paginator.paginate(
+            TableName=table,
+            KeyConditionExpression='PK = :PK',
+            ExpressionAttributeValues={':PK': {'S': 'EXERCISE'}},
+            ProjectionExpression='SK',
+    ):
+        for item in page['Items']:
+            names[_normalize(item['SK']['S'])] = item['SK']['S']
+    return names
+
+
+def existing(s3, user_id: str) -> set[str]:
+    """
+    SKs of the workouts the user already has, standalone or bundled.
+    BatchWriteItem has no conditions, so imports check against these
+    instead of putting with attribute_not_exists(SK).
+    """
+    keys = set()
+    paginator = db().get_paginator('query')
+    for prefix in ('ARCHIVE#', 'WORKOUT#'):
+        for page in paginator.paginate(
+                TableName=table,
+                KeyConditionExpression='PK = :PK AND begins_with(SK, :prefix)',
+                ExpressionAttributeValues={
+                    ':PK': {'S': f'USER#{user_id}'},
+                    ':prefix': {'S': prefix},
+                },
+                # bundles are read whole, workouts only for their keys
+                **({} if prefix == 'ARCHIVE#' else {'ProjectionExpression': 'SK'}),
+        ):
+            for item in page['Items']:
+                if prefix == 'ARCHIVE#':
+                    keys.update(each['SK']['S'] for each in read_bundle(s3, item))
+                else:
+                    keys.add(item['SK']['S'])
+    return keys
+
+
+def _header(fieldnames: list[str]) -> dict[str, str]:
+    """Maps canonical columns to the file's actual headers"""
+    present = {name.strip().lower(): name for name in fieldnames or []}
+    mapping = {}
+    for column, aliases in columns.items():
+        for alias in aliases:
+            if alias in present:
+                mapping[column] = present[alias]
+                break
+    missing = {'start', 'exercise'} - mapping.keys()
+    if missing:
+        raise ValueError(f'CSV is missing columns: {", ".join(sorted(missing))}')
+    return mapping
+
+
+def _timestamp(value: str) -> str:
+    moment = datetime.fromisoformat(value.strip())
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.isoformat()
+
+
+def _seconds(value: str) -> int | None:
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value.replace('.', '', 1).isdigit():
+        return int(float(value))
+    match = _duration.fullmatch(value)
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(each or 0) for each in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _number(value: str) -> dict | None:
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return {'N': str(int(number) if number.is_integer() else number)}
+
+
+def rows(s3, user_id: str, import_id: str) -> Iterator[dict]:
+    """Streams the uploaded CSV line by line, never holding the whole file"""
+    body = s3.get_object(Bucket=import_bucket, Key=import_key(user_id, import_id))['Body']
+    lines = codecs.iterdecode(body.iter_lines(keepends=True), 'utf-8-sig')
+    yield from csv.DictReader(lines)
+
+
+def workouts(source: Iterable[dict], user_id: str, exercises: dict[str, str], progress: Progress) -> Iterator[dict]:
+    """
+    Groups consecutive rows into workout items, as Workout._to_item in the API would build them.
+    Exports list a workout's rows together, so one workout is held in memory at a time.
+    """
+    header = None
+    current, key = None, None
+    seen = set()
+
+    for row in source:
+        if header is None:
+            header = _header(list(row.keys()))
+        progress.rows += 1
+
+        def get(column: str) -> str:
+            return (row.get(header[column]) or '').strip() if column in header else ''
+
+        name = get('exercise')
+        try:
+            start = _timestamp(get('start'))
+        except ValueError:
+            start = None
+        # workouts are keyed by start, a start seen before belongs to a workout already written
+        if not start or not name or (start != key and start in seen):
+            progress.skipped += 1
+            continue
+
+        if start != key:
+            if current:
+                yield current
+            key = start
+            seen.add(start)
+            current = _workout(user_id, start, get)
+
+        exercise = exercises.get(_normalize(name))
+        if not exercise:
+            progress.unmatched.add(name)
+            exercise = name
+
+        workout_exercises = current['exercises']['L']
+        if not workout_exercises or workout_exercises[-1]['M']['exercise']['S'] != exercise:
+            workout_exercises.append(
+                {
+                    'M': {
+                        'id': {'S': f'{start}-{len(workout_exercises)}'},
+                        'exercise': {'S': exercise},
+                        'sets': {'L': []},
+                    }
+                }
+            )
+        exercise_item = workout_exercises[-1]['M']
+        sets = exercise_item['sets']['L']
+        values = {
+            'id': {'S': f'{exercise_item["id"]["S"]}-{len(sets)}'},
+            'completed': {'BOOL': get('completed').lower() not in ('false', '0', 'no')},
+            'reps': _number(get('reps')),
+            'weight': _number(get('weight')),
+            'duration': _number(get('duration_seconds')),
+            'distance': _number(get('distance')),
+        }
+        sets.append({'M': {k: v for k, v in values.items() if v is not None}})
+
+    if current:
+        yield current
+
+
+def _workout(user_id: str, start: str, get) -> dict:
+    item = {
+        'PK': {'S': f'USER#{user_id}'},
+        'SK': {'S': f'WORKOUT#{start}'},
+        'start': {'S': start},
+        'exercises': {'L': []},
+    }
+    if name := get('name'):
+        item['name'] = {'S': name}
+    if end := get('end'):
+        try:
+            item['end'] = {'S': _timestamp(end)}
+        except ValueError:
+            pass
+    elif (seconds := _seconds(get('duration'))) is not None:
+        item['end'] = {'S': (datetime.fromisoformat(start) + timedelta(seconds=seconds)).isoformat()}
+    return item
+
+
+def import_workouts(s3, user_id: str, import_id: str) -> Progress:
+    """
+    Reads an uploaded CSV and writes its workouts with rate-limited batched writes,
+    reporting progress on the IMPORT# item every few seconds.
+    Workouts the user already has are counted as duplicates and left alone,
+    oversized ones overflow to S3 as they would through the API.
+
+    :return: final progress
+    """
+    progress = Progress()
+    reported = time.monotonic()
+    _report(user_id, import_id, 'running', progress)
+
+    def tracked(source: Iterable[dict], present: set[str]) -> Iterator[dict]:
+        nonlocal reported
+        for item in source:
+            if item['SK']['S'] in present:
+                progress.duplicates += 1
+            else:
+                progress.workouts += 1
+                yield {'PutRequest': {'Item': spill(s3, item)}}
+            if time.monotonic() - reported > progress_interval:
+                _report(user_id, import_id, 'running', progress)
+                reported = time.monotonic()
+
+    try:
+        batch_write(
+            table,
+            tracked(workouts(rows(s3, user_id, import_id), user_id, catalog(), progress), existing(s3, user_id)),
+            limiter=RateLimiter(write_rate),
+        )
+    except Exception as e:
+        # whatever was written before the failure is there to see
+        bump_revision(user_id)
+        _report(user_id, import_id, 'failed', progress, error=f'{type(e).__name__}: {e}')
+        raise
+
+    bump_revision(user_id)
+    _report(user_id, import_id, 'done', progress)
+    s3.delete_object(Bucket=import_bucket, Key=import_key(user_id, import_id))
+    return progress
+
+
+def _report(user_id: str, import_id: str, status: str, progress: Progress, error: str = None):
+    values = {
+        ':status': {'S': status},
+        ':workouts': {'N': str(progress.workouts)},
+        ':rows': {'N': str(progress.rows)},
+        ':skipped': {'N': str(progress.skipped)},
+        ':duplicates': {'N': str(progress.duplicates)},
+        ':updated': {'S': datetime.now(timezone.utc).isoformat()},
+    }
+    expression = (
+        'SET #status = :status, workouts = :workouts, #rows = :rows,'
+        ' skipped = :skipped, duplicates = :duplicates, updatedAt = :updated'
+    )
+    if progress.unmatched:
+        # a sample is enough for the user to see what went wrong
+        values[':unmatched'] = {'SS': sorted(progress.unmatched)[:50]}
+        expression += ', unmatched = :unmatched'
+    if error:
+        values[':error'] = {'S': error}
+        expression += ', #error = :error'
+
+    db().update_item(
+        TableName=table,
+        Key={
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': f'IMPORT#{import_id}'},
+        },
+        UpdateExpression=expression,
+        ExpressionAttributeNames={
+            '#status': 'status',
+            '#rows': 'rows',
+            **({'#error': 'error'} if error else {}),
+        },
+        ExpressionAttributeValues=values,
+    )
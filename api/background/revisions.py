@@ -0,0 +1,24 @@
+"""Bumps the revision list operations of the API send as their ETag, see revisions.py in the API"""
+import os
+
+from dynamo import db
+
+table = os.environ['WORKOUTS_TABLE']
+
+
+def bump_revision(user_id: str):
+    """Call after the write has succeeded, never before"""
+    try:
+        db().update_item(
+            TableName=table,
+            Key={
+                'PK': {'S': f'USER#{user_id}'},
+                'SK': {'S': 'ACCOUNT'},
+            },
+            UpdateExpression='ADD revision :one',
+            # never creates an account
+            ConditionExpression='attribute_exists(SK)',
+            ExpressionAttributeValues={':one': {'N': '1'}},
+        )
+    except db().exceptions.ConditionalCheckFailedException:
+        pass
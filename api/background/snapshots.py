@@ -0,0 +1,189 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+from typing import Iterator
+
+from dynamo import db
+
+from archives import expand
+
+table = os.environ['WORKOUTS_TABLE']
+snapshot_bucket = os.environ['UPLOAD_BUCKET']
+
+# a copy of migrations/0001_init.sql, the schema the mobile client opens
+_schema = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+synced_tables = ('workouts', 'workout_exercises', 'sets', 'exercises', 'templates', 'template_exercises')
+
+
+def snapshot_key(user_id: str) -> str:
+    return f'snapshots/{user_id}.sqlite.gz'
+
+
+def _items(pk: str) -> Iterator[dict]:
+    paginator = db().get_paginator('query')
+    for page in paginator.paginate(
+            TableName=table,
+            KeyConditionExpression='PK = :PK',
+            ExpressionAttributeValues={':PK': {'S': pk}},
+    ):
+        yield from page['Items']
+
+
+def _s(item: dict, key: str) -> str | None:
+    return item.get(key, {}).get('S')
+
+
+def _n(item: dict, key: str) -> int | float | None:
+    match item.get(key):
+        case {'N': n}:
+            number = float(n)
+            return int(number) if number.is_integer() else number
+    return None
+
+
+def _image(item: dict, key: str) -> tuple:
+    image = item.get(key, {}).get('M', {})
+    return _s(image, 'link'), _n(image, 'width'), _n(image, 'height')
+
+
+def _write_exercises(connection: sqlite3.Connection):
+    connection.executemany(
+        'INSERT OR REPLACE INTO exercises '
+        '(name, category, target, asset, asset_width, asset_height, '
+        'thumbnail, thumbnail_width, thumbnail_height, instructions, user_id) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)',
+        (
+            (
+                item['SK']['S'], _s(item, 'category'), _s(item, 'target'),
+                *_image(item, 'asset'), *_image(item, 'thumbnail'), _s(item, 'instructions'),
+            )
+            for item in _items('EXERCISE')
+        ),
+    )
+
+
+def _write_user(s3, connection: sqlite3.Connection, user_id: str) -> dict[str, int]:
+    counts = {'workouts': 0, 'templates': 0}
+    for item in expand(s3, _items(f'USER#{user_id}')):
+        sk = item['SK']['S']
+        kind, _, _id = sk.partition('#')
+        exercises = [each['M'] for each in item.get('exercises', {}).get('L', [])]
+        match kind:
+            case 'WORKOUT':
+                counts['workouts'] += 1
+                connection.execute(
+                    'INSERT OR REPLACE INTO workouts (id, start, "end", user_id, name) VALUES (?, ?, ?, ?, ?)',
+                    (_id, _s(item, 'start'), _s(item, 'end'), user_id, _s(item, 'name')),
+                )
+                connection.executemany(
+                    'INSERT OR REPLACE INTO workout_exercises (workout_id, exercise_id, id, exercise_order) '
+                    'VALUES (?, ?, ?, ?)',
+                    ((_id, _s(each, 'exercise'), _s(each, 'id'), order) for order, each in enumerate(exercises)),
+                )
+                connection.executemany(
+                    'INSERT OR REPLACE INTO sets (exercise_id, id, completed, weight, reps, duration, distance) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        (
+                            _s(exercise, 'id'), _s(each['M'], 'id'),
+                            int(each['M'].get('completed', {}).get('BOOL', False)),
+                            _n(each['M'], 'weight'), _n(each['M'], 'reps'),
+                            _n(each['M'], 'duration'), _n(each['M'], 'distance'),
+                        )
+                        for exercise in exercises
+                        for each in exercise.get('sets', {}).get('L', [])
+                    ),
+                )
+            case 'TEMPLATE':
+                counts['templates'] += 1
+                # the client's template ids are integers, anything else gets a fresh one
+                cursor = connection.execute(
+                    'INSERT OR REPLACE INTO templates (id, name, user_id, order_in_parent) VALUES (?, ?, ?, ?)',
+                    (int(_id) if _id.isdigit() else None, _s(item, 'name'), user_id, _n(item, 'order')),
+                )
+                connection.executemany(
+                    'INSERT INTO template_exercises (template_id, exercise_id) VALUES (?, ?)',
+                    ((cursor.lastrowid, _s(each, 'exercise')) for each in exercises),
+                )
+    return counts
+
+
+def build_snapshot(s3, user_id: str) -> dict:
+    """
+    Builds a ready-to-open SQLite database with the client's schema,
+    holding user's history, templates and the exercise catalog,
+    and uploads it gzipped. The `syncs` table holds the watermark
+    the client continues incremental sync from.
+
+    :return: snapshot description, as stored on the SNAPSHOT item
+    """
+    # taken before reading, so that writes made during the build are picked up by the next sync
+    watermark = datetime.now(timezone.utc).isoformat()
+    try:
+        snapshot = _build(s3, user_id, watermark)
+    except Exception as e:
+        _update(user_id, {'status': {'S': 'failed'}, 'error': {'S': f'{type(e).__name__}: {e}'}})
+        raise
+
+    _update(
+        user_id,
+        {
+            'status': {'S': 'done'},
+            'watermark': {'S': snapshot['watermark']},
+            'bytes': {'N': str(snapshot['bytes'])},
+            'workouts': {'N': str(snapshot['workouts'])},
+            'templates': {'N': str(snapshot['templates'])},
+            'builtAt': {'S': datetime.now(timezone.utc).isoformat()},
+        },
+    )
+    return snapshot
+
+
+def _build(s3, user_id: str, watermark: str) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'heart.sqlite')
+        connection = sqlite3.connect(path)
+        try:
+            with open(_schema) as f:
+                connection.executescript(f.read())
+            with connection:
+                _write_exercises(connection)
+                counts = _write_user(s3, connection, user_id)
+                connection.executemany(
+                    'INSERT OR REPLACE INTO syncs (table_name, synced_at) VALUES (?, ?)',
+                    ((name, watermark) for name in synced_tables),
+                )
+            connection.execute('VACUUM')
+        finally:
+            connection.close()
+
+        compressed = f'{path}.gz'
+        with open(path, 'rb') as source, gzip.open(compressed, 'wb', compresslevel=6) as target:
+            shutil.copyfileobj(source, target)
+
+        size = os.path.getsize(compressed)
+        with open(compressed, 'rb') as f:
+            s3.upload_fileobj(
+                f,
+                snapshot_bucket,
+                snapshot_key(user_id),
+                ExtraArgs={'ContentType': 'application/gzip'},
+            )
+
+    return {'watermark': watermark, 'bytes': size, **counts}
+
+
+def _update(user_id: str, values: dict):
+    db().update_item(
+        TableName=table,
+        Key={
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': 'SNAPSHOT'},
+        },
+        UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in values),
+        ExpressionAttributeNames={f'#{name}': name for name in values},
+        ExpressionAttributeValues={f':{name}': value for name, value in values.items()},
+    )
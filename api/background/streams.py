@@ -0,0 +1,104 @@
+"""
+Consumer of the workouts table's stream: keeps data derived from user items
+up to date off the request path.
+
+Change records arrive in batches of one shard. They are decoded into `Change`s,
+grouped by user, and every projection registered for a key prefix is applied
+once per user and batch, so that a burst of writes, e.g. an import,
+costs one derived write per key. The API bumps the user's revision with every
+write; a batch that changed derived data bumps it once more, after the
+projections, so that clients polling with an ETag see the derived data too.
+Projections must be idempotent:
+the records of a user whose projection failed are reported as batch item failures,
+and Lambda redelivers them together with everything after them in the shard.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from revisions import bump_revision
+
+workers = int(os.environ.get('AWS_POOL_SIZE', 16))
+
+
+@dataclass
+class Change:
+    event: str  # INSERT, MODIFY or REMOVE
+    user_id: str
+    sk: str
+    sequence: str
+    old: dict | None = None
+    new: dict | None = None
+
+
+# (s3, user_id, changes) -> whether anything the user can list has changed
+Projection = Callable[[object, str, list[Change]], bool]
+
+_projections: list[tuple[tuple[str, ...], Projection]] = []
+
+
+def projection(*prefixes: str) -> Callable[[Projection], Projection]:
+    """Registers a projection for the changes of items whose SK starts with any of the prefixes"""
+    def register(function: Projection) -> Projection:
+        _projections.append((prefixes, function))
+        return function
+    return register
+
+
+def decode(record: dict) -> Change | None:
+    """Change of a user item, None for anything else"""
+    match record:
+        case {
+            'eventName': event,
+            'dynamodb': {
+                'Keys': {'PK': {'S': pk}, 'SK': {'S': sk}},
+                'SequenceNumber': sequence,
+                **images,
+            },
+        } if pk.startswith('USER#'):
+            return Change(
+                event=event,
+                user_id=pk.removeprefix('USER#'),
+                sk=sk,
+                sequence=sequence,
+                old=images.get('OldImage'),
+                new=images.get('NewImage'),
+            )
+    return None
+
+
+def _apply(s3, user_id: str, changes: list[Change]) -> bool:
+    changed = False
+    for prefixes, apply in _projections:
+        if relevant := [each for each in changes if each.sk.startswith(prefixes)]:
+            changed = apply(s3, user_id, relevant) or changed
+    if changed:
+        # clients polling with an ETag would never see derived data that lands after the write
+        bump_revision(user_id)
+    return changed
+
+
+def process(s3, records: list[dict]) -> dict:
+    """
+    :param s3: S3 client
+    :param records: DynamoDB stream records of one batch
+    :return: the batch response, listing the records to redeliver
+    """
+    by_user: dict[str, list[Change]] = {}
+    for record in records:
+        if change := decode(record):
+            by_user.setdefault(change.user_id, []).append(change)
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_apply, s3, user_id, changes): user_id for user_id, changes in by_user.items()}
+        for future, user_id in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f'Could not project changes of {user_id}: {type(e).__name__}: {e}')
+                failures.extend(each.sequence for each in by_user[user_id])
+
+    print(f'Projected {len(records)} changes of {len(by_user)} users, {len(failures)} failed')
+    return {'batchItemFailures': [{'itemIdentifier': each} for each in failures]}
@@ -0,0 +1,142 @@
+"""
+WSUM#<start> workout summaries, read by WorkoutSummary in the API:
+what list screens show of a workout, without its exercises.
+Kept up to date from the table's stream, see streams.py.
+"""
+import os
+from typing import Iterator
+
+from dynamo import db
+from storage.overflow import hydrate
+
+from archives import expand
+from batches import RateLimiter, batch_write
+from revisions import bump_revision
+from streams import Change, projection
+
+table = os.environ['WORKOUTS_TABLE']
+
+# items per second, the backfill runs for every user at once
+write_rate = float(os.environ.get('SUMMARY_WRITE_RATE', 100))
+
+
+def _number(value: float) -> dict:
+    return {'N': str(int(value) if value == int(value) else value)}
+
+
+def summary(s3, item: dict) -> dict:
+    """
+    :param s3: S3 client, for the exercises of an overflowed item
+    :param item: WORKOUT# item, full or overflowed
+    :return: its WSUM# item
+    """
+    # a no-op for items expand has read back already
+    item = hydrate(s3, item)
+    exercises = [each['M'] for each in item.get('exercises', {}).get('L', [])]
+    # total weight moved over completed sets
+    volume = 0
+    for exercise in exercises:
+        for each in exercise.get('sets', {}).get('L', []):
+            values = each['M']
+            if values.get('completed', {}).get('BOOL') and 'weight' in values and 'reps' in values:
+                volume += float(values['weight']['N']) * float(values['reps']['N'])
+
+    start = item['SK']['S'].removeprefix('WORKOUT#')
+    result = {
+        'PK': item['PK'],
+        'SK': {'S': f'WSUM#{start}'},
+        'start': item['start'],
+        'exerciseCount': {'N': str(len(exercises))},
+        'volume': _number(round(volume, 2)),
+    }
+    for attribute in ('end', 'name'):
+        if attribute in item:
+            result[attribute] = item[attribute]
+    return result
+
+
+def backfill_summaries(s3, user_id: str) -> int:
+    """
+    Writes the summary of every workout of a user, archived ones included,
+    for workouts saved before summaries existed. Safe to run again.
+
+    :return: summaries written
+    """
+    def workouts() -> Iterator[dict]:
+        paginator = db().get_paginator('query')
+        for prefix in ('ARCHIVE#', 'WORKOUT#'):
+            for page in paginator.paginate(
+                    TableName=table,
+                    KeyConditionExpression='PK = :PK AND begins_with(SK, :prefix)',
+                    ExpressionAttributeValues={
+                        ':PK': {'S': f'USER#{user_id}'},
+                        ':prefix': {'S': prefix},
+                    },
+            ):
+                yield from page['Items']
+
+    written = batch_write(
+        table,
+        ({'PutRequest': {'Item': summary(s3, item)}} for item in expand(s3, workouts())),
+        limiter=RateLimiter(write_rate),
+    )
+    bump_revision(user_id)
+    return written
+
+
+def _month(sk: str) -> str:
+    # WORKOUT#<start> or ARCHIVE#<yyyy-mm>
+    return sk.partition('#')[2][:7]
+
+
+def _query(user_id: str, prefix: str) -> Iterator[dict]:
+    paginator = db().get_paginator('query')
+    for page in paginator.paginate(
+            TableName=table,
+            KeyConditionExpression='PK = :PK AND begins_with(SK, :prefix)',
+            ExpressionAttributeValues={
+                ':PK': {'S': f'USER#{user_id}'},
+                ':prefix': {'S': prefix},
+            },
+            ConsistentRead=True,
+    ):
+        yield from page['Items']
+
+
+@projection('WORKOUT#', 'ARCHIVE#')
+def project_summaries(s3, user_id: str, changes: list[Change]) -> bool:
+    """
+    Rebuilds the summaries of every month the changes touch from the workouts
+    as they are now, standalone or archived, rather than from the changes' images:
+    archival deletes workouts it has bundled, and records of different items
+    may arrive in any order. Only summaries that differ are written.
+
+    :return: whether any summary was written or deleted
+    """
+    writes = []
+    for month in sorted({_month(each.sk) for each in changes}):
+        bundle = db().get_item(
+            TableName=table,
+            Key={
+                'PK': {'S': f'USER#{user_id}'},
+                'SK': {'S': f'ARCHIVE#{month}'},
+            },
+            ConsistentRead=True,
+        ).get('Item')
+        # the bundle first, expand skips standalone copies of bundled workouts
+        items = [bundle] if bundle else []
+        items.extend(_query(user_id, f'WORKOUT#{month}'))
+
+        expected = {each['SK']['S']: each for each in (summary(s3, item) for item in expand(s3, items))}
+        existing = {each['SK']['S']: each for each in _query(user_id, f'WSUM#{month}')}
+        writes.extend(
+            {'PutRequest': {'Item': item}}
+            for sk, item in expected.items()
+            if existing.get(sk) != item
+        )
+        writes.extend(
+            {'DeleteRequest': {'Key': {'PK': item['PK'], 'SK': item['SK']}}}
+            for sk, item in existing.items()
+            if sk not in expected
+        )
+    return batch_write(table, writes) > 0
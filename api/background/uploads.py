@@ -0,0 +1,34 @@
+"""
+Aborts multipart uploads that were never completed, see uploads.py in the API.
+S3 keeps the parts of an open multipart upload, and bills for them, until it is aborted.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+upload_bucket = os.environ['UPLOAD_BUCKET']
+media_bucket = os.environ['MEDIA_BUCKET']
+
+# twice the API's session lifetime, part URLs have long expired by then
+max_age = timedelta(hours=2)
+# where upload sessions write to
+prefixes = ((upload_bucket, 'avatars/'), (media_bucket, 'feedback/'))
+
+
+def abort_stale_uploads(s3) -> int:
+    """
+    :return: uploads aborted
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+    aborted = 0
+    for bucket, prefix in prefixes:
+        paginator = s3.get_paginator('list_multipart_uploads')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for upload in page.get('Uploads', []):
+                if upload['Initiated'] < cutoff:
+                    try:
+                        s3.abort_multipart_upload(Bucket=bucket, Key=upload['Key'], UploadId=upload['UploadId'])
+                        aborted += 1
+                    except s3.exceptions.NoSuchUpload:
+                        # completed or aborted in the meantime
+                        pass
+    return aborted
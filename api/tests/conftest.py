@@ -0,0 +1,57 @@
+"""
+Runs the API's modules against the in-process stand-ins of benchmarks/stubs.py,
+installed the way bench.py installs them, before anything in api/api is imported.
+Modules of the background function are imported with `background`.
+
+    python -m pytest api/tests
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(_root, 'benchmarks'))
+
+import bench  # noqa: E402
+import stubs  # noqa: E402
+
+services = stubs.Services()
+bench.install(services)
+
+_background = os.path.join(_root, 'api', 'background')
+
+
+def background(name: str):
+    """
+    Imports a module of the background function. Its siblings shadow the API's
+    modules of the same name, e.g. revisions, only while it is imported.
+    Skips the test without the dynamo-utils layer.
+    """
+    pytest.importorskip('dynamo')
+    siblings = {each.removesuffix('.py') for each in os.listdir(_background) if each.endswith('.py')}
+    saved = {each: sys.modules.pop(each) for each in siblings if each in sys.modules}
+    sys.path.insert(0, _background)
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(_background)
+        for each in siblings:
+            sys.modules.pop(each, None)
+        sys.modules.update(saved)
+
+
+@pytest.fixture
+def aws() -> stubs.Services:
+    """The stand-ins the API's clients were created with, emptied after each test"""
+    yield services
+    services.dynamodb.tables.clear()
+    services.s3.objects.clear()
+
+
+@pytest.fixture
+def user():
+    from models import User
+
+    return User(id='user-1', name='Test', email='test@example.com', verified=True)
@@ -0,0 +1,66 @@
+"""Archive bundles of storage/bundles.py in the layer"""
+import pytest
+
+from storage import bundles
+
+_table = 'workouts'
+
+
+def _workout(start: str, name: str = None) -> dict:
+    item = {
+        'PK': {'S': 'USER#user-1'},
+        'SK': {'S': f'WORKOUT#{start}'},
+        'start': {'S': start},
+        'exercises': {'L': []},
+    }
+    if name:
+        item['name'] = {'S': name}
+    return item
+
+
+def test_encode_decode_round_trip():
+    items = [_workout('2020-01-01T10:00:00Z'), _workout('2020-01-02T10:00:00Z', 'Legs')]
+    assert bundles.decode(bundles.encode(items)) == items
+
+
+@pytest.mark.parametrize('inline', [True, False])
+def test_write_and_read_bundle(aws, monkeypatch, inline):
+    if not inline:
+        monkeypatch.setattr(bundles, 'max_inline_size', 10)
+    items = [_workout('2020-01-02T10:00:00Z'), _workout('2020-01-01T10:00:00Z')]
+
+    bundles.write_bundle(aws.dynamodb, aws.s3, 'user-1', '2020-01', items, None)
+    bundle = aws.dynamodb.tables[_table][('USER#user-1', 'ARCHIVE#2020-01')]
+
+    assert ('bundle' in bundle) == inline
+    assert ('key' in bundle) != inline
+    assert bundle['workouts'] == {'N': '2'}
+    # sorted by SK, as the partition would be
+    assert bundles.read_bundle(aws.s3, bundle) == sorted(items, key=lambda each: each['SK']['S'])
+
+
+def test_rewrite_needs_the_current_revision(aws):
+    bundles.write_bundle(aws.dynamodb, aws.s3, 'user-1', '2020-01', [_workout('2020-01-01T10:00:00Z')], None)
+    with pytest.raises(aws.dynamodb.exceptions.ConditionalCheckFailedException):
+        bundles.write_bundle(aws.dynamodb, aws.s3, 'user-1', '2020-01', [], None)
+
+
+def test_rewrite_to_s3_removes_the_previous_object(aws, monkeypatch):
+    monkeypatch.setattr(bundles, 'max_inline_size', 10)
+    bundles.write_bundle(aws.dynamodb, aws.s3, 'user-1', '2020-01', [_workout('2020-01-01T10:00:00Z')], None)
+    previous = aws.dynamodb.tables[_table][('USER#user-1', 'ARCHIVE#2020-01')]
+
+    bundles.write_bundle(aws.dynamodb, aws.s3, 'user-1', '2020-01', [_workout('2020-01-02T10:00:00Z')], previous)
+
+    assert [key for _, key in aws.s3.objects] == [bundles.archive_key('user-1', '2020-01', 2)]
+
+
+def test_expand_prefers_the_bundled_copy(aws):
+    bundled = _workout('2020-01-01T10:00:00Z', 'bundled')
+    bundles.write_bundle(aws.dynamodb, aws.s3, 'user-1', '2020-01', [bundled], None)
+    bundle = aws.dynamodb.tables[_table][('USER#user-1', 'ARCHIVE#2020-01')]
+    standalone = [_workout('2020-01-01T10:00:00Z', 'stale'), _workout('2026-01-01T10:00:00Z')]
+
+    expanded = list(bundles.expand(aws.s3, [bundle, *standalone]))
+
+    assert expanded == [bundled, standalone[1]]
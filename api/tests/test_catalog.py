@@ -0,0 +1,28 @@
+import pytest
+
+from catalog import Catalog, encode
+
+_names = ['Bench Press', 'Squat', 'Développé couché', 'Deadlift']
+
+
+@pytest.fixture(params=['bytes', 'file'])
+def catalog(request, tmp_path) -> Catalog:
+    data = encode(_names + ['Squat'], 7)
+    if request.param == 'bytes':
+        return Catalog(data)
+    path = tmp_path / 'catalog.bin'
+    path.write_bytes(data)
+    return Catalog.open(str(path))
+
+
+def test_names_are_found_in_place(catalog):
+    assert all(name in catalog for name in _names)
+    assert 'Squat ' not in catalog
+    assert 'Bench' not in catalog
+    assert '' not in catalog
+
+
+def test_names_are_listed_once_in_order(catalog):
+    assert list(catalog) == sorted(_names, key=str.encode)
+    assert len(catalog) == 4
+    assert catalog.version == 7
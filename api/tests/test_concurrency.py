@@ -0,0 +1,34 @@
+import pytest
+
+import concurrency
+
+
+@pytest.fixture
+def attempts(monkeypatch) -> list[str]:
+    """Operations attempted, the first attempt of every call times out"""
+    made = []
+
+    def timed(operation: str, params: dict) -> dict:
+        made.append(operation)
+        if len(made) == 1:
+            raise TimeoutError(f'{operation} timed out')
+        return {}
+
+    monkeypatch.setattr(concurrency, '_timed', timed)
+    return made
+
+
+def test_timed_out_reads_are_retried(attempts):
+    assert concurrency.call('get_item', TableName='workouts', Key={}) == {}
+    assert attempts == ['get_item', 'get_item']
+
+
+def test_timed_out_writes_are_not_retried(attempts):
+    with pytest.raises(TimeoutError):
+        concurrency.call('update_item', TableName='workouts', Key={}, UpdateExpression='ADD revision :one')
+    assert attempts == ['update_item']
+
+
+def test_timed_out_idempotent_writes_are_retried(attempts):
+    assert concurrency.call('put_item', TableName='workouts', Item={}, idempotent=True) == {}
+    assert attempts == ['put_item', 'put_item']
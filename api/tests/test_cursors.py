@@ -0,0 +1,64 @@
+import base64
+import json
+
+import pytest
+
+import templates
+import workouts
+from errors import BadRequest
+from utils import decode_cursor, encode_cursor
+
+
+def _cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_round_trip():
+    key = {'start': '2026-01-01T10:00:00Z'}
+    assert decode_cursor(encode_cursor(key)) == key
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    base64.urlsafe_b64encode(b'{"start": ').decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    encode_cursor({'start': '2026'})[:-3],
+])
+def test_garbage_is_a_bad_request(cursor):
+    with pytest.raises(BadRequest):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('value', [
+    ['2026-01-01T10:00:00Z'],
+    {'start': 5},
+    {'order': 1, 'id': 'a'},
+    {},
+])
+def test_list_workouts_rejects_tampered_cursors(aws, user, value):
+    with pytest.raises(BadRequest):
+        workouts.list_workouts(user=user, cursor=_cursor(value))
+
+
+@pytest.mark.parametrize('value', [
+    {'order': 'first', 'id': 'a'},
+    {'order': 1, 'id': 2},
+    {'order': 1},
+    {'start': '2026-01-01T10:00:00Z'},
+])
+def test_list_templates_rejects_tampered_cursors(aws, user, value):
+    with pytest.raises(BadRequest):
+        templates.list_templates(user=user, cursor=_cursor(value))
+
+
+def test_list_templates_pages_past_templates_without_order(aws, user):
+    for each in ('a', 'b', 'c'):
+        templates.save_template(user=user, id=each, name=each, order=1 if each == 'b' else None, exercises=[])
+
+    seen, cursor = [], None
+    while True:
+        body, _, _ = templates.list_templates(user=user, limit='1', cursor=cursor)
+        seen.extend(each['id'] for each in body['templates'])
+        if not (cursor := body['cursor']):
+            break
+    assert seen == ['b', 'a', 'c']
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+from conftest import background
+
+_table = 'workouts'
+
+
+@pytest.fixture
+def deletions(aws, monkeypatch):
+    module = background('deletions')
+    table = aws.dynamodb.tables.setdefault(_table, {})
+    for user_id in ('user-1', 'user-2'):
+        table[(f'USER#{user_id}', 'ACCOUNT')] = {
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': 'ACCOUNT'},
+            'scheduledForDeletionAt': {'S': '2020-01-01T00:00:00+00:00'},
+        }
+        table[(f'USER#{user_id}', 'WORKOUT#2020-01-01T10:00:00Z')] = {
+            'PK': {'S': f'USER#{user_id}'},
+            'SK': {'S': 'WORKOUT#2020-01-01T10:00:00Z'},
+        }
+    # the stand-in has no indexes
+    monkeypatch.setattr(module, 'due_accounts', lambda now: iter([['user-1', 'user-2']]))
+    return module
+
+
+def _purged(aws) -> set[str]:
+    return {
+        pk.removeprefix('USER#')
+        for (pk, sk), item in aws.dynamodb.tables[_table].items()
+        if sk == 'ACCOUNT' and 'deletedAt' in item
+    }
+
+
+def test_accounts_are_purged_unless_their_firebase_user_failed(aws, deletions):
+    def delete_users(ids: list[str]) -> dict:
+        return {'deleted': 1, 'failed': [{'id': 'user-2', 'reason': 'internal error'}]}
+
+    stats = deletions.sweep(aws.s3, delete_users, lambda: 900_000)
+
+    assert _purged(aws) == {'user-1'}
+    assert stats == {'accounts': 1, 'items': 2, 'failed': 1}
+
+
+@pytest.mark.parametrize('answer', [{}, {'errorMessage': 'Task timed out'}, None])
+def test_nothing_is_purged_when_the_deletion_does_not_say_what_it_deleted(aws, deletions, answer):
+    stats = deletions.sweep(aws.s3, lambda ids: answer, lambda: 900_000)
+
+    assert not _purged(aws)
+    assert stats == {'accounts': 0, 'items': 0, 'failed': 2}
+
+
+def test_nothing_is_purged_when_the_deletion_fails(aws, deletions):
+    def delete_users(ids: list[str]) -> dict:
+        raise RuntimeError('auth failed (Unhandled)')
+
+    stats = deletions.sweep(aws.s3, delete_users, lambda: 900_000)
+
+    assert not _purged(aws)
+    assert stats['failed'] == 2
+
+
+def test_function_errors_of_the_auth_function_raise(monkeypatch):
+    monkeypatch.setenv('AUTH_FUNCTION', 'auth')
+    app = background('app')
+
+    class Lambda:
+        def invoke(self, **_) -> dict:
+            return {'StatusCode': 200, 'FunctionError': 'Unhandled', 'Payload': io.BytesIO(b'{"errorMessage": "boom"}')}
+
+    monkeypatch.setattr(app, 'lambda_', Lambda())
+    with pytest.raises(RuntimeError, match='boom'):
+        app.call_lambda('auth', {'Event': 'AccountsDeletion', 'Payload': {'user_ids': ['user-1']}})
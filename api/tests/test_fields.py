@@ -0,0 +1,70 @@
+import pytest
+
+import fields
+from errors import BadRequest
+from models import Set, Workout, WorkoutExercise
+
+
+def _workout() -> Workout:
+    return Workout(
+        user_id='user-1',
+        start='2026-01-01T10:00:00Z',
+        _id='2026-01-01T10:00:00Z',
+        end='2026-01-01T11:00:00Z',
+        name='Legs',
+        exercises=[
+            WorkoutExercise(
+                id='e1',
+                exercise='Squat',
+                sets=[Set(id='s1', completed=True, reps=5, weight=100)],
+            ),
+        ],
+    )
+
+
+def test_parse_orders_fields_as_the_full_response():
+    selected = fields.parse('exercises.exercise, name,id', fields.workout)
+    assert selected.tree == {'id': None, 'name': None, 'exercises': {'exercise': None}}
+
+
+def test_parse_whole_value_wins_over_nested_paths():
+    selected = fields.parse('exercises,exercises.exercise', fields.workout)
+    assert selected.tree == {'exercises': None}
+
+
+@pytest.mark.parametrize('value', [None, '', ' , '])
+def test_parse_nothing_selects_everything(value):
+    assert fields.parse(value, fields.workout) is None
+
+
+@pytest.mark.parametrize('value', ['foo', 'name.first', 'exercises.sets.nope'])
+def test_parse_rejects_unknown_fields(value):
+    with pytest.raises(BadRequest):
+        fields.parse(value, fields.workout)
+
+
+def test_projection_reads_top_level_attributes():
+    projection = fields.parse('exercises.exercise', fields.workout).projection()
+    names = projection['ExpressionAttributeNames']
+    assert sorted(names.values()) == ['PK', 'SK', 'exercises', 'exercisesKey', 'start']
+    assert projection['ProjectionExpression'] == ', '.join(names)
+
+
+def test_variant_depends_on_the_selection_not_its_spelling():
+    first = fields.parse('name,id', fields.workout)
+    second = fields.parse('id, name', fields.workout)
+    assert first.variant == second.variant
+    assert first.variant != fields.parse('id', fields.workout).variant
+
+
+def test_encode_trims_to_the_selection():
+    selected = fields.parse('id,exercises.exercise,exercises.sets.reps', fields.workout)
+    assert fields.encode(_workout(), selected) == {
+        'id': '2026-01-01T10:00:00Z',
+        'exercises': [{'exercise': 'Squat', 'sets': [{'reps': 5}]}],
+    }
+
+
+def test_encode_without_selection_is_the_full_response():
+    workout = _workout()
+    assert fields.encode(workout, None) == workout.to_dict()
@@ -0,0 +1,63 @@
+import pytest
+
+import overflow
+from storage import overflow as stored
+
+_bucket = 'local-media'
+
+
+def _item(sets: int) -> dict:
+    return {
+        'PK': {'S': 'USER#user-1'},
+        'SK': {'S': 'WORKOUT#2026-01-01T10:00:00Z'},
+        'start': {'S': '2026-01-01T10:00:00Z'},
+        'exercises': {'L': [
+            {'M': {
+                'id': {'S': f'e{i}'},
+                'exercise': {'S': 'Squat'},
+                'sets': {'L': [{'M': {'id': {'S': 's1'}, 'completed': {'BOOL': True}, 'reps': {'N': '5'}}}]},
+            }}
+            for i in range(sets)
+        ]},
+    }
+
+
+@pytest.fixture
+def threshold(monkeypatch):
+    monkeypatch.setattr(stored, 'overflow_threshold', 1_000)
+
+
+def test_small_items_stay_as_they_are(aws, threshold):
+    item = _item(1)
+    assert overflow.spill(item) is item
+    assert not aws.s3.objects
+
+
+def test_spill_and_hydrate_round_trip(aws, threshold):
+    item = _item(50)
+    pointer = overflow.spill(item)
+
+    assert 'exercises' not in pointer
+    assert pointer['exerciseCount'] == {'N': '50'}
+    assert pointer['setCount'] == {'N': '50'}
+    assert (_bucket, pointer['exercisesKey']['S']) in aws.s3.objects
+    assert overflow.hydrate(pointer) == item
+
+
+def test_hydrate_all_keeps_the_order(aws, threshold):
+    items = [_item(50), _item(1), _item(60)]
+    pointers = [overflow.spill(each) for each in items]
+    assert overflow.hydrate_all(pointers) == items
+
+
+def test_same_content_same_key(aws, threshold):
+    assert overflow.spill(_item(50))['exercisesKey'] == overflow.spill(_item(50))['exercisesKey']
+
+
+def test_discard_keeps_a_payload_the_new_item_points_at(aws, threshold):
+    old = overflow.spill(_item(50))
+    overflow.discard(old, old)
+    assert (_bucket, old['exercisesKey']['S']) in aws.s3.objects
+
+    overflow.discard(old, overflow.spill(_item(60)))
+    assert (_bucket, old['exercisesKey']['S']) not in aws.s3.objects
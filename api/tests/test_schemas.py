@@ -0,0 +1,21 @@
+import pytest
+
+from errors import BadRequest
+from schemas import compile_schema
+
+
+@pytest.mark.parametrize('value, expected', [(80, 80), (82.5, 82.5), (80.0, 80), ('82.5', 82.5)])
+def test_numbers_are_coerced(value, expected):
+    assert compile_schema({'type': 'number'})(value) == expected
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-Infinity', '1e999', float('nan'), float('inf'), True, 'heavy'])
+def test_only_finite_numbers_are_numbers(value):
+    with pytest.raises(BadRequest):
+        compile_schema({'type': 'number'})(value)
+
+
+@pytest.mark.parametrize('value', ['1e999', float('inf'), '5.5'])
+def test_only_finite_integers_are_integers(value):
+    with pytest.raises(BadRequest):
+        compile_schema({'type': 'integer'})(value)
@@ -0,0 +1,54 @@
+import pytest
+
+from conftest import background
+from storage import overflow
+
+_table = 'workouts'
+
+
+def _workout(exercises: int) -> dict:
+    return {
+        'PK': {'S': 'USER#user-1'},
+        'SK': {'S': 'WORKOUT#2026-01-01T10:00:00Z'},
+        'start': {'S': '2026-01-01T10:00:00Z'},
+        'exercises': {'L': [
+            {'M': {
+                'id': {'S': f'e{i}'},
+                'exercise': {'S': 'Squat'},
+                'sets': {'L': [
+                    {'M': {'id': {'S': 's1'}, 'completed': {'BOOL': True}, 'weight': {'N': '100'}, 'reps': {'N': '5'}}},
+                    {'M': {'id': {'S': 's2'}, 'completed': {'BOOL': False}, 'weight': {'N': '100'}, 'reps': {'N': '5'}}},
+                ]},
+            }}
+            for i in range(exercises)
+        ]},
+    }
+
+
+@pytest.fixture
+def summaries():
+    return background('summaries')
+
+
+def test_overflowed_workouts_are_summarized_from_their_exercises(aws, summaries, monkeypatch):
+    monkeypatch.setattr(overflow, 'overflow_threshold', 1_000)
+    pointer = overflow.spill(aws.s3, _workout(20))
+    assert 'exercisesKey' in pointer
+
+    summary = summaries.summary(aws.s3, pointer)
+
+    assert summary['exerciseCount'] == {'N': '20'}
+    assert summary['volume'] == {'N': '10000'}
+
+
+def test_projection_writes_the_summary_of_an_overflowed_workout(aws, summaries, monkeypatch):
+    monkeypatch.setattr(overflow, 'overflow_threshold', 1_000)
+    pointer = overflow.spill(aws.s3, _workout(20))
+    aws.dynamodb.tables.setdefault(_table, {})[(pointer['PK']['S'], pointer['SK']['S'])] = pointer
+    change = summaries.Change('INSERT', 'user-1', pointer['SK']['S'], '1', new=pointer)
+
+    assert summaries.project_summaries(aws.s3, 'user-1', [change])
+
+    written = aws.dynamodb.tables[_table][('USER#user-1', 'WSUM#2026-01-01T10:00:00Z')]
+    assert written['exerciseCount'] == {'N': '20'}
+    assert written['volume'] == {'N': '10000'}
@@ -0,0 +1,60 @@
+import pytest
+
+import templates
+from errors import BadRequest, EmptyResponse, NotFound, NotModified
+
+_table = 'workouts'
+
+
+@pytest.fixture
+def saved(aws, user) -> dict:
+    for order, each in enumerate(('a', 'b', 'c')):
+        templates.save_template(user=user, id=each, name=each, order=order, exercises=[])
+    return aws.dynamodb.tables[_table]
+
+
+def _orders(table: dict) -> dict[str, str]:
+    return {
+        sk.removeprefix('TEMPLATE#'): item['order']['N']
+        for (_, sk), item in table.items()
+        if sk.startswith('TEMPLATE#')
+    }
+
+
+def test_reorder(saved, user):
+    with pytest.raises(EmptyResponse):
+        templates.reorder_templates(user=user, templates=[{'id': 'a', 'order': 2}, {'id': 'c', 'order': 0}])
+    assert _orders(saved) == {'a': '2', 'b': '1', 'c': '0'}
+
+
+def test_missing_templates_are_named_and_nothing_changes(saved, user):
+    with pytest.raises(NotFound) as raised:
+        templates.reorder_templates(
+            user=user,
+            templates=[{'id': 'a', 'order': 5}, {'id': 'x', 'order': 6}, {'id': 'y', 'order': 7}],
+        )
+    assert raised.value.path == 'templates x, y'
+    assert _orders(saved) == {'a': '0', 'b': '1', 'c': '2'}
+
+
+def test_duplicate_ids_are_rejected(saved, user):
+    with pytest.raises(BadRequest):
+        templates.reorder_templates(user=user, templates=[{'id': 'a', 'order': 1}, {'id': 'a', 'order': 2}])
+
+
+def test_more_than_one_transaction_is_rejected(saved, user):
+    with pytest.raises(BadRequest):
+        templates.reorder_templates(user=user, templates=[{'id': str(i), 'order': i} for i in range(101)])
+
+
+def test_writes_move_the_revision_before_the_next_poll(saved, user):
+    saved[('USER#user-1', 'ACCOUNT')] = {'PK': {'S': 'USER#user-1'}, 'SK': {'S': 'ACCOUNT'}}
+    _, _, headers = templates.list_templates(user=user)
+    with pytest.raises(NotModified):
+        templates.list_templates(user=user, if_none_match=headers['ETag'])
+
+    with pytest.raises(EmptyResponse):
+        templates.reorder_templates(user=user, templates=[{'id': 'a', 'order': 2}, {'id': 'c', 'order': 0}])
+    _, _, after = templates.list_templates(user=user, if_none_match=headers['ETag'])
+
+    assert after['ETag'] != headers['ETag']
@@ -0,0 +1,67 @@
+import pytest
+
+import workouts
+from storage import bundles
+
+_table = 'workouts'
+
+
+def _item(start: str, name: str = None) -> dict:
+    item = {
+        'PK': {'S': 'USER#user-1'},
+        'SK': {'S': f'WORKOUT#{start}'},
+        'start': {'S': start},
+        'exercises': {'L': []},
+    }
+    if name:
+        item['name'] = {'S': name}
+    return item
+
+
+@pytest.fixture
+def history(aws) -> list[str]:
+    """A bundled month with a workout imported into it after archival, and a duplicate of a bundled one"""
+    bundles.write_bundle(
+        aws.dynamodb, aws.s3, 'user-1', '2020-01',
+        [_item('2020-01-03T10:00:00Z'), _item('2020-01-20T10:00:00Z', 'bundled')],
+        None,
+    )
+    table = aws.dynamodb.tables[_table]
+    for item in (_item('2020-01-10T10:00:00Z'), _item('2020-01-20T10:00:00Z', 'stale'), _item('2026-01-01T10:00:00Z')):
+        table[(item['PK']['S'], item['SK']['S'])] = item
+    return ['2020-01-03T10:00:00Z', '2020-01-10T10:00:00Z', '2020-01-20T10:00:00Z', '2026-01-01T10:00:00Z']
+
+
+def _pages(user, limit: str) -> list[list[dict]]:
+    pages, cursor = [], None
+    while True:
+        body, _, _ = workouts.list_workouts(user=user, limit=limit, cursor=cursor)
+        pages.append(body['workouts'])
+        if not (cursor := body['cursor']):
+            return pages
+
+
+@pytest.mark.parametrize('limit', ['1', '2', '3'])
+def test_pages_follow_start_across_bundles_and_standalone_workouts(history, user, limit):
+    listed = [each for page in _pages(user, limit) for each in page]
+    assert [each['id'] for each in listed] == history
+    assert listed[2]['name'] == 'bundled'
+
+
+def test_page_boundary_after_a_standalone_workout_in_a_bundled_month(history, user):
+    first, second, *_ = _pages(user, '2')
+    assert [each['id'] for each in first] == history[:2]
+    assert [each['id'] for each in second] == history[2:]
+
+
+def test_without_limit_or_cursor_the_whole_history_is_returned(aws, user):
+    table = aws.dynamodb.tables.setdefault(_table, {})
+    starts = [f'2026-01-01T10:{minute:02}:00Z' for minute in range(workouts.default_page_size + 10)]
+    for start in starts:
+        item = _item(start)
+        table[(item['PK']['S'], item['SK']['S'])] = item
+
+    body, _, _ = workouts.list_workouts(user=user)
+
+    assert [each['id'] for each in body['workouts']] == starts
+    assert body['cursor'] is None
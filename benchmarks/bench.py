@@ -0,0 +1,211 @@
+"""
+Replays API Gateway events through api/api/app.handler against in-process
+stand-ins of DynamoDB, S3, SNS and EventBridge Scheduler, and reports latency
+percentiles, allocations and peak memory per operation.
+
+    python benchmarks/bench.py record events.jsonl --users 200
+    python benchmarks/bench.py record events.jsonl --from-logs api.log
+    python benchmarks/bench.py run events.jsonl --save-baseline baseline.json
+    python benchmarks/bench.py run events.jsonl --baseline baseline.json
+    python benchmarks/bench.py run events.jsonl --latency 20 --sequential --save-baseline sequential.json
+    python benchmarks/bench.py run events.jsonl --latency 20 --baseline sequential.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from statistics import quantiles
+
+import events as recorded
+import stubs
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+environment = {
+    'ACCOUNT_DELETION_OFFSET': '30',
+    'BACKGROUND_FUNCTION': 'arn:aws:lambda:local:000000000000:function:heart-background',
+    'SCHEDULE_GROUP': 'account-deletions',
+    'MEDIA_BUCKET': 'local-media',
+    'MONITORING_TOPIC': 'arn:aws:sns:local:000000000000:monitoring',
+    'UPLOAD_BUCKET': 'local-upload',
+    'WORKOUTS_TABLE': 'workouts',
+    'AWS_DEFAULT_REGION': 'ca-central-1',
+}
+
+
+def install(services: stubs.Services):
+    """
+    Points boto3 at the stand-ins and imports the API handler.
+    Must run before anything in api/api is imported,
+    since the modules create their clients at import time.
+    """
+    import boto3
+
+    os.environ.update({k: v for k, v in environment.items() if k not in os.environ})
+    boto3.client = services.client
+    boto3.session.Session.client = lambda _, service, *args, **kwargs: services.client(service)
+    sys.path.insert(0, os.path.join(_root, 'api', 'api'))
+    # the storage layer, at /opt/python in Lambda
+    sys.path.insert(1, os.path.join(_root, 'libraries'))
+
+    import app
+    return app.handler
+
+
+def seed(services: stubs.Services, events: list[dict]):
+    """Every user in the recording gets an account item"""
+    table = services.dynamodb._table(environment['WORKOUTS_TABLE'])
+    for e in events:
+        user = json.loads(e['requestContext']['authorizer']['user'])
+        table[(f'USER#{user["id"]}', 'ACCOUNT')] = {
+            'PK': {'S': f'USER#{user["id"]}'},
+            'SK': {'S': 'ACCOUNT'},
+            'id': {'S': user['id']},
+            'email': {'S': user['email']},
+        }
+
+
+def percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=100, method='inclusive')[p - 1]
+
+
+def replay(handler, events: list[dict], rounds: int, warmup: int) -> dict[str, dict]:
+    timings = defaultdict(list)
+    allocations = defaultdict(list)
+    peaks = defaultdict(int)
+    errors = defaultdict(int)
+
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        for e in events[:warmup]:
+            handler(e, stubs.Context())
+
+        # timing pass, undisturbed by tracemalloc
+        for _ in range(rounds):
+            for e in events:
+                gc.disable()
+                started = time.perf_counter()
+                result = handler(e, stubs.Context())
+                elapsed = time.perf_counter() - started
+                gc.enable()
+                operation = recorded.operation_of(e)
+                timings[operation].append(elapsed * 1000)
+                if result.get('statusCode', 500) >= 500:
+                    errors[operation] += 1
+
+        # memory pass
+        tracemalloc.start()
+        for e in events:
+            operation = recorded.operation_of(e)
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            current, _ = tracemalloc.get_traced_memory()
+            handler(e, stubs.Context())
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+            allocations[operation].append(blocks)
+            peaks[operation] = max(peaks[operation], peak - current)
+        tracemalloc.stop()
+
+    return {
+        operation: {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'allocations': sum(allocations[operation]) / max(len(allocations[operation]), 1),
+            'peak_kb': peaks[operation] / 1024,
+            'errors': errors[operation],
+        }
+        for operation, values in sorted(timings.items())
+    }
+
+
+def report(results: dict[str, dict], baseline: dict[str, dict] = None, tolerance: float = 0.2) -> list[str]:
+    """
+    Prints results, next to the baseline if any
+
+    :return: operations whose p95 or peak memory regressed beyond the tolerance
+    """
+    regressions = []
+    header = f'{"operation":<24}{"n":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"allocs":>10}{"peak KB":>10}{"errors":>8}'
+    print(header)
+    print('-' * len(header))
+    for operation, r in results.items():
+        line = (
+            f'{operation:<24}{r["count"]:>6}{r["p50"]:>10.3f}{r["p95"]:>10.3f}{r["p99"]:>10.3f}'
+            f'{r["allocations"]:>10.0f}{r["peak_kb"]:>10.1f}{r["errors"]:>8}'
+        )
+        if baseline and (base := baseline.get(operation)):
+            change = (r['p95'] - base['p95']) / base['p95'] if base['p95'] else 0
+            line += f'  p95 {change:+.0%}'
+            if change > tolerance or r['peak_kb'] > base['peak_kb'] * (1 + tolerance):
+                regressions.append(operation)
+                line += '  REGRESSION'
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API handler benchmark')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help='write an event file')
+    record.add_argument('output')
+    record.add_argument('--users', type=int, default=100, help='synthetic users, each runs every operation')
+    record.add_argument('--seed', type=int, default=0)
+    record.add_argument('--from-logs', help='take events from the API function log output instead')
+
+    run = commands.add_parser('run', help='replay an event file')
+    run.add_argument('events')
+    run.add_argument('--rounds', type=int, default=5)
+    run.add_argument('--warmup', type=int, default=20)
+    run.add_argument('--baseline', help='compare against a saved run, exit 1 on regressions')
+    run.add_argument('--tolerance', type=float, default=0.2, help='allowed relative p95 increase')
+    run.add_argument('--save-baseline', help='store this run as a baseline')
+    run.add_argument('--latency', type=float, default=0, help='milliseconds added to every AWS call')
+    run.add_argument('--sequential', action='store_true', help='run fanned-out calls one by one')
+
+    args = parser.parse_args()
+
+    match args.command:
+        case 'record':
+            if args.from_logs:
+                with open(args.from_logs) as f:
+                    count = recorded.save(recorded.from_logs(f), args.output)
+            else:
+                count = recorded.save(recorded.generate(args.users, seed=args.seed), args.output)
+            print(f'Recorded {count} events to {args.output}')
+        case 'run':
+            if args.sequential:
+                os.environ['API_CONCURRENCY'] = '0'
+            services = stubs.Services(latency=args.latency / 1000)
+            handler = install(services)
+            events = recorded.load(args.events)
+            seed(services, events)
+
+            results = replay(handler, events, rounds=args.rounds, warmup=args.warmup)
+
+            baseline = None
+            if args.baseline:
+                with open(args.baseline) as f:
+                    baseline = json.load(f)
+            regressions = report(results, baseline, tolerance=args.tolerance)
+
+            if args.save_baseline:
+                with open(args.save_baseline, 'w') as f:
+                    json.dump(results, f, indent=2)
+            if regressions:
+                print(f'Regressed: {", ".join(regressions)}')
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
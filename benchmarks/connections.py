@@ -0,0 +1,99 @@
+"""
+Measures what client provisioning does to save-workout against real DynamoDB:
+the first request of a cold container (client creation, TLS handshake, first write)
+and steady-state write latency, with default clients and with api/api/clients.py.
+
+Needs AWS credentials and writes BENCH# items to the given table, removed afterwards.
+
+    python benchmarks/connections.py --table workouts --requests 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from statistics import median, quantiles
+
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+
+import events
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_serializer = TypeSerializer()
+
+
+def item(workout: dict, n: int) -> dict:
+    """Same shape as Workout._to_item"""
+    doc = json.loads(json.dumps(workout), parse_float=Decimal)
+    return {
+        'PK': {'S': 'BENCH#connections'},
+        'SK': {'S': f'WORKOUT#{n:06}'},
+        **{k: _serializer.serialize(v) for k, v in doc.items() if k != 'id' and v is not None},
+    }
+
+
+def measure(make_client, table: str, requests: int, warm=None) -> dict:
+    rng = random.Random(0)
+    started = time.perf_counter()
+    client = make_client()
+    created = time.perf_counter()
+    if warm:
+        warm(client)
+    warmed = time.perf_counter()
+    client.put_item(TableName=table, Item=item(events.workout(rng, 'medium'), 0))
+    first = time.perf_counter()
+
+    steady = []
+    for n in range(1, requests):
+        body = item(events.workout(rng, 'medium'), n)
+        t = time.perf_counter()
+        client.put_item(TableName=table, Item=body)
+        steady.append((time.perf_counter() - t) * 1000)
+
+    for n in range(requests):
+        client.delete_item(TableName=table, Key={'PK': {'S': 'BENCH#connections'}, 'SK': {'S': f'WORKOUT#{n:06}'}})
+
+    return {
+        'client ms': (created - started) * 1000,
+        'init warm-up ms': (warmed - created) * 1000,
+        'first request ms': (first - warmed) * 1000,
+        'steady p50 ms': median(steady),
+        'steady p95 ms': quantiles(steady, n=100)[94],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--table', default='workouts')
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ['WORKOUTS_TABLE'] = args.table
+    os.environ['WARM_CONNECTIONS'] = '0'
+    sys.path.insert(0, os.path.join(_root, 'api', 'api'))
+    import clients
+
+    runs = {
+        'default': measure(lambda: boto3.session.Session().client('dynamodb'), args.table, args.requests),
+        'tuned': measure(
+            lambda: boto3.session.Session().client('dynamodb', config=clients.config),
+            args.table,
+            args.requests,
+            # what clients.warm does during the init phase
+            warm=lambda client: client.get_item(
+                TableName=args.table,
+                Key={'PK': {'S': 'WARMUP'}, 'SK': {'S': 'WARMUP'}},
+            ),
+        ),
+    }
+
+    print(f'{"":<20}' + ''.join(f'{name:>12}' for name in runs))
+    for metric in runs['default']:
+        print(f'{metric:<20}' + ''.join(f'{run[metric]:>12.2f}' for run in runs.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Builds, records and loads API Gateway proxy events for the API handler.
+
+Events are kept as JSON Lines, one event per line, so that a recording
+can be replayed as-is or mixed with events taken from the handler's logs.
+"""
+import ast
+import json
+import random
+from datetime import datetime, timedelta, UTC
+from typing import Iterable
+
+# exercises per workout, sets per exercise
+workout_sizes = {
+    'small': (4, 3),
+    'medium': (8, 4),
+    'large': (15, 6),
+}
+
+exercise_names = [
+    'Squat (Barbell)', 'Bench Press (Barbell)', 'Deadlift (Barbell)', 'Pull Up',
+    'Row (Dumbbell)', 'Leg Extension (Machine)', 'Overhead Press (Barbell)', 'Lunge (Dumbbell)',
+]
+
+
+def _user(user_id: str) -> dict:
+    return {'id': user_id, 'name': f'User {user_id}', 'email': f'{user_id}@example.com', 'verified': True}
+
+
+def event(
+        *,
+        operation: str,
+        method: str,
+        path: str,
+        user_id: str,
+        body: dict = None,
+        path_parameters: dict = None,
+        query: dict = None,
+) -> dict:
+    return {
+        'resource': path,
+        'path': path,
+        'httpMethod': method,
+        'headers': {'Authorization': 'Bearer local'},
+        'pathParameters': path_parameters,
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None,
+        'requestContext': {
+            'operationName': operation,
+            'authorizer': {'principalId': user_id, 'user': json.dumps(_user(user_id))},
+        },
+    }
+
+
+def workout(rng: random.Random, size: str) -> dict:
+    exercises, sets = workout_sizes[size]
+    start = datetime(2025, 1, 1, tzinfo=UTC) + timedelta(minutes=rng.randrange(500_000))
+    return {
+        'id': start.isoformat(),
+        'name': f'{size.title()} workout',
+        'start': start.isoformat(),
+        'end': (start + timedelta(hours=1)).isoformat(),
+        'exercises': [
+            {
+                'id': f'{start.isoformat()}-{i}',
+                'exercise': rng.choice(exercise_names),
+                'sets': [
+                    {
+                        'id': f'{start.isoformat()}-{i}-{j}',
+                        'completed': True,
+                        'reps': rng.randrange(3, 15),
+                        'weight': round(rng.uniform(10, 180), 1),
+                    }
+                    for j in range(sets)
+                ],
+            }
+            for i in range(exercises)
+        ],
+    }
+
+
+def generate(count: int, seed: int = 0) -> Iterable[dict]:
+    """
+    A reproducible mix of operations, each user acting on their own account
+    """
+    rng = random.Random(seed)
+    for n in range(count):
+        user_id = f'bench-{n}'
+        account = {'accountId': user_id}
+        for size in workout_sizes:
+            yield event(
+                operation='save-workout', method='POST', path='/workouts', user_id=user_id,
+                body=workout(rng, size),
+            )
+        yield event(
+            operation='account-info', method='GET', path=f'/accounts/{user_id}', user_id=user_id,
+            path_parameters=account, query={'action': 'uploadAvatar', 'mimeType': 'image/jpeg'},
+        )
+        yield event(
+            operation='leave-feedback', method='POST', path='/feedback', user_id=user_id,
+            body={'message': 'Works great'},
+        )
+        yield event(
+            operation='delete-account', method='DELETE', path=f'/accounts/{user_id}', user_id=user_id,
+            path_parameters=account,
+        )
+        yield event(
+            operation='edit-account', method='PUT', path=f'/accounts/{user_id}', user_id=user_id,
+            path_parameters=account, query={'action': 'undoAccountDeletion'},
+        )
+
+
+def from_logs(lines: Iterable[str]) -> Iterable[dict]:
+    """
+    Extracts events from the API function's log output,
+    where the handler prints every incoming event as a Python literal
+    """
+    for line in lines:
+        start = line.find("{'resource'")
+        if start < 0:
+            continue
+        try:
+            yield ast.literal_eval(line[start:].strip())
+        except (ValueError, SyntaxError):
+            continue
+
+
+def save(events: Iterable[dict], path: str) -> int:
+    count = 0
+    with open(path, 'w') as f:
+        for each in events:
+            f.write(json.dumps(each) + '\n')
+            count += 1
+    return count
+
+
+def load(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def operation_of(e: dict) -> str:
+    name = e['requestContext']['operationName']
+    match e.get('body'):
+        case str(body) if name == 'save-workout':
+            exercises = len(json.loads(body).get('exercises') or [])
+            return f'{name}[{exercises}]'
+    return name
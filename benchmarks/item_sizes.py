@@ -0,0 +1,114 @@
+"""
+Item size histograms of a table by SK prefix (WORKOUT, WSUM, TEMPLATE, ARCHIVE, ...),
+sized with libraries/storage/sizes.py, the rules the API's ItemBytes metric and overflow use.
+
+Needs AWS credentials. Scans the whole table in parallel segments,
+which costs about one read capacity unit per 8 KB scanned: run it off-peak.
+
+    python benchmarks/item_sizes.py --table workouts --segments 8
+    python benchmarks/item_sizes.py --table workouts --json sizes.json
+"""
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_left
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+import boto3
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_root, 'libraries'))
+
+from storage.sizes import item_size  # noqa: E402
+
+# upper bounds of the histogram's buckets, in bytes; DynamoDB's item limit is 400 KB
+bounds = (1_024, 4_096, 8_192, 16_384, 32_768, 65_536, 131_072, 262_144, 409_600)
+
+
+def prefix(item: dict) -> str:
+    return item['SK']['S'].partition('#')[0]
+
+
+def scan(table: str, segment: int, segments: int) -> tuple[dict[str, list[int]], float]:
+    """Sizes by prefix of one segment, and the read capacity it consumed"""
+    client = boto3.client('dynamodb')
+    sizes = defaultdict(list)
+    consumed = 0.0
+    for page in client.get_paginator('scan').paginate(
+            TableName=table,
+            Segment=segment,
+            TotalSegments=segments,
+            ReturnConsumedCapacity='TOTAL',
+    ):
+        consumed += page.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+        for item in page['Items']:
+            sizes[prefix(item)].append(item_size(item))
+    return sizes, consumed
+
+
+def histogram(sizes: list[int]) -> list[int]:
+    counts = [0] * len(bounds)
+    for size in sizes:
+        counts[min(bisect_left(bounds, size), len(bounds) - 1)] += 1
+    return counts
+
+
+def percentile(values: list[int], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0
+    return quantiles(values, n=100, method='inclusive')[p - 1]
+
+
+def report(sizes: dict[str, list[int]]) -> dict[str, dict]:
+    return {
+        name: {
+            'items': len(values),
+            'bytes': sum(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': max(values),
+            'histogram': dict(zip((f'<={bound}' for bound in bounds), histogram(values))),
+        }
+        for name, values in sorted(sizes.items())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--table', default='workouts')
+    parser.add_argument('--segments', type=int, default=4)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        results = list(pool.map(lambda segment: scan(args.table, segment, args.segments), range(args.segments)))
+
+    sizes = defaultdict(list)
+    for segment, _ in results:
+        for name, values in segment.items():
+            sizes[name].extend(values)
+    result = report(sizes)
+
+    print(f'{"prefix":<12}{"items":>10}{"MB":>10}{"p50":>10}{"p95":>10}{"p99":>10}{"max":>10}')
+    for name, row in result.items():
+        print(
+            f'{name:<12}{row["items"]:>10}{row["bytes"] / 1_048_576:>10.1f}'
+            f'{row["p50"]:>10.0f}{row["p95"]:>10.0f}{row["p99"]:>10.0f}{row["max"]:>10}'
+        )
+    for name, row in result.items():
+        print(f'\n{name}')
+        for bucket, count in row['histogram'].items():
+            print(f'  {bucket:>10} {count:>8} {"#" * round(60 * count / row["items"])}')
+    print(f'\nConsumed {sum(consumed for _, consumed in results):.1f} read capacity units')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+"""
+Load generator: simulated users run session scripts concurrently through
+api/api/app.handler against the in-process stand-ins, with every DynamoDB
+call metered per partition the way DynamoDB meters it, to see how the
+single-table layout holds up before it is tried in production.
+
+A session registers (or logs in), lists exercises, reads the account and
+templates, saves a workout a few times as it goes, lists workouts and
+summaries, saves and reorders templates and fetches a few workouts by id.
+register-account and list-exercises are direct API Gateway integrations,
+their DynamoDB calls are made as the integrations make them.
+
+Partitions are throttled once they pass their per-second limits, 3,000 RCU and
+1,000 WCU by default as in DynamoDB, within one wall-clock second of the run.
+All users share one process, hence one set of caches: cache hit rates are
+those of a single, very busy container.
+
+    python benchmarks/load.py --users 2000 --concurrency 200
+    python benchmarks/load.py --users 1000 --concurrency 100 --latency 5 --think 20 --json load.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+import events
+import stubs
+from bench import environment, install, percentile
+
+# DynamoDB's per-partition limits
+partition_read_limit: float = 3_000
+partition_write_limit: float = 1_000
+# partitions every user reads, reported whether or not they are among the hottest
+shared_partitions = ('EXERCISE', 'CATALOG')
+
+
+def read_units(size: int, consistent: bool) -> float:
+    units = max(1, math.ceil(size / 4_096))
+    return units if consistent else units / 2
+
+
+def write_units(size: int, transactional: bool = False) -> float:
+    units = max(1, math.ceil(size / 1_024))
+    return 2 * units if transactional else units
+
+
+@dataclass
+class Heat:
+    reads: float = 0
+    writes: float = 0
+    requests: int = 0
+    throttled: int = 0
+    peak_reads: float = 0
+    peak_writes: float = 0
+    # units of the current second
+    second: int = 0
+    second_reads: float = 0
+    second_writes: float = 0
+
+    def roll(self, now: int):
+        if now != self.second:
+            self.second, self.second_reads, self.second_writes = now, 0, 0
+
+    def add(self, reads: float = 0, writes: float = 0):
+        self.requests += 1
+        self.reads += reads
+        self.writes += writes
+        self.second_reads += reads
+        self.second_writes += writes
+        self.peak_reads = max(self.peak_reads, self.second_reads)
+        self.peak_writes = max(self.peak_writes, self.second_writes)
+
+
+class Meter:
+    """
+    Wraps the DynamoDB stand-in: charges every call to the partitions it touches,
+    in read and write units as DynamoDB computes them from item sizes,
+    and throttles calls to partitions that are over their limit this second.
+    Calls are serialized, the stand-in is not thread-safe.
+    """
+
+    def __init__(self, stub: stubs.Dynamo, read_limit: float, write_limit: float):
+        self._stub = stub
+        self._lock = threading.Lock()
+        self.read_limit = read_limit
+        self.write_limit = write_limit
+        self.partitions: dict[str, Heat] = defaultdict(Heat)
+        # endpoint -> throttled calls
+        self.throttles: Counter[str] = Counter()
+        self.endpoint: Callable[[], str] = lambda: 'unknown'
+
+    def __getattr__(self, name: str):
+        return getattr(self._stub, name)
+
+    def get_paginator(self, operation: str) -> stubs._Paginator:
+        return stubs._Paginator(getattr(self, operation))
+
+    def _stored(self, table: str, key: dict) -> dict | None:
+        return self._stub._table(table).get(self._stub._key(key))
+
+    def _admit(self, partitions: set[str], operation: str, writes: bool):
+        now = int(time.monotonic())
+        for pk in partitions:
+            heat = self.partitions[pk]
+            heat.roll(now)
+            if heat.second_writes >= self.write_limit if writes else heat.second_reads >= self.read_limit:
+                heat.throttled += 1
+                self.throttles[self.endpoint()] += 1
+                raise self._stub.exceptions.ProvisionedThroughputExceededException(
+                    {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': pk}},
+                    operation,
+                )
+
+    def get_item(self, **params) -> dict:
+        pk = params['Key']['PK']['S']
+        with self._lock:
+            self._admit({pk}, 'GetItem', writes=False)
+            response = self._stub.get_item(**params)
+            size = _item_size(response.get('Item') or {})
+            self.partitions[pk].add(reads=read_units(size, params.get('ConsistentRead', False)))
+        return response
+
+    def query(self, **params) -> dict:
+        pk = next(v['S'] for k, v in params['ExpressionAttributeValues'].items() if k.upper() == ':PK')
+        with self._lock:
+            self._admit({pk}, 'Query', writes=False)
+            response = self._stub.query(**params)
+            size = sum(_item_size(each) for each in response['Items'])
+            self.partitions[pk].add(reads=read_units(size, params.get('ConsistentRead', False)))
+        return response
+
+    def put_item(self, **params) -> dict:
+        pk = params['Item']['PK']['S']
+        with self._lock:
+            self._admit({pk}, 'PutItem', writes=True)
+            old = self._stored(params['TableName'], params['Item'])
+            response = self._stub.put_item(**params)
+            self.partitions[pk].add(writes=write_units(max(_item_size(old or {}), _item_size(params['Item']))))
+        return response
+
+    def update_item(self, **params) -> dict:
+        pk = params['Key']['PK']['S']
+        with self._lock:
+            self._admit({pk}, 'UpdateItem', writes=True)
+            old = _item_size(self._stored(params['TableName'], params['Key']) or {})
+            try:
+                return self._stub.update_item(**params)
+            finally:
+                # failed conditions are charged too
+                new = _item_size(self._stored(params['TableName'], params['Key']) or {})
+                self.partitions[pk].add(writes=write_units(max(old, new)))
+
+    def delete_item(self, **params) -> dict:
+        pk = params['Key']['PK']['S']
+        with self._lock:
+            self._admit({pk}, 'DeleteItem', writes=True)
+            old = self._stored(params['TableName'], params['Key'])
+            response = self._stub.delete_item(**params)
+            self.partitions[pk].add(writes=write_units(_item_size(old or {})))
+        return response
+
+    def batch_get_item(self, **params) -> dict:
+        with self._lock:
+            keys = [key for request in params['RequestItems'].values() for key in request['Keys']]
+            self._admit({key['PK']['S'] for key in keys}, 'BatchGetItem', writes=False)
+            response = self._stub.batch_get_item(**params)
+            for items in response['Responses'].values():
+                for item in items:
+                    self.partitions[item['PK']['S']].add(reads=read_units(_item_size(item), False))
+        return response
+
+    def batch_write_item(self, **params) -> dict:
+        with self._lock:
+            requests = [
+                each.get('PutRequest', {}).get('Item') or each['DeleteRequest']['Key']
+                for requests in params['RequestItems'].values()
+                for each in requests
+            ]
+            self._admit({each['PK']['S'] for each in requests}, 'BatchWriteItem', writes=True)
+            response = self._stub.batch_write_item(**params)
+            for each in requests:
+                self.partitions[each['PK']['S']].add(writes=write_units(_item_size(each)))
+        return response
+
+    def transact_write_items(self, **params) -> dict:
+        with self._lock:
+            requests = [request for each in params['TransactItems'] for request in each.values()]
+            self._admit({(each.get('Key') or each['Item'])['PK']['S'] for each in requests}, 'TransactWriteItems', True)
+            try:
+                return self._stub.transact_write_items(**params)
+            finally:
+                for each in requests:
+                    key = each.get('Key') or each['Item']
+                    size = _item_size(self._stored(each['TableName'], key) or key)
+                    self.partitions[key['PK']['S']].add(writes=write_units(size, transactional=True))
+
+
+def _item_size(item: dict) -> int:
+    # api/api is on the path once the handler is installed
+    from storage.sizes import item_size
+    return item_size(item)
+
+
+class Session:
+    """One user's visit, as a list of (operation, call) steps"""
+
+    def __init__(self, handler, meter: Meter, user_id: str, rng: random.Random, think: float):
+        self.handler = handler
+        self.meter = meter
+        self.user_id = user_id
+        self.rng = rng
+        self.think = think
+        self.workouts: list[str] = []
+        self.templates: list[str] = []
+
+    def _invoke(self, operation: str, method: str, path: str, **kwargs) -> int:
+        e = events.event(operation=operation, method=method, path=path, user_id=self.user_id, **kwargs)
+        return self.handler(e, stubs.Context())['statusCode']
+
+    def _direct(self, operation: str, call: Callable[[], dict]) -> int:
+        """A direct DynamoDB integration: API Gateway maps client errors to 400s, anything else to 500s"""
+        import capacity
+        capacity.set_endpoint(operation)
+        try:
+            call()
+            return 200
+        except self.meter.exceptions.ProvisionedThroughputExceededException:
+            return 500
+        except Exception:
+            return 400
+
+    def register_account(self) -> int:
+        now = {'N': str(int(time.time() * 1000))}
+        return self._direct('register-account', lambda: self.meter.update_item(
+            TableName=environment['WORKOUTS_TABLE'],
+            Key={'PK': {'S': f'USER#{self.user_id}'}, 'SK': {'S': 'ACCOUNT'}},
+            UpdateExpression='SET #id = :id, #email = :email, #lastLoginAt = :now, #createdAt = if_not_exists(#createdAt, :now)',
+            ExpressionAttributeNames={'#id': 'id', '#email': 'email', '#lastLoginAt': 'lastLoginAt', '#createdAt': 'createdAt'},
+            ExpressionAttributeValues={':id': {'S': self.user_id}, ':email': {'S': f'{self.user_id}@example.com'}, ':now': now},
+            ConditionExpression='attribute_not_exists(deletedAt)',
+            ReturnValues='ALL_NEW',
+        ))
+
+    def list_exercises(self) -> int:
+        return self._direct('list-exercises', lambda: self.meter.query(
+            TableName=environment['WORKOUTS_TABLE'],
+            KeyConditionExpression='PK = :PK',
+            ExpressionAttributeValues={':PK': {'S': 'EXERCISE'}},
+        ))
+
+    def save_workout(self) -> list[tuple[str, Callable[[], int]]]:
+        """The same workout saved as the user completes its exercises, then at the end"""
+        workout = events.workout(self.rng, self.rng.choice(list(events.workout_sizes)))
+        self.workouts.append(workout['id'])
+        exercises = workout['exercises']
+        cuts = sorted({max(1, len(exercises) * k // 3) for k in (1, 2, 3)})
+        return [
+            ('save-workout', lambda n=n: self._invoke(
+                'save-workout', 'POST', '/workouts',
+                body={
+                    **{k: v for k, v in workout.items() if k != 'end' or n == len(exercises)},
+                    'exercises': exercises[:n],
+                },
+            ))
+            for n in cuts
+        ]
+
+    def save_template(self) -> int:
+        template_id = f'{self.user_id}-t{len(self.templates)}'
+        self.templates.append(template_id)
+        workout = events.workout(self.rng, 'small')
+        return self._invoke('save-template', 'POST', '/templates', body={
+            'id': template_id,
+            'name': f'Template {len(self.templates)}',
+            'order': len(self.templates),
+            'exercises': [{**each, 'id': f'{template_id}-{i}'} for i, each in enumerate(workout['exercises'])],
+        })
+
+    def steps(self) -> list[tuple[str, Callable[[], int]]]:
+        steps = [
+            ('register-account', self.register_account),
+            ('list-exercises', self.list_exercises),
+            ('account-info', lambda: self._invoke(
+                'account-info', 'GET', f'/accounts/{self.user_id}', path_parameters={'accountId': self.user_id},
+            )),
+            ('list-templates', lambda: self._invoke('list-templates', 'GET', '/templates')),
+        ]
+        for _ in range(self.rng.randint(1, 3)):
+            steps.extend(self.save_workout())
+            steps.append(('list-workout-summaries', lambda: self._invoke('list-workout-summaries', 'GET', '/workouts/summaries')))
+        if self.rng.random() < 0.2:
+            steps.append(('list-workouts', lambda: self._invoke('list-workouts', 'GET', '/workouts')))
+        steps.extend(('save-template', self.save_template) for _ in range(self.rng.randint(1, 2)))
+        steps.append(('reorder-templates', lambda: self._invoke(
+            'reorder-templates', 'PUT', '/templates/order',
+            body={'templates': [{'id': each, 'order': i} for i, each in enumerate(reversed(self.templates))]},
+        )))
+        steps.append(('get-workouts', lambda: self._invoke(
+            'get-workouts', 'POST', '/workouts/batch', body={'ids': self.workouts},
+        )))
+        return steps
+
+    def run(self, record: Callable[[str, float, int], None]):
+        for operation, step in self.steps():
+            started = time.perf_counter()
+            status = step()
+            record(operation, (time.perf_counter() - started) * 1000, status)
+            if self.think:
+                time.sleep(self.rng.uniform(0, 2 * self.think))
+
+
+def seed_catalog(services: stubs.Services):
+    table = services.dynamodb._table(environment['WORKOUTS_TABLE'])
+    for name in events.exercise_names:
+        table[('EXERCISE', name)] = {
+            'PK': {'S': 'EXERCISE'},
+            'SK': {'S': name},
+            'category': {'S': name.partition('(')[2].rstrip(')') or 'Bodyweight'},
+            'target': {'S': 'Full Body'},
+        }
+
+
+def run(users: int, concurrency: int, latency: float, think: float, read_limit: float, write_limit: float, seed: int):
+    services = stubs.Services(latency=latency)
+    meter = Meter(services.dynamodb, read_limit, write_limit)
+    services.dynamodb = meter
+    handler = install(services)
+    import capacity
+    meter.endpoint = capacity.endpoint
+    seed_catalog(services)
+
+    timings: dict[str, list[float]] = defaultdict(list)
+    errors: Counter[str] = Counter()
+    lock = threading.Lock()
+
+    def record(operation: str, elapsed: float, status: int):
+        with lock:
+            timings[operation].append(elapsed)
+            if status >= 500:
+                errors[operation] += 1
+
+    def visit(n: int):
+        Session(handler, meter, f'load-{n}', random.Random(seed * 1_000_003 + n), think).run(record)
+
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='user') as pool:
+            list(pool.map(visit, range(users)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests': sum(len(each) for each in timings.values()),
+        'operations': {
+            operation: {
+                'count': len(values),
+                'per_second': len(values) / elapsed,
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'errors': errors[operation],
+                'throttled': meter.throttles[operation],
+            }
+            for operation, values in sorted(timings.items())
+        },
+        'partitions': {pk: asdict(heat) for pk, heat in meter.partitions.items()},
+    }
+
+
+def report(result: dict, top: int):
+    print(
+        f'{result["users"]} users, {result["concurrency"]} at a time: {result["requests"]} requests '
+        f'in {result["seconds"]:.1f}s, {result["requests"] / result["seconds"]:.0f} requests/s'
+    )
+    header = f'{"operation":<24}{"n":>8}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}{"throttled":>11}'
+    print(header)
+    print('-' * len(header))
+    for operation, r in result['operations'].items():
+        print(
+            f'{operation:<24}{r["count"]:>8}{r["per_second"]:>9.0f}{r["p50"]:>10.2f}{r["p95"]:>10.2f}'
+            f'{r["p99"]:>10.2f}{r["errors"]:>8}{r["throttled"]:>11}'
+        )
+
+    partitions = result['partitions']
+    total = sum(each['reads'] + each['writes'] for each in partitions.values()) or 1
+    hottest = sorted(partitions, key=lambda pk: partitions[pk]['reads'] + partitions[pk]['writes'], reverse=True)
+    shown = hottest[:top] + [pk for pk in shared_partitions if pk in partitions and pk not in hottest[:top]]
+
+    print()
+    header = f'{"partition":<24}{"requests":>10}{"RCU":>10}{"WCU":>10}{"peak RCU/s":>12}{"peak WCU/s":>12}{"throttled":>11}{"share":>8}'
+    print(header)
+    print('-' * len(header))
+    for pk in shown:
+        h = partitions[pk]
+        print(
+            f'{pk:<24}{h["requests"]:>10}{h["reads"]:>10.0f}{h["writes"]:>10.0f}{h["peak_reads"]:>12.0f}'
+            f'{h["peak_writes"]:>12.0f}{h["throttled"]:>11}{(h["reads"] + h["writes"]) / total:>8.1%}'
+        )
+
+    user = [each['reads'] + each['writes'] for pk, each in partitions.items() if pk.startswith('USER#')]
+    if user:
+        print(
+            f'\n{len(user)} user partitions, units per partition: p50 {percentile(user, 50):.0f}, '
+            f'p99 {percentile(user, 99):.0f}, max {max(user):.0f}, '
+            f'{sum(user) / total:.1%} of all units'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--concurrency', type=int, default=100, help='sessions running at once')
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every AWS call')
+    parser.add_argument('--think', type=float, default=0, help='mean milliseconds between a user\'s requests')
+    parser.add_argument('--read-limit', type=float, default=partition_read_limit, help='RCU per partition and second')
+    parser.add_argument('--write-limit', type=float, default=partition_write_limit, help='WCU per partition and second')
+    parser.add_argument('--top', type=int, default=10, help='hottest partitions to list')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    result = run(
+        args.users,
+        args.concurrency,
+        latency=args.latency / 1000,
+        think=args.think / 1000,
+        read_limit=args.read_limit,
+        write_limit=args.write_limit,
+        seed=args.seed,
+    )
+    report(result, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
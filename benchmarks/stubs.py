@@ -0,0 +1,440 @@
+"""
+In-process stand-ins for the AWS services the API Lambda talks to.
+They implement just enough of the boto3 client interface
+for the code in api/ to run unchanged, keeping state in memory.
+"""
+import copy
+import io
+import re
+import time
+import uuid
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+_clause = re.compile(r'\b(SET|REMOVE|ADD|DELETE)\b')
+
+
+def _error(code: str, operation: str, message: str = '') -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class _Exceptions:
+    """Mimics client.exceptions.<Name>, all of them ClientError subclasses"""
+
+    def __getattr__(self, name: str):
+        error = type(name, (ClientError,), {})
+        setattr(self, name, error)
+        return error
+
+
+class _Events:
+    """client.meta.events: handlers are accepted and never called, the stand-ins report no consumed capacity"""
+
+    def __init__(self):
+        self.handlers: dict[str, list] = {}
+
+    def register(self, event: str, handler, unique_id: str = None):
+        handlers = self.handlers.setdefault(event, [])
+        if unique_id is None or unique_id not in (each for each, _ in handlers):
+            handlers.append((unique_id, handler))
+
+
+class _Meta:
+    def __init__(self):
+        self.events = _Events()
+
+
+class _Paginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        if size := (PaginationConfig or {}).get('PageSize'):
+            kwargs['Limit'] = size
+        while True:
+            page = self.method(**kwargs)
+            yield page
+            if not (key := page.get('LastEvaluatedKey')):
+                return
+            kwargs['ExclusiveStartKey'] = key
+
+
+class Dynamo:
+    """
+    Single-table DynamoDB: items keyed by (PK, SK), expressions limited to
+    what this codebase uses: SET/REMOVE/ADD updates, attribute_exists-style
+    conditions, PK equality with an optional begins_with or BETWEEN on SK in queries.
+    """
+    page_limit = 1_000  # items per query page, stands in for the 1 MB limit
+
+    def __init__(self):
+        self.tables: dict[str, dict[tuple[str, str], dict]] = {}
+        self.exceptions = _Exceptions()
+        self.meta = _Meta()
+        self.calls: dict[str, int] = {}
+
+    def _count(self, operation: str):
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def _table(self, name: str) -> dict:
+        return self.tables.setdefault(name, {})
+
+    @staticmethod
+    def _key(key: dict) -> tuple[str, str]:
+        return key['PK']['S'], key['SK']['S']
+
+    @staticmethod
+    def _name(token: str, names: dict) -> str:
+        return names.get(token, token)
+
+    def _check(self, condition: str | None, item: dict | None, names: dict, operation: str, old: str = 'NONE'):
+        if not condition:
+            return
+        for function, attribute in re.findall(r'(attribute_(?:not_)?exists)\(\s*([#\w]+)\s*\)', condition):
+            present = item is not None and self._name(attribute, names) in item
+            if (function == 'attribute_exists') != present:
+                returned = {'Item': copy.deepcopy(item)} if old == 'ALL_OLD' and item else {}
+                raise self.exceptions.ConditionalCheckFailedException(
+                    {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': condition}, **returned},
+                    operation,
+                )
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        return _Paginator(getattr(self, operation))
+
+    def get_item(self, *, TableName, Key, **_) -> dict:
+        self._count('get_item')
+        item = self._table(TableName).get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item else {}
+
+    def put_item(
+            self,
+            *,
+            TableName,
+            Item,
+            ConditionExpression=None,
+            ExpressionAttributeNames=None,
+            ReturnValues='NONE',
+            **_,
+    ) -> dict:
+        self._count('put_item')
+        key = self._key(Item)
+        old = self._table(TableName).get(key)
+        self._check(ConditionExpression, old, ExpressionAttributeNames or {}, 'PutItem')
+        self._table(TableName)[key] = copy.deepcopy(Item)
+        return {'Attributes': old} if ReturnValues == 'ALL_OLD' and old else {}
+
+    def delete_item(self, *, TableName, Key, ReturnValues='NONE', **_) -> dict:
+        self._count('delete_item')
+        old = self._table(TableName).pop(self._key(Key), None)
+        return {'Attributes': old} if ReturnValues == 'ALL_OLD' and old else {}
+
+    def update_item(
+            self,
+            *,
+            TableName,
+            Key,
+            UpdateExpression,
+            ExpressionAttributeNames=None,
+            ExpressionAttributeValues=None,
+            ConditionExpression=None,
+            ReturnValues='NONE',
+            ReturnValuesOnConditionCheckFailure='NONE',
+            **_,
+    ) -> dict:
+        self._count('update_item')
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        table = self._table(TableName)
+        key = self._key(Key)
+        self._check(ConditionExpression, table.get(key), names, 'UpdateItem', ReturnValuesOnConditionCheckFailure)
+
+        old = copy.deepcopy(table.get(key))
+        item = table.setdefault(key, copy.deepcopy(Key))
+        parts = _clause.split(UpdateExpression)
+        for action, body in zip(parts[1::2], parts[2::2]):
+            for clause in filter(None, (c.strip() for c in body.split(','))):
+                match action:
+                    case 'SET':
+                        attribute, value = (side.strip() for side in clause.split('=', 1))
+                        attribute = self._name(attribute, names)
+                        if value.startswith('if_not_exists'):
+                            _, fallback = re.findall(r'[#:]\w+', value)
+                            item.setdefault(attribute, copy.deepcopy(values[fallback]))
+                        else:
+                            item[attribute] = copy.deepcopy(values[value])
+                    case 'REMOVE':
+                        item.pop(self._name(clause, names), None)
+                    case 'ADD':
+                        attribute, value = clause.split()
+                        attribute = self._name(attribute, names)
+                        current = float(item.get(attribute, {'N': '0'})['N'])
+                        total = current + float(values[value]['N'])
+                        item[attribute] = {'N': str(int(total) if total.is_integer() else total)}
+        match ReturnValues:
+            case 'ALL_NEW' | 'UPDATED_NEW':
+                return {'Attributes': copy.deepcopy(item)}
+            case 'ALL_OLD' | 'UPDATED_OLD' if old:
+                return {'Attributes': old}
+        return {}
+
+    def query(
+            self,
+            *,
+            TableName,
+            ExpressionAttributeValues,
+            KeyConditionExpression,
+            ExpressionAttributeNames=None,
+            ExclusiveStartKey=None,
+            Limit=None,
+            ScanIndexForward=True,
+            **_,
+    ) -> dict:
+        self._count('query')
+        pk = next(v['S'] for k, v in ExpressionAttributeValues.items() if k.upper() in (':PK', ':pk'))
+        prefix = None
+        if match := re.search(r'begins_with\(\s*[#\w]+\s*,\s*(:\w+)\s*\)', KeyConditionExpression):
+            prefix = ExpressionAttributeValues[match.group(1)]['S']
+        low, high = None, None
+        if match := re.search(r'[#\w]+\s+BETWEEN\s+(:\w+)\s+AND\s+(:\w+)', KeyConditionExpression):
+            low, high = (ExpressionAttributeValues[each]['S'] for each in match.groups())
+
+        keys = sorted(
+            (
+                k for k in self._table(TableName)
+                if k[0] == pk
+                and (prefix is None or k[1].startswith(prefix))
+                and (low is None or low <= k[1] <= high)
+            ),
+            reverse=not ScanIndexForward,
+        )
+        if ExclusiveStartKey:
+            start = self._key(ExclusiveStartKey)
+            keys = [k for k in keys if (k > start if ScanIndexForward else k < start)]
+
+        limit = min(Limit or self.page_limit, self.page_limit)
+        page = keys[:limit]
+        response = {
+            'Items': [copy.deepcopy(self._table(TableName)[k]) for k in page],
+            'Count': len(page),
+        }
+        if len(keys) > limit:
+            response['LastEvaluatedKey'] = {'PK': {'S': page[-1][0]}, 'SK': {'S': page[-1][1]}}
+        return response
+
+    def batch_write_item(self, *, RequestItems, **_) -> dict:
+        self._count('batch_write_item')
+        for table, requests in RequestItems.items():
+            for request in requests:
+                match request:
+                    case {'PutRequest': {'Item': item}}:
+                        self._table(table)[self._key(item)] = copy.deepcopy(item)
+                    case {'DeleteRequest': {'Key': key}}:
+                        self._table(table).pop(self._key(key), None)
+        return {'UnprocessedItems': {}}
+
+    def batch_get_item(self, *, RequestItems, **_) -> dict:
+        self._count('batch_get_item')
+        responses = {}
+        for table, request in RequestItems.items():
+            responses[table] = [
+                copy.deepcopy(item)
+                for key in request['Keys']
+                if (item := self._table(table).get(self._key(key)))
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def transact_write_items(self, *, TransactItems, **_) -> dict:
+        self._count('transact_write_items')
+        reasons, failed = [], False
+        for each in TransactItems:
+            (_, request), = each.items()
+            item = self._table(request['TableName']).get(self._key(request.get('Key') or request['Item']))
+            try:
+                self._check(request.get('ConditionExpression'), item, request.get('ExpressionAttributeNames', {}), '')
+                reasons.append({'Code': 'None'})
+            except ClientError:
+                reasons.append({'Code': 'ConditionalCheckFailed'})
+                failed = True
+        if failed:
+            raise self.exceptions.TransactionCanceledException(
+                {'Error': {'Code': 'TransactionCanceledException'}, 'CancellationReasons': reasons},
+                'TransactWriteItems',
+            )
+        for each in TransactItems:
+            (kind, request), = each.items()
+            match kind:
+                case 'Update':
+                    self.update_item(**request)
+                case 'Put':
+                    self.put_item(**request)
+                case 'Delete':
+                    self.delete_item(**request)
+        return {}
+
+
+class S3:
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.uploads: dict[str, dict] = {}
+        self.exceptions = _Exceptions()
+
+    def generate_presigned_post(self, bucket, key, ExpiresIn=300, Conditions=None, Fields=None) -> dict:  # noqa
+        return {
+            'url': f'https://{bucket}.s3.amazonaws.com/',
+            'fields': {**(Fields or {}), 'key': key, 'policy': uuid.uuid4().hex, 'x-amz-signature': uuid.uuid4().hex},
+        }
+
+    def generate_presigned_url(self, operation, Params=None, ExpiresIn=3600) -> str:  # noqa
+        params = Params or {}
+        return f'https://{params.get("Bucket")}.s3.amazonaws.com/{params.get("Key")}?X-Amz-Signature={uuid.uuid4().hex}'
+
+    def put_object(self, *, Bucket, Key, Body=b'', **_) -> dict:
+        self.objects[(Bucket, Key)] = Body.read() if hasattr(Body, 'read') else Body
+        return {'ETag': f'"{uuid.uuid4().hex}"'}
+
+    def get_object(self, *, Bucket, Key, **_) -> dict:
+        try:
+            body = self.objects[(Bucket, Key)]
+        except KeyError:
+            raise _error('NoSuchKey', 'GetObject')
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+    def delete_object(self, *, Bucket, Key, **_) -> dict:
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, *, Bucket, Prefix='', **_) -> dict:
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        return {'Contents': [{'Key': key, 'Size': len(self.objects[(Bucket, key)])} for key in keys], 'KeyCount': len(keys)}
+
+    def delete_objects(self, *, Bucket, Delete, **_) -> dict:
+        for each in Delete['Objects']:
+            self.objects.pop((Bucket, each['Key']), None)
+        return {}
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        return _Paginator(getattr(self, operation))
+
+    def create_multipart_upload(self, *, Bucket, Key, **_) -> dict:
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'Parts': {}}
+        return {'UploadId': upload_id, 'Bucket': Bucket, 'Key': Key}
+
+    def upload_part(self, *, UploadId, PartNumber, Body=b'', **_) -> dict:
+        body = Body.read() if hasattr(Body, 'read') else Body
+        etag = f'"{uuid.uuid5(uuid.NAMESPACE_OID, body.hex()[:64] + str(len(body))).hex}"'
+        self.uploads[UploadId]['Parts'][PartNumber] = (etag, body)
+        return {'ETag': etag}
+
+    def complete_multipart_upload(self, *, Bucket, Key, UploadId, MultipartUpload, **_) -> dict:
+        upload = self.uploads.pop(UploadId)
+        chunks = []
+        for part in MultipartUpload['Parts']:
+            etag, body = upload['Parts'][part['PartNumber']]
+            if etag != part['ETag']:
+                raise _error('InvalidPart', 'CompleteMultipartUpload')
+            chunks.append(body)
+        self.objects[(Bucket, Key)] = b''.join(chunks)
+        return {'Bucket': Bucket, 'Key': Key}
+
+    def abort_multipart_upload(self, *, UploadId, **_) -> dict:
+        self.uploads.pop(UploadId, None)
+        return {}
+
+
+class Sns:
+    def __init__(self):
+        self.published: list[dict] = []
+
+    def publish(self, **kwargs) -> dict:
+        self.published.append(kwargs)
+        return {'MessageId': uuid.uuid4().hex}
+
+
+class Scheduler:
+    def __init__(self):
+        self.schedules: dict[tuple[str, str], dict] = {}
+
+    def create_schedule(self, *, Name, GroupName='default', **kwargs) -> dict:
+        if (GroupName, Name) in self.schedules:
+            raise _error('ConflictException', 'CreateSchedule')
+        self.schedules[(GroupName, Name)] = kwargs
+        return {'ScheduleArn': f'arn:aws:scheduler:local:000000000000:schedule/{GroupName}/{Name}'}
+
+    def delete_schedule(self, *, Name, GroupName='default', **_) -> dict:
+        if self.schedules.pop((GroupName, Name), None) is None:
+            raise _error('ResourceNotFoundException', 'DeleteSchedule')
+        return {}
+
+
+class Lambda:
+    def invoke(self, **_) -> dict:
+        return {'StatusCode': 200, 'Payload': io.BytesIO(b'{}')}
+
+
+class Context:
+    """Lambda context object with a ticking deadline"""
+    function_name = 'heart-api'
+    memory_limit_in_mb = 128
+    aws_request_id = 'local'
+
+    def __init__(self, timeout_ms: int = 5_000):
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class _Delayed:
+    """Adds a fixed round-trip time to every call that would go over the network"""
+    local = ('generate_presigned_post', 'generate_presigned_url')
+
+    def __init__(self, stub: Any, latency: float):
+        self._stub = stub
+        self._latency = latency
+
+    def __getattr__(self, name: str):
+        if name == 'get_paginator':
+            return lambda operation: _Paginator(getattr(self, operation))
+        attribute = getattr(self._stub, name)
+        if not callable(attribute) or name in self.local or name.startswith('_'):
+            return attribute
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+class Services:
+    """One instance of each stand-in, handed out by a patched boto3.client"""
+
+    def __init__(self, latency: float = 0):
+        """
+        :param latency: seconds added to every call, to compare sequential and concurrent calls
+        """
+        self.latency = latency
+        self.dynamodb = Dynamo()
+        self.s3 = S3()
+        self.sns = Sns()
+        self.scheduler = Scheduler()
+        self.lambda_ = Lambda()
+
+    def client(self, service: str, *_, **__) -> Any:
+        match service:
+            case 'dynamodb':
+                stub = self.dynamodb
+            case 's3':
+                stub = self.s3
+            case 'sns':
+                stub = self.sns
+            case 'scheduler':
+                stub = self.scheduler
+            case 'lambda':
+                stub = self.lambda_
+            case _:
+                raise ValueError(f'No local stand-in for {service}')
+        return _Delayed(stub, self.latency) if self.latency else stub
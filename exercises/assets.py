@@ -1,4 +1,6 @@
 import os
+import shutil
+import subprocess
 from urllib.parse import quote_plus
 
 import boto3
@@ -6,10 +8,17 @@ import mimetypes
 from PIL import Image
 import io
 
-from common import logs
+from common import logs, bump_version
 
 _assets = "assets"
 
+# thumbnail widths, the 200px one is also stored as `thumbnail` for older clients
+_thumbnail_sizes = (96, 200, 400)
+_default_thumbnail_size = 200
+# low-bandwidth variants keep every n-th frame
+_decimation = 2
+_ffmpeg = shutil.which('ffmpeg')
+
 _s3 = boto3.client("s3")
 _dynamo = boto3.client("dynamodb")
 
@@ -29,16 +38,112 @@ def dimensions(file_path: str) -> tuple[int, int]:
 
 
 @logs
-def upload(*, file_path: str, file_name: str, content_type: str) -> None:
-    return _s3.upload_file(
+def upload(*, file_path: str, file_name: str, content_type: str) -> str:
+    """:return: the object's key, None if the upload failed"""
+    key = f'exercises/{file_name}'
+    _s3.upload_file(
         file_path,
         _bucket,
-        f'exercises/{file_name}',
+        key,
         ExtraArgs={
             "ContentType": content_type,
             'CacheControl': 'public, max-age=31536000, immutable',
         }
     )
+    return key
+
+
+@logs
+def frame_count(file_path: str) -> int:
+    with Image.open(file_path) as img:
+        return getattr(img, 'n_frames', 1)
+
+
+def read_frames(file_path: str, step: int = 1) -> tuple[list[Image.Image], list[int]]:
+    """
+    Reads the frames of an animated image, keeping every `step`-th one.
+    Durations of the dropped frames are added to the preceding kept frame,
+    so the animation plays at the original speed.
+
+    :param file_path: path to the animated image
+    :param step: frame decimation factor, 1 keeps all frames
+    :return: RGBA frames and their durations in milliseconds
+    """
+    images, durations = [], []
+    with Image.open(file_path) as img:
+        for index in range(getattr(img, 'n_frames', 1)):
+            img.seek(index)
+            duration = img.info.get('duration', 100)
+            if index % step == 0:
+                images.append(img.convert('RGBA'))
+                durations.append(duration)
+            else:
+                durations[-1] += duration
+    return images, durations
+
+
+@logs
+def to_webp(file_path: str, output: str, step: int = 1) -> str:
+    """
+    Transcodes an animated GIF into an animated WebP
+
+    :param file_path: source GIF
+    :param output: destination path
+    :param step: frame decimation factor
+    :return: destination path
+    """
+    images, durations = read_frames(file_path, step=step)
+    first, *rest = images
+    first.save(
+        output,
+        format='WEBP',
+        save_all=True,
+        append_images=rest,
+        duration=durations,
+        loop=0,
+        quality=75,
+        method=6,
+    )
+    return output
+
+
+@logs
+def to_mp4(file_path: str, output: str, step: int = 1) -> str | None:
+    """
+    Transcodes an animated GIF into a silent H.264 clip.
+    Requires ffmpeg on PATH, the format is skipped otherwise.
+
+    :param file_path: source GIF
+    :param output: destination path
+    :param step: frame decimation factor
+    :return: destination path or None if ffmpeg is missing
+    """
+    if not _ffmpeg:
+        print(f'ffmpeg not found, skipping {output}')
+        return None
+
+    # H.264 with yuv420p needs even dimensions
+    filters = ['scale=trunc(iw/2)*2:trunc(ih/2)*2']
+    if step > 1:
+        filters.insert(0, f"select='not(mod(n\\,{step}))'")
+
+    subprocess.run(
+        [
+            _ffmpeg, '-y', '-loglevel', 'error',
+            '-i', file_path,
+            '-vf', ','.join(filters),
+            '-fps_mode', 'vfr',
+            '-c:v', 'libx264',
+            '-profile:v', 'baseline',
+            '-pix_fmt', 'yuv420p',
+            '-crf', '28',
+            '-movflags', '+faststart',
+            '-an',
+            output,
+        ],
+        check=True,
+    )
+    return output
 
 
 @logs
@@ -64,6 +169,53 @@ def extract_thumbnail(file_path: str, thumbnail_size=(200, 200)):
         return thumbnail_io
 
 
+def descriptor(
+        *,
+        exercise: str,
+        file_path: str,
+        file_name: str,
+        content_type: str,
+        size: tuple[int, int] = None,
+        frames: int = None,
+) -> dict:
+    """
+    Builds an image descriptor as stored in the exercise item
+
+    :param exercise: exercise name
+    :param file_path: local path of the rendition, used to measure it
+    :param file_name: file name under the exercise's prefix in the bucket
+    :param content_type: MIME type of the rendition
+    :param size: width and height, measured from the file if omitted
+    :param frames: number of animation frames, if applicable
+    :return: descriptor dict
+    """
+    width, height = size or dimensions(file_path)
+    frame_info = {'frames': frames} if frames else {}
+    return {
+        'link': link(exercise, file_name),
+        'width': width,
+        'height': height,
+        'contentType': content_type,
+        'size': os.path.getsize(file_path),
+        **frame_info,
+    }
+
+
+def _attribute(value) -> dict:
+    match value:
+        case bool():
+            return {'BOOL': value}
+        case int() | float():
+            return {'N': str(value)}
+        case str():
+            return {'S': value}
+        case dict():
+            return {'M': {k: _attribute(v) for k, v in value.items() if v is not None}}
+        case list():
+            return {'L': [_attribute(each) for each in value]}
+    raise TypeError(f'Unsupported attribute value: {value}')
+
+
 @logs
 def update(exercise: str, doc: dict):
     """Generated"""
@@ -77,13 +229,7 @@ def update(exercise: str, doc: dict):
         value_placeholder = f":{key}"
         sets.append(f"{placeholder} = {value_placeholder}")
         expr_attr_names[placeholder] = key
-        expr_attr_values[value_placeholder] = {
-            'M': {
-                'link': {'S': value['link']},
-                'width': {'N': str(value['width'])},
-                'height': {'N': str(value['height'])},
-            }
-        }
+        expr_attr_values[value_placeholder] = _attribute(value)
 
     update_expr += ", ".join(sets)
 
@@ -99,6 +245,104 @@ def update(exercise: str, doc: dict):
     )
 
 
+def renditions(*, exercise: str, file_path: str, content_type: str) -> dict:
+    """
+    Uploads the source GIF along with its lighter renditions:
+    animated WebP and H.264 clips, both full and frame-decimated,
+    and first-frame thumbnails in several sizes.
+
+    :param exercise: exercise name
+    :param file_path: source GIF
+    :param content_type: MIME type of the source
+    :return: a partial exercise item with all the uploaded formats
+    :raises ValueError: if the source cannot be read or uploaded
+    """
+    size, total = dimensions(file_path), frame_count(file_path)
+    # both log and return None on an unreadable file
+    if size is None or total is None:
+        raise ValueError(f'Could not read {file_path}')
+    width, height = size
+    decimated = -(-total // _decimation)
+    even = (width - width % 2, height - height % 2)
+
+    candidates = [
+        ('asset.gif', content_type, file_path, (width, height), total),
+        ('asset.webp', 'image/webp', to_webp(file_path, _temp(exercise, 'asset.webp')), None, total),
+        ('asset-low.webp', 'image/webp', to_webp(file_path, _temp(exercise, 'asset-low.webp'), step=_decimation), None, decimated),
+        ('asset.mp4', 'video/mp4', to_mp4(file_path, _temp(exercise, 'asset.mp4')), even, total),
+        ('asset-low.mp4', 'video/mp4', to_mp4(file_path, _temp(exercise, 'asset-low.mp4'), step=_decimation), even, decimated),
+    ]
+
+    formats = []
+    try:
+        for file_name, mime, path, size, frames in candidates:
+            # None if the transcoding failed, logged by `logs`, or ffmpeg is missing
+            if not path:
+                continue
+            if not upload(file_path=path, file_name=f'{exercise}/{file_name}', content_type=mime):
+                if path == file_path:
+                    raise ValueError(f'Could not upload {exercise}/{file_name}')
+                continue
+            print(f"Uploaded {exercise}/{file_name}")
+            formats.append(
+                descriptor(
+                    exercise=exercise,
+                    file_path=path,
+                    file_name=file_name,
+                    content_type=mime,
+                    size=size,
+                    frames=frames,
+                )
+            )
+    finally:
+        # failed transcodings may leave partial files too
+        for file_name, *_ in candidates[1:]:
+            if os.path.exists(temp := _temp(exercise, file_name)):
+                os.remove(temp)
+
+    thumbnails = []
+    doc = {
+        'asset': formats[0],
+        # smallest first, so that clients can take the first one they can play
+        'formats': sorted(formats, key=lambda each: each['size']),
+        'thumbnails': thumbnails,
+    }
+    for side in _thumbnail_sizes:
+        if not (thumbnail := extract_thumbnail(file_path, thumbnail_size=(side, side))):
+            continue
+        file_name = f'thumbnail-{side}.jpg'
+        temp = _temp(exercise, file_name)
+        with open(temp, 'wb') as f:
+            f.write(thumbnail.getvalue())
+
+        if not upload(file_path=temp, file_name=f'{exercise}/{file_name}', content_type='image/jpeg'):
+            os.remove(temp)
+            continue
+        print(f"Uploaded thumbnail to {exercise}/{file_name}")
+        thumbnails.append(
+            descriptor(
+                exercise=exercise,
+                file_path=temp,
+                file_name=file_name,
+                content_type='image/jpeg',
+            )
+        )
+        # older clients read `thumbnail.jpg`
+        if side == _default_thumbnail_size and upload(
+                file_path=temp,
+                file_name=f'{exercise}/thumbnail.jpg',
+                content_type='image/jpeg',
+        ):
+            doc['thumbnail'] = {**thumbnails[-1], 'link': link(exercise, 'thumbnail.jpg')}
+        os.remove(temp)
+
+    return doc
+
+
+def _temp(exercise: str, file_name: str) -> str:
+    return os.path.join(_assets, f"temp_{exercise}_{file_name}")
+
+
 def upload_files():
     for file_name in os.listdir(_assets):
         file_path = os.path.join(_assets, file_name)
@@ -113,50 +357,15 @@ def upload_files():
             continue
 
         exercise, extension = os.path.splitext(file_name)
-
-        asset_path = f"{exercise}/asset.gif"
-        thumbnail_path = f"{exercise}/thumbnail.jpg"
-
-        width, height = dimensions(file_path)
-
-        upload(
-            file_path=file_path,
-            file_name=asset_path,
-            content_type=content_type,
-        )
-        print(f"Uploaded {file_name} to {asset_path}")
-
-        doc = {
-            'asset': {
-                'link': link(exercise, 'asset.gif'),
-                'width': width,
-                'height': height,
-            },
-        }
-
-        if thumbnail := extract_thumbnail(file_path):
-            temp = os.path.join(_assets, f"temp_thumbnail_{exercise}.jpg")
-            with open(temp, 'wb') as f:
-                f.write(thumbnail.getvalue())
-
-            upload(
-                file_path=temp,
-                file_name=thumbnail_path,
-                content_type='image/jpeg'
-            )
-            print(f"Uploaded thumbnail to {thumbnail_path}")
-
-            t_width, t_height = dimensions(temp)
-
-            doc['thumbnail'] = {
-                'link': link(exercise, 'thumbnail.jpg'),
-                'width': t_width,
-                'height': t_height,
-            }
-            os.remove(temp)
-
+        try:
+            doc = renditions(exercise=exercise, file_path=file_path, content_type=content_type)
+        except ValueError as e:
+            print(f"Skipping {file_name} - {e}")
+            continue
         update(exercise, doc)
 
+    print(f'Catalog version is now {bump_version(_dynamo, table)}')
+
 
 if __name__ == "__main__":
     upload_files()
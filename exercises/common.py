@@ -27,6 +27,28 @@ def get_json(filepath: str) -> dict:
         return json.load(source)
 
 
+def bump_version(client, table: str) -> int:
+    """
+    Warm API containers rebuild their exercise search index
+    when the catalog version changes, see api/api/exercises.py
+
+    :param client: boto3 DynamoDB client
+    :param table: workouts table name
+    :return: new catalog version
+    """
+    response = client.update_item(
+        TableName=table,
+        Key={
+            'PK': {'S': 'CATALOG'},
+            'SK': {'S': 'EXERCISE'},
+        },
+        UpdateExpression='ADD version :one',
+        ExpressionAttributeValues={':one': {'N': '1'}},
+        ReturnValues='UPDATED_NEW',
+    )
+    return int(response['Attributes']['version']['N'])
+
+
 def logs(func: Callable) -> Any:
     """
     Decorator to wrap a function in try-except for error handling and logging exceptions.
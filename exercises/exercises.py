@@ -1,17 +1,138 @@
-from common import get_raw
+import argparse
+import os
+import time
+from typing import Iterable
+
+import boto3
+
+from common import get_raw, bump_version
 from api.api.models import Exercise
 
+_dynamo = boto3.client('dynamodb')
+
+table = os.environ.get('WORKOUTS_TABLE', 'workouts')
+
+# catalog fields owned by the CSV, everything else (assets, formats) is left alone
+_fields = ('category', 'target')
+_batch_size = 25  # BatchWriteItem limit
+_max_attempts = 8
+
+
+def current() -> dict[str, dict]:
+    """
+    Reads the whole EXERCISE partition once
+
+    :return: raw DynamoDB items keyed by exercise name
+    """
+    items = {}
+    paginator = _dynamo.get_paginator('query')
+    for page in paginator.paginate(
+            TableName=table,
+            KeyConditionExpression='PK = :PK',
+            ExpressionAttributeValues={':PK': {'S': 'EXERCISE'}},
+    ):
+        for item in page['Items']:
+            items[item['SK']['S']] = item
+    return items
 
-def port():
-    for row in get_raw('import.csv'):
-        exercise = Exercise(
+
+def incoming(filepath: str) -> dict[str, Exercise]:
+    return {
+        row['name']: Exercise(
             name=row['name'],
             target=row['target'],
             category=row['category'],
         )
-        r = exercise.save_as_non_null_item(table='workouts')
-        print(f'On {row['name']}: {r}')
+        for row in get_raw(filepath)
+    }
+
+
+def diff(existing: dict[str, dict], new: dict[str, Exercise]) -> tuple[list[dict], list[dict], list[str]]:
+    """
+    Compares the catalog in the table with the one in the CSV
+
+    :param existing: raw items currently in the table
+    :param new: exercises from the CSV
+    :return: items to insert, items to update and names to delete
+    """
+    inserts, updates = [], []
+
+    for name, exercise in new.items():
+        item = exercise.to_item(exclude_nulls=True)
+        match existing.get(name):
+            case None:
+                inserts.append(item)
+            case old if any(old.get(f) != item.get(f) for f in _fields):
+                # keep whatever else is on the item, e.g. assets
+                updates.append({**old, **{f: item[f] for f in _fields}})
+
+    deletes = [name for name in existing if name not in new]
+    return inserts, updates, deletes
+
+
+def chunks(requests: list[dict], size: int = _batch_size) -> Iterable[list[dict]]:
+    for i in range(0, len(requests), size):
+        yield requests[i:i + size]
+
+
+def batch_write(requests: list[dict]) -> int:
+    """
+    Writes requests through BatchWriteItem,
+    retrying unprocessed items with exponential backoff
+
+    :param requests: PutRequest/DeleteRequest entries
+    :return: number of write requests sent, retries included
+    """
+    sent = 0
+    for chunk in chunks(requests):
+        pending = chunk
+        for attempt in range(_max_attempts):
+            sent += len(pending)
+            response = _dynamo.batch_write_item(RequestItems={table: pending})
+            pending = response.get('UnprocessedItems', {}).get(table)
+            if not pending:
+                break
+            time.sleep(min(0.05 * 2 ** attempt, 2))
+        else:
+            raise RuntimeError(f'{len(pending)} items left unprocessed after {_max_attempts} attempts')
+    return sent
+
+
+def port(filepath: str = 'import.csv', dry_run: bool = False):
+    existing = current()
+    inserts, updates, deletes = diff(existing, incoming(filepath))
+
+    for item in inserts:
+        print(f'+ {item["SK"]["S"]}')
+    for item in updates:
+        name = item['SK']['S']
+        changes = ', '.join(
+            f'{f}: {existing[name].get(f, {}).get("S")} -> {item[f]["S"]}'
+            for f in _fields
+            if existing[name].get(f) != item[f]
+        )
+        print(f'~ {name} ({changes})')
+    for name in deletes:
+        print(f'- {name}')
+    print(f'{len(inserts)} to insert, {len(updates)} to update, {len(deletes)} to delete, {len(existing)} in table')
+
+    if dry_run:
+        return
+
+    requests = [
+        *({'PutRequest': {'Item': item}} for item in inserts + updates),
+        *({'DeleteRequest': {'Key': {'PK': {'S': 'EXERCISE'}, 'SK': {'S': name}}}} for name in deletes),
+    ]
+    sent = batch_write(requests)
+    print(f'Wrote {len(requests)} changes in {sent} write requests')
+
+    if requests:
+        print(f'Catalog version is now {bump_version(_dynamo, table)}')
 
 
 if __name__ == '__main__':
-    port()
+    parser = argparse.ArgumentParser(description='Syncs the exercise catalog with a CSV file')
+    parser.add_argument('file', nargs='?', default='import.csv')
+    parser.add_argument('--dry-run', action='store_true', help='only print the diff')
+    args = parser.parse_args()
+    port(args.file, dry_run=args.dry_run)
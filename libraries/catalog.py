@@ -0,0 +1,65 @@
+"""
+Compiles the exercise catalog of the workouts table into the file of the
+exercise-catalog layer, read by api/api/catalog.py. Run by catalog.sh
+after every catalog import, see exercises/exercises.py.
+
+    python catalog.py --table workouts --output catalog/exercises.bin
+"""
+import argparse
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api', 'api'))
+
+from catalog import Catalog, encode  # noqa: E402
+
+_dynamo = boto3.client('dynamodb')
+
+
+def version(table: str) -> int:
+    item = _dynamo.get_item(
+        TableName=table,
+        Key={
+            'PK': {'S': 'CATALOG'},
+            'SK': {'S': 'EXERCISE'},
+        },
+        ProjectionExpression='version',
+        ConsistentRead=True,
+    ).get('Item')
+    return int(item['version']['N']) if item else 0
+
+
+def names(table: str) -> list[str]:
+    paginator = _dynamo.get_paginator('query')
+    return [
+        item['SK']['S']
+        for page in paginator.paginate(
+            TableName=table,
+            KeyConditionExpression='PK = :PK',
+            ExpressionAttributeValues={':PK': {'S': 'EXERCISE'}},
+            ProjectionExpression='SK',
+            ConsistentRead=True,
+        )
+        for item in page['Items']
+    ]
+
+
+def build(table: str, output: str) -> Catalog:
+    # the version is read first: a catalog that changes meanwhile is newer than the file claims, never older
+    current = version(table)
+    data = encode(names(table), current)
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(data)
+    return Catalog(data)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compiles the exercise catalog into the layer file')
+    parser.add_argument('--table', default=os.environ.get('WORKOUTS_TABLE', 'workouts'))
+    parser.add_argument('--output', default='catalog/exercises.bin')
+    args = parser.parse_args()
+    catalog = build(args.table, args.output)
+    print(f'{len(catalog)} exercises of catalog version {catalog.version}, {os.path.getsize(args.output)} bytes')
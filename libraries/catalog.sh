@@ -0,0 +1,26 @@
+# Exercise catalog layer: compiles the catalog into catalog/exercises.bin
+# and publishes it as a new version of the exercise-catalog layer.
+# Run after every catalog import, then point the API function at the new version.
+# Until then the API finds the layer's catalog version stale and checks names against the table.
+
+BUCKET="583168578067-lambda-layers"
+TABLE="${1:-workouts}"
+TARGET="catalog"
+rm -rf "$TARGET"
+
+python catalog.py --table "$TABLE" --output "$TARGET/exercises.bin" || exit 1
+zip -r exercise-catalog.zip "$TARGET"
+
+rm -rf "$TARGET"
+
+
+aws s3 cp exercise-catalog.zip "s3://$BUCKET/exercise-catalog.zip" --profile personal
+rm exercise-catalog.zip
+
+aws lambda publish-layer-version \
+  --layer-name exercise-catalog \
+  --description "Exercise catalog of the $TABLE table" \
+  --content "S3Bucket=$BUCKET,S3Key=exercise-catalog.zip" \
+  --compatible-runtimes python3.13 \
+  --query Version \
+  --profile personal
@@ -3,11 +3,14 @@
 BUCKET="583168578067-lambda-layers"
 PACKAGE="$1"
 TARGET="python"
-rm -r "$TARGET"
+rm -rf "$TARGET"
 
 mkdir "$TARGET"
 
-pip install "$PACKAGE" --target "./$TARGET"
+# first-party packages without a build, e.g. storage, are copied as they are
+if [ ! -d "$PACKAGE" ] || [ -f "$PACKAGE/pyproject.toml" ] || [ -f "$PACKAGE/setup.py" ]; then
+  pip install "$PACKAGE" --target "./$TARGET"
+fi
 cp -r "$PACKAGE" "$TARGET"
 zip -r "$PACKAGE.zip" "$TARGET"
 
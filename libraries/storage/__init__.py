@@ -0,0 +1,6 @@
+"""
+Storage formats shared by the API and background functions, published as
+the `storage` layer, see libraries/layer.sh: archive bundles, overflowed
+exercises, item sizes and consumed capacity. Functions take the clients to use, each function
+has its own, tuned ones in the API.
+"""
@@ -0,0 +1,134 @@
+"""
+ARCHIVE#<yyyy-mm> bundles: a month of a user's workout items as gzipped JSON,
+inline while it fits into the item and in the media bucket otherwise.
+Written by the background function's archival run and by API edits
+to archived workouts, read by both.
+
+Once a month has a bundle, the bundle is the source of truth for its workouts:
+a standalone WORKOUT# copy of a bundled workout, left by an interrupted
+archival run or written by an import, is stale. Readers prefer the bundled copy,
+edits go to the bundle and delete the standalone copy, and the next archival run
+deletes whatever is left.
+"""
+import gzip
+import heapq
+import json
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+_table = os.environ['WORKOUTS_TABLE']
+_archive_bucket = os.environ['MEDIA_BUCKET']
+
+# compressed bundles above this go to S3, leaves headroom under the 400 KB item limit
+max_inline_size: int = 300_000
+
+
+def archive_key(user_id: str, month: str, revision: int) -> str:
+    return f'archives/{user_id}/{month}/{revision}.json.gz'
+
+
+def encode(items: list[dict]) -> bytes:
+    return gzip.compress(json.dumps(items, separators=(',', ':')).encode(), compresslevel=6)
+
+
+def decode(data: bytes) -> list[dict]:
+    return json.loads(gzip.decompress(data))
+
+
+def read_bundle(s3, bundle: dict) -> list[dict]:
+    """
+    :param s3: S3 client
+    :param bundle: ARCHIVE# item
+    :return: workout items of the month, as they were stored before archival
+    """
+    match bundle:
+        case {'bundle': {'B': data}}:
+            return decode(data)
+        case {'key': {'S': key}}:
+            return decode(s3.get_object(Bucket=_archive_bucket, Key=key)['Body'].read())
+    return []
+
+
+def write_bundle(dynamodb, s3, user_id: str, month: str, items: list[dict], previous: dict | None) -> int:
+    """
+    Replaces a month's bundle, conditionally on it not having changed since `previous` was read
+
+    :param dynamodb: DynamoDB client
+    :param s3: S3 client
+    :return: compressed bytes written
+    :raises ConditionalCheckFailedException: on a concurrent write
+    """
+    revision = int(previous['revision']['N']) + 1 if previous else 1
+    item = {
+        'PK': {'S': f'USER#{user_id}'},
+        'SK': {'S': f'ARCHIVE#{month}'},
+        'revision': {'N': str(revision)},
+        'workouts': {'N': str(len(items))},
+        'archivedAt': {'S': datetime.now(timezone.utc).isoformat()},
+    }
+    data = encode(sorted(items, key=lambda each: each['SK']['S']))
+    item['bytes'] = {'N': str(len(data))}
+    if len(data) <= max_inline_size:
+        item['bundle'] = {'B': data}
+    else:
+        # a new object per revision, so that a failed write never clobbers the current one
+        item['key'] = {'S': archive_key(user_id, month, revision)}
+        s3.put_object(
+            Bucket=_archive_bucket,
+            Key=item['key']['S'],
+            Body=data,
+            ContentType='application/json',
+            ContentEncoding='gzip',
+        )
+
+    condition = {
+        'ConditionExpression': 'revision = :revision',
+        'ExpressionAttributeValues': {':revision': previous['revision']},
+    } if previous else {
+        'ConditionExpression': 'attribute_not_exists(SK)',
+    }
+    dynamodb.put_item(TableName=_table, Item=item, **condition)
+
+    if previous and 'key' in previous:
+        s3.delete_object(Bucket=_archive_bucket, Key=previous['key']['S'])
+    return len(data)
+
+
+def expand(s3, items: Iterable[dict]) -> Iterator[dict]:
+    """
+    Workout items of a user, with bundles expanded in place.
+    A workout that is both bundled and stored on its own is returned once, as bundled.
+
+    :param s3: S3 client
+    :param items: ARCHIVE# and WORKOUT# items in SK order
+    """
+    bundled = set()
+    for item in items:
+        if item['SK']['S'].startswith('ARCHIVE#'):
+            for each in read_bundle(s3, item):
+                bundled.add(each['SK']['S'])
+                yield each
+        elif item['SK']['S'] not in bundled:
+            yield item
+
+
+def merge(s3, archives: Iterable[dict], workouts: Iterable[dict]) -> Iterator[dict]:
+    """
+    Workout items of a user in start order, from bundles and standalone workouts
+    read as two ranges. A standalone workout may sort before workouts bundled
+    after it, e.g. one imported into an archived month, so the ranges are merged
+    rather than chained. A workout that is both bundled and stored on its own
+    is returned once, as bundled. Both are consumed lazily.
+
+    :param s3: S3 client
+    :param archives: ARCHIVE# items in SK order
+    :param workouts: WORKOUT# items in SK order
+    """
+    bundled = (each for bundle in archives for each in read_bundle(s3, bundle))
+    previous = None
+    # merge is stable, bundled items come first among equal keys
+    for item in heapq.merge(bundled, workouts, key=lambda each: each['SK']['S']):
+        if item['SK']['S'] != previous:
+            previous = item['SK']['S']
+            yield item
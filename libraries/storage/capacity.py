@@ -0,0 +1,53 @@
+"""
+Consumed capacity of DynamoDB calls: handlers registered on a client's events
+ask each call that supports it for ReturnConsumedCapacity=TOTAL and pass
+the read and write units its response reports on to a callback.
+The API adds them to its metrics by endpoint, see api/api/capacity.py,
+the background function by job, see background/capacity.py.
+"""
+from typing import Callable, Iterator
+
+# operations whose CapacityUnits are reads, when the response does not split them
+_reads = frozenset({'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'})
+
+
+def _request_capacity(params: dict, model, **_):
+    if 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def units(parsed: dict, operation: str) -> Iterator[tuple[str, float]]:
+    """
+    :param parsed: parsed response of a DynamoDB call
+    :param operation: DynamoDB operation, e.g. "GetItem"
+    :return: non-zero ("ReadCapacityUnits" | "WriteCapacityUnits", units) of the response
+    """
+    consumed = parsed.get('ConsumedCapacity')
+    if not consumed:
+        return
+    # a list for batch and transaction operations, one entry per table
+    for each in consumed if isinstance(consumed, list) else [consumed]:
+        read, write = each.get('ReadCapacityUnits'), each.get('WriteCapacityUnits')
+        if read is None and write is None:
+            total = each.get('CapacityUnits', 0)
+            read, write = (total, 0) if operation in _reads else (0, total)
+        for name, value in (('ReadCapacityUnits', read), ('WriteCapacityUnits', write)):
+            if value:
+                yield name, value
+
+
+def install(record: Callable[[str, float, str], None], *clients):
+    """
+    Registers the handlers on DynamoDB clients, once per client
+
+    :param record: called with the metric name, the units and the DynamoDB operation
+    """
+    def _record(parsed: dict, model, **_):
+        for name, value in units(parsed, model.name):
+            record(name, value, model.name)
+
+    for client in clients:
+        client.meta.events.register(
+            'provide-client-params.dynamodb', _request_capacity, unique_id='capacity-request',
+        )
+        client.meta.events.register('after-call.dynamodb', _record, unique_id='capacity-record')
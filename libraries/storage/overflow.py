@@ -0,0 +1,78 @@
+"""
+Overflow of oversized workout and template items to S3.
+
+Items above `overflow_threshold` keep everything but their `exercises`,
+which are stored gzipped in the media bucket; the item gets a pointer to the object
+and a few summary fields instead. Read paths that return sets hydrate the items
+they return, and only those.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from storage.sizes import item_size
+
+_overflow_bucket = os.environ['MEDIA_BUCKET']
+
+# well under the 400 KB limit, items above this are also slow and expensive to read
+overflow_threshold = int(os.environ.get('ITEM_OVERFLOW_BYTES', 64_000))
+
+# what spill adds to a pointer item
+_pointer_attributes = ('exercisesKey', 'exerciseCount', 'setCount', 'itemBytes')
+
+
+def overflow_key(item: dict, payload: bytes) -> str:
+    # one object per content, so that a failed write never leaves an item pointing at a newer payload
+    digest = hashlib.sha256(payload).hexdigest()[:16]
+    return f'overflow/{item["PK"]["S"].removeprefix("USER#")}/{item["SK"]["S"]}/{digest}.json.gz'
+
+
+def spill(s3, item: dict, size: int = None) -> dict:
+    """
+    :param s3: S3 client
+    :param item: serialized workout or template
+    :param size: of the item, if the caller has measured it already
+    :return: the item as is, or, above the threshold, its pointer item
+        after the exercises are written to S3
+    """
+    size = item_size(item) if size is None else size
+    if size <= overflow_threshold or 'exercises' not in item:
+        return item
+
+    exercises = item['exercises']['L']
+    payload = gzip.compress(json.dumps(exercises, separators=(',', ':')).encode(), compresslevel=6)
+    key = overflow_key(item, payload)
+    s3.put_object(
+        Bucket=_overflow_bucket,
+        Key=key,
+        Body=payload,
+        ContentType='application/json',
+        ContentEncoding='gzip',
+    )
+    pointer = {k: v for k, v in item.items() if k != 'exercises'}
+    pointer.update({
+        'exercisesKey': {'S': key},
+        'exerciseCount': {'N': str(len(exercises))},
+        'setCount': {'N': str(sum(len(each['M'].get('sets', {}).get('L', [])) for each in exercises))},
+        'itemBytes': {'N': str(size)},
+    })
+    return pointer
+
+
+def hydrate(s3, item: dict) -> dict:
+    """The item with its exercises back in place, if they overflowed"""
+    match item:
+        case {'exercisesKey': {'S': key}}:
+            body = s3.get_object(Bucket=_overflow_bucket, Key=key)['Body'].read()
+            exercises = json.loads(gzip.decompress(body))
+            rest = {k: v for k, v in item.items() if k not in _pointer_attributes}
+            return {**rest, 'exercises': {'L': exercises}}
+    return item
+
+
+def discard(s3, old: dict | None, new: dict | None = None):
+    """Deletes the payload of a replaced or deleted item, unless the new item still points at it"""
+    key = (old or {}).get('exercisesKey', {}).get('S')
+    if key and key != (new or {}).get('exercisesKey', {}).get('S'):
+        s3.delete_object(Bucket=_overflow_bucket, Key=key)
@@ -0,0 +1,37 @@
+"""
+Item sizes by DynamoDB's rules, computed from serialized items without a call.
+Free of clients and configuration, so that benchmarks/item_sizes.py can import it on its own.
+"""
+
+
+def _number_size(n: str) -> int:
+    # a byte per two significant digits, leading and trailing zeroes don't count, plus one
+    significant = n.lower().split('e')[0].lstrip('+-').replace('.', '').strip('0')
+    return (len(significant) + 1) // 2 + 1
+
+
+def value_size(value: dict) -> int:
+    """Size of a typed attribute value, as per DynamoDB's item size rules"""
+    (kind, v), = value.items()
+    match kind:
+        case 'S':
+            return len(v.encode())
+        case 'N':
+            return _number_size(v)
+        case 'B':
+            return len(v)
+        case 'BOOL' | 'NULL':
+            return 1
+        case 'L':
+            return 3 + sum(1 + value_size(each) for each in v)
+        case 'M':
+            return 3 + sum(1 + len(k.encode()) + value_size(each) for k, each in v.items())
+        case 'SS':
+            return sum(len(each.encode()) for each in v)
+        case 'NS':
+            return sum(_number_size(each) for each in v)
+    raise ValueError(f'Unknown attribute type {kind}')
+
+
+def item_size(item: dict) -> int:
+    return sum(len(name.encode()) + value_size(value) for name, value in item.items())
@@ -1,9 +1,17 @@
 import boto3
+from botocore.config import Config
 from PIL import Image
 import io
 from urllib.parse import unquote_plus
 
-s3 = boto3.client('s3')
+s3 = boto3.client(
+    's3',
+    config=Config(
+        tcp_keepalive=True,
+        connect_timeout=1,
+        retries={'mode': 'adaptive', 'max_attempts': 3},
+    ),
+)
 
 MAX_SIZE = 1024
 MAX_BYTES = 1024 * 200
@@ -13,6 +13,8 @@ clean() {
 }
 
 build() {
+  # request decoders of the API are compiled from the template's models, see api/api/schemas.py
+  python "$(dirname "$0")/schemas.py" || return 1
   sam build \
     --use-container \
     --skip-pull-image \
@@ -0,0 +1,83 @@
+"""
+Extracts the JSON schemas of the API Gateway models in api/template.yaml
+into api/api/schemas.json, which api/api/schemas.py compiles into request decoders.
+Run by deploy.sh before every build, so the deployed decoders always match
+the deployed models; run it by hand after editing a model.
+
+    python scripts/schemas.py
+    python scripts/schemas.py --check  # fails if schemas.json is out of date
+"""
+import argparse
+import json
+import os
+import sys
+
+import yaml
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+template = os.path.join(_root, 'api', 'template.yaml')
+output = os.path.join(_root, 'api', 'api', 'schemas.json')
+
+
+class _Loader(yaml.SafeLoader):
+    """Keeps CloudFormation short-form tags, e.g. !Ref, as {tag: value}"""
+
+
+def _tag(loader: yaml.SafeLoader, tag: str, node: yaml.Node):
+    match node:
+        case yaml.ScalarNode():
+            value = loader.construct_scalar(node)
+        case yaml.SequenceNode():
+            value = loader.construct_sequence(node, deep=True)
+        case _:
+            value = loader.construct_mapping(node, deep=True)
+    return {f'!{tag}': value}
+
+
+_Loader.add_multi_constructor('!', _tag)
+
+
+def _schema(value):
+    """The schema with gateway URLs of other models in $refs replaced by their names"""
+    match value:
+        case {'$ref': {'!Sub': url}}:
+            return {'$ref': url.rsplit('/models/', 1)[1]}
+        case dict():
+            return {k: _schema(v) for k, v in value.items() if k not in ('$schema', 'title')}
+        case list():
+            return [_schema(each) for each in value]
+    return value
+
+
+def models(path: str) -> dict[str, dict]:
+    """
+    :param path: SAM template
+    :return: schemas of its API Gateway models by model name
+    """
+    with open(path) as f:
+        resources = yaml.load(f, Loader=_Loader)['Resources']
+    return {
+        resource['Properties']['Name']: _schema(resource['Properties']['Schema'])
+        for resource in resources.values()
+        if resource['Type'] == 'AWS::ApiGateway::Model'
+    }
+
+
+def render(path: str) -> str:
+    return json.dumps(models(path), indent=2, sort_keys=True) + '\n'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extracts the API models for the request decoders')
+    parser.add_argument('--check', action='store_true', help='only check that the output is current')
+    args = parser.parse_args()
+
+    rendered = render(template)
+    if args.check:
+        with open(output) as f:
+            if f.read() != rendered:
+                sys.exit(f'{output} is out of date, run scripts/schemas.py')
+    else:
+        with open(output, 'w') as f:
+            f.write(rendered)
+        print(f'Wrote {output}')